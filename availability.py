@@ -0,0 +1,219 @@
+# availability.py
+"""
+In-process doctor availability index.
+
+Each (doctor_id, date) pair maps to an int used as a bitmap, one bit per
+SLOT_MINUTES slot of the day (bit set = slot booked). Appointment times
+are not forced onto slot boundaries, so 10:05 and 10:10 share a slot; a
+per-slot count says how many live appointments hold each bit, and a bit
+is only cleared when its last appointment is released. The index is loaded
+from the appointments table at startup and kept up to date by crud when
+appointments are booked, cancelled or deleted in this worker, so most
+free-slot lookups never touch the DB.
+
+Each worker process keeps its own copy, and other workers, bulk_import.py,
+migrate_flatfiles.py or direct SQL change appointments too. So a day's
+bitmap is rebuilt from the DB (one small indexed query) when it is older
+than AVAILABILITY_TTL seconds, and days before today are dropped. The
+unique index on appointments is still the source of truth: a booking that
+hits SlotTakenError marks the slot as taken here too (mark_taken).
+"""
+import os
+import threading
+import time as clock
+from datetime import date, datetime, time
+
+from models import Appointment
+
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "15"))
+CLINIC_OPEN = os.getenv("CLINIC_OPEN", "09:00")
+CLINIC_CLOSE = os.getenv("CLINIC_CLOSE", "17:00")
+AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "30"))
+
+
+def _minutes(hhmm: str):
+    t = datetime.strptime(hhmm, "%H:%M")
+    return t.hour * 60 + t.minute
+
+
+class AvailabilityIndex:
+    def __init__(self, slot_minutes=SLOT_MINUTES, open_at=CLINIC_OPEN, close_at=CLINIC_CLOSE,
+                 ttl=AVAILABILITY_TTL):
+        self.slot_minutes = slot_minutes
+        self.first_slot = _minutes(open_at) // slot_minutes
+        self.last_slot = _minutes(close_at) // slot_minutes  # exclusive
+        # Bits covering clinic hours; free slots = open_mask & ~booked
+        self.open_mask = ((1 << self.last_slot) - 1) ^ ((1 << self.first_slot) - 1)
+        self.ttl = ttl
+        self._days = {}
+        self._counts = {}  # (doctor_id, day) -> {slot: live appointments in it}
+        self._generation = {}  # (doctor_id, day) -> bumped by every book/release
+        self._loaded_at = {}  # (doctor_id, day) -> monotonic time its bitmap was read from the DB
+        self._today = date.today()
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def slot_of(self, t: time):
+        return (t.hour * 60 + t.minute) // self.slot_minutes
+
+    def time_of(self, slot: int):
+        minutes = slot * self.slot_minutes
+        return time(minutes // 60, minutes % 60)
+
+    @staticmethod
+    def _live(db):
+        """Only the three key columns of live appointments, not ORM objects."""
+        return db.query(
+            Appointment.doctor_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time
+        ).filter(Appointment.status != "Cancelled")
+
+    @staticmethod
+    def _bitmap(counts):
+        booked = 0
+        for slot in counts:
+            booked |= 1 << slot
+        return booked
+
+    def _set_day(self, key, counts):
+        if counts:
+            self._counts[key] = counts
+            self._days[key] = self._bitmap(counts)
+        else:
+            self._counts.pop(key, None)
+            self._days.pop(key, None)
+
+    def load(self, db):
+        """Rebuild from every live appointment from today onwards."""
+        today = date.today()
+        counts = {}
+        for doctor_id, day, t in self._live(db).filter(Appointment.appointment_date >= today):
+            if t is None:
+                continue
+            day_counts = counts.setdefault((doctor_id, day), {})
+            slot = self.slot_of(t)
+            day_counts[slot] = day_counts.get(slot, 0) + 1
+
+        now = clock.monotonic()
+        with self._lock:
+            self._counts = counts
+            self._days = {key: self._bitmap(day_counts) for key, day_counts in counts.items()}
+            self._generation = {}
+            self._loaded_at = dict.fromkeys(counts, now)
+            self._today = today
+            self.loaded = True
+
+    def refresh(self, db, doctor_id: int, day: date):
+        """
+        Re-read one doctor's day from the DB. The query runs without the lock;
+        if this worker booked or released on that day meanwhile, the result
+        may predate it, so it is thrown away and the day stays due for a
+        refresh (the next lookup tries again).
+        """
+        key = (doctor_id, day)
+        with self._lock:
+            generation = self._generation.get(key, 0)
+        counts = {}
+        rows = self._live(db).filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date == day
+        )
+        for _, _, t in rows:
+            if t is not None:
+                slot = self.slot_of(t)
+                counts[slot] = counts.get(slot, 0) + 1
+        with self._lock:
+            if self._generation.get(key, 0) != generation:
+                return False
+            self._set_day(key, counts)
+            now = clock.monotonic()
+            if len(self._loaded_at) > len(self._days) + 10000:
+                # Timestamps of empty days that have expired anyway (e.g. far-future lookups)
+                self._loaded_at = {k: at for k, at in self._loaded_at.items()
+                                   if k in self._days or now - at <= self.ttl}
+            self._loaded_at[key] = now
+        return True
+
+    def _drop_past_days(self):
+        today = date.today()
+        if today == self._today:
+            return
+        with self._lock:
+            self._forget(lambda key: key[1] < today)
+            self._today = today
+
+    def _forget(self, matches):
+        for table in (self._loaded_at, self._days, self._counts, self._generation):
+            for key in [key for key in table if matches(key)]:
+                del table[key]
+
+    def book(self, doctor_id: int, day: date, t: time):
+        slot = self.slot_of(t)
+        key = (doctor_id, day)
+        with self._lock:
+            counts = self._counts.setdefault(key, {})
+            counts[slot] = counts.get(slot, 0) + 1
+            self._days[key] = self._days.get(key, 0) | (1 << slot)
+            self._generation[key] = self._generation.get(key, 0) + 1
+
+    def mark_taken(self, doctor_id: int, day: date, t: time):
+        """
+        A slot found taken in the DB (e.g. a SlotTakenError): make sure it shows
+        as booked without counting another appointment in it.
+        """
+        slot = self.slot_of(t)
+        key = (doctor_id, day)
+        with self._lock:
+            counts = self._counts.setdefault(key, {})
+            if slot not in counts:
+                counts[slot] = 1
+                self._days[key] = self._days.get(key, 0) | (1 << slot)
+                self._generation[key] = self._generation.get(key, 0) + 1
+
+    def release(self, doctor_id: int, day: date, t: time):
+        """Drop one appointment from its slot; the slot is free once none are left."""
+        slot = self.slot_of(t)
+        key = (doctor_id, day)
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            counts = self._counts.get(key)
+            if not counts or slot not in counts:
+                return
+            if counts[slot] > 1:
+                counts[slot] -= 1
+                return
+            del counts[slot]
+            self._set_day(key, counts)
+
+    def drop_doctor(self, doctor_id: int):
+        """Forget every day of a deleted doctor."""
+        with self._lock:
+            self._forget(lambda key: key[0] == doctor_id)
+
+    def is_free(self, doctor_id: int, day: date, t: time):
+        return not (self._days.get((doctor_id, day), 0) >> self.slot_of(t)) & 1
+
+    def free_slots(self, doctor_id: int, day: date, db=None):
+        """
+        Start times of the free slots within clinic hours, earliest first.
+        Past dates have no free slots. With a session, a day not read from
+        the DB within the TTL is refreshed first.
+        """
+        self._drop_past_days()
+        if day < date.today():
+            return []
+        if db is not None:
+            loaded_at = self._loaded_at.get((doctor_id, day))
+            if loaded_at is None or clock.monotonic() - loaded_at > self.ttl:
+                self.refresh(db, doctor_id, day)
+        free = self.open_mask & ~self._days.get((doctor_id, day), 0)
+        slots = []
+        while free:
+            low = free & -free
+            slots.append(self.time_of(low.bit_length() - 1))
+            free ^= low
+        return slots
+
+
+index = AvailabilityIndex()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+Repeatable load test for the hot web routes.
+
+Seeds a throwaway SQLite database with a configurable number of doctors,
+patients and appointments, imports main.app against it and drives each
+route in-process (httpx ASGI transport, no network) at a fixed
+concurrency:
+
+    POST /patient/book_appointment   (each request books a fresh slot)
+    GET  /doctor/view_appointments   (one logged-in doctor per worker)
+    GET  /admin/view_patients
+    GET  /patient/search_doctors     (random name fragments)
+
+For every route it reports req/s, client-side latency percentiles, status
+codes and DB queries / DB time per request (from metrics.registry), and
+writes everything, plus the run configuration and git commit, to a JSON
+file. --compare prints the change against an earlier result file.
+
+Usage:
+    python benchmark.py [--patients 10000] [--doctors 200] [--appointments 50000]
+                        [--concurrency 16] [--requests 1000] [--output bench.json]
+                        [--compare previous.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, time as dt_time, timedelta
+
+SEED_DAYS = 60  # seeded appointments fall in the next SEED_DAYS days; bookings come after
+SLOTS_PER_DAY = 32  # 09:00-17:00 in 15-minute steps
+FIRST_NAMES = ["aarav", "vivaan", "aditya", "diya", "ananya", "ishaan", "saanvi", "kabir",
+               "meera", "rohan", "navya", "arjun", "kiara", "reyansh", "tara", "vihaan"]
+LAST_NAMES = ["sharma", "verma", "gupta", "agarwal", "rana", "tyagi", "jaiswal", "mehta",
+              "iyer", "nair", "reddy", "bose", "kapoor", "singh", "das", "joshi"]
+SPECIALIZATIONS = ["dentist", "physician", "cardiologist", "dermatologist",
+                   "gastroenterologist", "neurologist", "orthopedist", "pediatrician"]
+ROUTES = ["book_appointment", "doctor_view_appointments", "admin_view_patients", "search_doctors"]
+
+
+def slot_time(index):
+    minutes = 9 * 60 + 15 * index
+    return dt_time(minutes // 60, minutes % 60)
+
+
+# ---------------- Seeding ----------------
+
+def seed(engine, n_patients, n_doctors, n_appointments, rng, batch_size=10000):
+    """Bulk-insert synthetic rows with explicit IDs. Returns {patient_id: otp}."""
+    from sqlalchemy import insert
+    import models
+
+    models.Base.metadata.create_all(bind=engine)
+    otps = {}
+    with engine.begin() as conn:
+        conn.execute(insert(models.Doctor), [
+            {"id": i, "name": f"dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+             "specialization": rng.choice(SPECIALIZATIONS), "username": str(i), "password": f"doctor_{i}"}
+            for i in range(1, n_doctors + 1)
+        ])
+        for start in range(1, n_patients + 1, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, n_patients + 1)):
+                otps[i] = f"{rng.randrange(10000):04d}"
+                rows.append({
+                    "id": i, "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "age": rng.randint(1, 90), "gender": rng.choice(["Male", "Female"]),
+                    "dob": date(1950, 1, 1) + timedelta(days=rng.randrange(25000)),
+                    "contact": str(6000000000 + i), "symptoms": "fever", "otp_code": otps[i],
+                })
+            conn.execute(insert(models.Patient), rows)
+
+        # Distinct (doctor, day, slot) cells so seeded data never violates the slot index
+        grid = n_doctors * SEED_DAYS * SLOTS_PER_DAY
+        cells = rng.sample(range(grid), min(n_appointments, grid))
+        today = date.today()
+        for start in range(0, len(cells), batch_size):
+            rows = []
+            for aid, cell in enumerate(cells[start:start + batch_size], start=start + 1):
+                doctor, rest = divmod(cell, SEED_DAYS * SLOTS_PER_DAY)
+                day, slot = divmod(rest, SLOTS_PER_DAY)
+                rows.append({
+                    "id": aid, "patient_id": rng.randint(1, n_patients), "doctor_id": doctor + 1,
+                    "appointment_date": today + timedelta(days=day), "appointment_time": slot_time(slot),
+                    "status": "Cancelled" if rng.random() < 0.1 else "Booked",
+                })
+            conn.execute(insert(models.Appointment), rows)
+    return otps
+
+
+# ---------------- Load generation ----------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def drive(clients, send, total):
+    """Run `total` requests spread over the clients (one task each)."""
+    latencies = []
+    statuses = Counter()
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            t0 = time.perf_counter()
+            response = await send(client, i)
+            latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(c) for c in clients))
+    return time.perf_counter() - started, latencies, statuses
+
+
+async def run_routes(app, args, otps, rng, registry):
+    import httpx
+
+    n_doctors = args.doctors
+    patient_ids = list(otps)
+    booking_start = date.today() + timedelta(days=SEED_DAYS + 1)
+
+    def booking(client, i):
+        # Walk fresh (doctor, day, slot) cells after the seeded range: every booking should succeed
+        day, rest = divmod(i, n_doctors * SLOTS_PER_DAY)
+        doctor, slot = divmod(rest, SLOTS_PER_DAY)
+        pid = rng.choice(patient_ids)
+        return client.post("/patient/book_appointment", data={
+            "patient_id": pid, "doctor_id": doctor + 1,
+            "appointment_date": (booking_start + timedelta(days=day)).isoformat(),
+            "appointment_time": slot_time(slot).strftime("%H:%M"), "otp": otps[pid],
+        })
+
+    routes = {
+        "book_appointment": (("POST", "/patient/book_appointment"), booking),
+        "doctor_view_appointments": (("GET", "/doctor/view_appointments"),
+                                     lambda c, i: c.get("/doctor/view_appointments")),
+        "admin_view_patients": (("GET", "/admin/view_patients"),
+                                lambda c, i: c.get("/admin/view_patients")),
+        "search_doctors": (("GET", "/patient/search_doctors"),
+                           lambda c, i: c.get("/patient/search_doctors",
+                                              params={"term": rng.choice(FIRST_NAMES + LAST_NAMES)[:4]})),
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    clients = [httpx.AsyncClient(transport=transport, base_url="http://benchmark")
+               for _ in range(args.concurrency)]
+    results = {}
+    try:
+        # Each worker is a different doctor, logged in through the real route
+        for n, client in enumerate(clients):
+            did = n % n_doctors + 1
+            await client.post("/doctor/login", data={"username": str(did), "password": f"doctor_{did}"})
+
+        for name in args.routes:
+            key, send = routes[name]
+            if name != "book_appointment":
+                await drive(clients, send, args.warmup)
+            registry.reset()
+            elapsed, latencies, statuses = await drive(clients, send, args.requests)
+            server = registry.snapshot().get(key, {})
+            latencies.sort()
+            count = len(latencies)
+            results[name] = {
+                "method": key[0],
+                "route": key[1],
+                "requests": count,
+                "seconds": round(elapsed, 3),
+                "req_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+                "latency_ms": {
+                    "mean": round(sum(latencies) * 1000 / count, 3) if count else 0.0,
+                    **{f"p{q}": round(percentile(latencies, q / 100) * 1000, 3) for q in (50, 90, 95, 99)},
+                    "max": round(latencies[-1] * 1000, 3) if count else 0.0,
+                },
+                "statuses": {str(k): v for k, v in sorted(statuses.items())},
+                "db_queries_per_request": round(server.get("db_queries", 0) / count, 2) if count else 0.0,
+                "db_ms_per_request": round(server.get("db_ms", 0.0) / count, 3) if count else 0.0,
+            }
+            r = results[name]
+            print(f"{key[0]:4} {key[1]:32} {r['req_per_sec']:>8} req/s  "
+                  f"p50 {r['latency_ms']['p50']:>7} ms  p95 {r['latency_ms']['p95']:>7} ms  "
+                  f"p99 {r['latency_ms']['p99']:>7} ms  {r['db_queries_per_request']:>5} queries/req  "
+                  f"statuses {r['statuses']}")
+    finally:
+        for client in clients:
+            await client.aclose()
+    return results
+
+
+# ---------------- Reporting ----------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nvs. {previous_path} (commit {previous.get('commit')}):")
+    for name, r in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if not old:
+            continue
+        rps = (r["req_per_sec"] / old["req_per_sec"] - 1) * 100 if old["req_per_sec"] else 0.0
+        p95 = (r["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1) * 100 if old["latency_ms"]["p95"] else 0.0
+        print(f"  {name:26} req/s {rps:+6.1f}%   p95 {p95:+6.1f}%   "
+              f"queries/req {old['db_queries_per_request']} -> {r['db_queries_per_request']}")
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the hot routes of main.app against seeded SQLite.")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--appointments", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per read route")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="result file (default: benchmark-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="hospital-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    # Must be set before db/main are imported: the engines are created at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    # All simulated patients share one client IP; measure booking, not the OTP limiter
+    os.environ["OTP_ATTEMPTS_PER_IP"] = os.environ["OTP_ATTEMPTS_PER_PATIENT"] = "1000000"
+    os.environ.setdefault("SESSION_SECRET_KEY", secrets.token_urlsafe(32))
+
+    import db
+    started = time.perf_counter()
+    otps = seed(db.engine, args.patients, args.doctors, args.appointments, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f"Seeded {args.doctors} doctors, {args.patients} patients, {args.appointments} appointments "
+          f"in {seed_seconds:.1f}s ({db_path})")
+
+    output = os.path.abspath(args.output or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    previous = os.path.abspath(args.compare) if args.compare else None
+    # main.py resolves static/ and templates/ relative to the working directory.
+    # Importing it builds the availability and search indexes from the seeded data.
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    import main as web
+    import metrics
+
+    results = asyncio.run(run_routes(web.app, args, otps, rng, metrics.registry))
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: getattr(args, k) for k in
+                   ("patients", "doctors", "appointments", "concurrency", "requests", "warmup", "seed")},
+        "seed_seconds": round(seed_seconds, 2),
+        "results": results,
+        "pool": db.pool_stats(),
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResults written to {output}")
+    if previous:
+        compare(report, previous)
+
+    db.engine.dispose()
+    try:
+        os.remove(db_path)
+        os.rmdir(workdir)
+    except OSError:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
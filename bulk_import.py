@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+bulk_import.py
+Bulk patient registration from a CSV file in the data/patients.txt layout:
+
+    id,name,age,gender,dob (dd-mm-yyyy),contact,symptoms
+
+The id column is ignored; the database assigns new patient IDs.
+Every row gets a 4-digit OTP, as crud.create_patient does.
+
+The whole file is imported in one transaction, batch by batch:
+- PostgreSQL: COPY each batch into a temp table, then one
+  INSERT ... SELECT ... ON CONFLICT (contact) DO NOTHING RETURNING contact
+- SQLite: batched executemany INSERT ... ON CONFLICT DO NOTHING RETURNING
+- other databases: look up existing contacts per batch, then executemany
+
+Invalid rows and contacts that are already registered (in the database or
+earlier in the file) are skipped and listed in the error report instead of
+aborting the import.
+
+Usage:
+    python bulk_import.py patients.csv [--batch-size 5000] [--errors errors.csv]
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import Patient
+
+BATCH_SIZE = 5000
+FIELDS = ["name", "age", "gender", "dob", "contact", "symptoms", "otp_code"]
+
+
+def parse_row(row):
+    """
+    Validate one CSV row; returns a dict ready for insert.
+    Raises ValueError with a readable message.
+    """
+    if len(row) < 7:
+        raise ValueError(f"expected 7 columns, got {len(row)}")
+    _, name, age, gender, dob, contact, symptoms = [c.strip() for c in row[:7]]
+    if not name:
+        raise ValueError("name is empty")
+    try:
+        age = int(age) if age else None
+    except ValueError:
+        raise ValueError(f"age '{age}' is not a number")
+    try:
+        dob = datetime.strptime(dob, "%d-%m-%Y").date() if dob else None
+    except ValueError:
+        raise ValueError(f"dob '{dob}' is not dd-mm-yyyy")
+    if not (len(contact) == 10 and contact.isdigit()):
+        raise ValueError(f"contact '{contact}' is not a 10-digit number")
+    return {
+        "name": name[:100],
+        "age": age,
+        "gender": gender.title()[:20],
+        "dob": dob,
+        "contact": contact,
+        "symptoms": symptoms[:255],
+    }
+
+
+def generate_otps(n):
+    """4-digit OTPs (0000-9999), same format as crud.create_patient."""
+    return [str(v).zfill(4) for v in random.choices(range(10000), k=n)]
+
+
+# ---------------- Batch writers ----------------
+
+def _insert_postgres_copy(conn, batch):
+    """COPY into a temp table, then move rows over skipping taken contacts."""
+    raw = conn.connection.driver_connection
+    cursor = raw.cursor()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in batch:
+        writer.writerow([
+            r["name"], r["age"] if r["age"] is not None else "", r["gender"],
+            r["dob"].isoformat() if r["dob"] else "", r["contact"], r["symptoms"], r["otp_code"]
+        ])
+    copy_sql = f"COPY patients_import ({', '.join(FIELDS)}) FROM STDIN WITH (FORMAT csv)"
+    if hasattr(cursor, "copy_expert"):      # psycopg2
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+    else:                                   # psycopg 3
+        with cursor.copy(copy_sql) as copy:
+            copy.write(buffer.getvalue())
+    cursor.execute(
+        f"INSERT INTO patients ({', '.join(FIELDS)}) "
+        f"SELECT {', '.join(FIELDS)} FROM patients_import "
+        "ON CONFLICT (contact) DO NOTHING RETURNING contact"
+    )
+    inserted = {row[0] for row in cursor.fetchall()}
+    cursor.execute("TRUNCATE patients_import")
+    cursor.close()
+    return inserted
+
+
+def _insert_on_conflict(conn, batch, dialect_insert):
+    stmt = (
+        dialect_insert(Patient)
+        .on_conflict_do_nothing(index_elements=["contact"])
+        .returning(Patient.contact)
+    )
+    return set(conn.scalars(stmt, batch).all())
+
+
+def _insert_checked(conn, batch):
+    taken = set(conn.scalars(
+        select(Patient.contact).where(Patient.contact.in_([r["contact"] for r in batch]))
+    ))
+    fresh = [r for r in batch if r["contact"] not in taken]
+    if fresh:
+        conn.execute(insert(Patient), fresh)
+    return {r["contact"] for r in fresh}
+
+
+def _batch_writer(conn):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE IF NOT EXISTS patients_import ("
+            "name VARCHAR(100), age INTEGER, gender VARCHAR(20), dob DATE, "
+            "contact VARCHAR(20), symptoms VARCHAR(255), otp_code VARCHAR(6)"
+            ") ON COMMIT DROP"
+        )
+        return _insert_postgres_copy
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return lambda c, batch: _insert_on_conflict(c, batch, sqlite_insert)
+    return _insert_checked
+
+
+# ---------------- Import ----------------
+
+def import_patients(engine, lines, batch_size=BATCH_SIZE, progress=None):
+    """
+    Import patients from an iterable of CSV lines (an open file works).
+    Returns a report dict: inserted, failed, errors (line, contact, error),
+    seconds and rows_per_second. progress(report) is called after each batch.
+    """
+    started = time.perf_counter()
+    report = {"inserted": 0, "failed": 0, "errors": [], "seconds": 0.0, "rows_per_second": 0.0}
+    seen_contacts = {}
+
+    def fail(line_no, contact, error):
+        report["failed"] += 1
+        report["errors"].append({"line": line_no, "contact": contact, "error": error})
+
+    def flush(conn, writer, batch, lines_by_contact):
+        for row, otp in zip(batch, generate_otps(len(batch))):
+            row["otp_code"] = otp
+        inserted = writer(conn, batch)
+        report["inserted"] += len(inserted)
+        for row in batch:
+            if row["contact"] not in inserted:
+                fail(lines_by_contact[row["contact"]], row["contact"], "contact already registered")
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = round(report["inserted"] / elapsed, 1) if elapsed else 0.0
+        if progress:
+            progress(report)
+
+    with engine.begin() as conn:
+        writer = _batch_writer(conn)
+        batch, lines_by_contact = [], {}
+        for line_no, row in enumerate(csv.reader(lines), start=1):
+            if not row or (line_no == 1 and row[0].strip().lower() == "id"):
+                continue  # blank line / header
+            try:
+                record = parse_row(row)
+            except ValueError as e:
+                fail(line_no, row[5].strip() if len(row) > 5 else "", str(e))
+                continue
+            contact = record["contact"]
+            if contact in seen_contacts:
+                fail(line_no, contact, f"duplicate contact (first seen on line {seen_contacts[contact]})")
+                continue
+            seen_contacts[contact] = line_no
+            lines_by_contact[contact] = line_no
+            batch.append(record)
+            if len(batch) >= batch_size:
+                flush(conn, writer, batch, lines_by_contact)
+                batch, lines_by_contact = [], {}
+        if batch:
+            flush(conn, writer, batch, lines_by_contact)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["inserted"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+def write_error_report(errors, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["line", "contact", "error"])
+        writer.writeheader()
+        writer.writerows(errors)
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import patients from CSV.")
+    parser.add_argument("file", help="CSV in the data/patients.txt layout")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--errors", help="write rejected rows to this CSV file")
+    args = parser.parse_args(argv)
+
+    from db import engine
+
+    def show(report):
+        print(f"  {report['inserted']} inserted, {report['failed']} rejected, "
+              f"{report['rows_per_second']} rows/s")
+
+    with open(args.file, newline="", encoding="utf-8") as f:
+        report = import_patients(engine, f, batch_size=args.batch_size, progress=show)
+
+    print(f"✅ Imported {report['inserted']} patients in {report['seconds']}s "
+          f"({report['rows_per_second']} rows/s), {report['failed']} rejected.")
+    if report["errors"]:
+        if args.errors:
+            write_error_report(report["errors"], args.errors)
+            print(f"Rejected rows written to {args.errors}")
+        else:
+            for e in report["errors"][:20]:
+                print(f"  line {e['line']}: {e['contact']} - {e['error']}")
+            if len(report["errors"]) > 20:
+                print(f"  ... {len(report['errors']) - 20} more (use --errors FILE)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,81 @@
  # crud.py
+import os
+from bisect import bisect_right
+from collections import Counter, namedtuple
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import models
-from models import Patient, Doctor, Appointment
-from datetime import datetime
+import availability
+import daily_stats
+import patient_search
+from cache import TTLCache
+from otp_guard import otp_matches
+from models import Patient, Doctor, Appointment, AppointmentSeries
+from datetime import date as date_type, datetime, timedelta
 import random
 
 
+# ---------------------------------------------------------
+#                     PAGINATION
+# ---------------------------------------------------------
+# List screens use keyset (cursor) pagination: each page filters on the last
+# key of the previous page instead of using OFFSET, so page N costs the same
+# as page 1.
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+
+def _page_size(page_size):
+    if not page_size or page_size < 1:
+        return PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def _split_page(rows, size, cursor_of):
+    """
+    rows holds up to size + 1 items; the extra one only tells us
+    whether another page exists.
+    """
+    if len(rows) > size:
+        rows = rows[:size]
+        return rows, cursor_of(rows[-1])
+    return rows, None
+
+
+def _decode_id_cursor(cursor):
+    try:
+        return int(cursor) if cursor else None
+    except ValueError:
+        return None
+
+
+def _appointment_cursor(appointment):
+    return "{}_{}_{}".format(
+        appointment.appointment_date.isoformat(),
+        appointment.appointment_time.strftime("%H:%M:%S"),
+        appointment.id
+    )
+
+
+def _decode_appointment_cursor(cursor):
+    """
+    "YYYY-MM-DD_HH:MM:SS_id" -> (date, time, id), None if missing/invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        date_str, time_str, id_str = cursor.split("_")
+        return (
+            datetime.strptime(date_str, "%Y-%m-%d").date(),
+            datetime.strptime(time_str, "%H:%M:%S").time(),
+            int(id_str)
+        )
+    except ValueError:
+        return None
+
+
 # ---------------------------------------------------------
 #                     PATIENT CRUD
 # ---------------------------------------------------------
@@ -32,6 +102,7 @@ def create_patient(db, name, age, gender, dob, contact, symptoms):
     db.add(new_patient)
     db.commit()
     db.refresh(new_patient)
+    patient_search.index_patient(new_patient)
     return new_patient
 
 
@@ -43,9 +114,38 @@ def get_patients(db: Session, search: str = None):
     """
     List all patients or filter by ID/name/contact.
     OTP is never hidden here, hiding happens in templates.
+    A search returns the top matches ranked by similarity (see patient_search);
+    short or all-digit terms return every substring match.
+    """
+    if search and patient_search.backend is not None and patient_search.ranked(search):
+        return patient_search.search_patients(db, search)
+    query = _filter_patients(db.query(Patient), search)
+    return query.order_by(Patient.id).all()
+
+
+def get_patients_page(db: Session, search: str = None, after: str = None, page_size: int = None):
+    """
+    One page of patients ordered by ID, optionally filtered like get_patients.
+    Returns (patients, next_cursor); next_cursor is None on the last page.
+    A ranked search is a single page of the best matches, with no next page;
+    short or all-digit terms page through substring matches like a listing.
     """
-    query = db.query(Patient)
+    size = _page_size(page_size)
+    if search and patient_search.backend is not None and patient_search.ranked(search):
+        return patient_search.search_patients(db, search, size), None
+
+    query = _filter_patients(db.query(Patient), search)
+
+    after_id = _decode_id_cursor(after)
+    if after_id is not None:
+        query = query.filter(Patient.id > after_id)
 
+    rows = query.order_by(Patient.id).limit(size + 1).all()
+    return _split_page(rows, size, lambda p: str(p.id))
+
+
+def _filter_patients(query, search):
+    # ILIKE filter: short or all-digit terms (see patient_search.ranked), or no search backend
     if search:
         like = f"%{search}%"
         if search.isdigit():
@@ -59,8 +159,7 @@ def get_patients(db: Session, search: str = None):
                 (Patient.name.ilike(like)) |
                 (Patient.contact.ilike(like))
             )
-
-    return query.order_by(Patient.id).all()
+    return query
 
 
 def search_patient(db: Session, term: str):
@@ -80,6 +179,7 @@ def update_patient(db: Session, patient_id: int, **kwargs):
 
     db.commit()
     db.refresh(patient)
+    patient_search.index_patient(patient)
     return patient
 
 
@@ -88,8 +188,20 @@ def delete_patient(db: Session, patient_id: int):
     if not patient:
         return None
 
+    changes = Counter()
+    freed = []
+    for appointment in patient.appointments:  # deleted with the patient
+        changes.update(daily_stats.delta(
+            appointment.doctor_id, appointment.appointment_date, appointment.status, -1
+        ))
+        if appointment.status != "Cancelled" and appointment.appointment_time is not None:
+            freed.append((appointment.doctor_id, appointment.appointment_date, appointment.appointment_time))
     db.delete(patient)
+    _apply_stats(db, changes)
     db.commit()
+    patient_search.unindex_patient(patient_id)
+    for doctor_id, day, t in freed:
+        availability.index.release(doctor_id, day, t)
     return patient
 
 
@@ -114,6 +226,7 @@ def create_doctor(db: Session, name: str, specialization: str):
 
     db.commit()
     db.refresh(doctor)
+    invalidate_doctor_directory()
 
     return doctor   # Never expose password in UI
 
@@ -123,11 +236,28 @@ def get_doctor(db: Session, doctor_id: int):
 
 
 def get_doctors(db: Session, search: str = None):
-    query = db.query(Doctor)
+    """
+    Doctor directory (served from the cache), optionally filtered by name.
+    """
+    doctors = _doctor_directory(db)
     if search:
-        like = f"%{search}%"
-        query = query.filter(Doctor.name.ilike(like))
-    return query.all()
+        term = search.lower()
+        return [d for d in doctors if term in (d.name or "").lower()]
+    return doctors
+
+
+def get_doctors_page(db: Session, after: str = None, page_size: int = None):
+    """
+    One page of doctors ordered by ID, sliced from the cached directory.
+    Returns (doctors, next_cursor); next_cursor is None on the last page.
+    """
+    size = _page_size(page_size)
+    doctors = _doctor_directory(db)
+
+    after_id = _decode_id_cursor(after)
+    start = bisect_right(doctors, after_id, key=lambda d: d.id) if after_id is not None else 0
+
+    return _split_page(doctors[start:start + size + 1], size, lambda d: str(d.id))
 
 
 def update_doctor(db: Session, doctor_id: int, **kwargs):
@@ -141,6 +271,8 @@ def update_doctor(db: Session, doctor_id: int, **kwargs):
 
     db.commit()
     db.refresh(doctor)
+    invalidate_doctor_directory()
+    invalidate_doctor_profile(doctor_id)
     return doctor
 
 
@@ -149,8 +281,15 @@ def delete_doctor(db: Session, doctor_id: int):
     if not doctor:
         return None
 
+    # Its appointments go with it; so do their counts
+    db.execute(delete(models.DailyAppointmentStats).where(
+        models.DailyAppointmentStats.doctor_id == doctor_id
+    ))
     db.delete(doctor)
     db.commit()
+    invalidate_doctor_directory()
+    invalidate_doctor_profile(doctor_id)
+    availability.index.drop_doctor(doctor_id)
     return doctor
 
 def search_doctor(db: Session, term: str):
@@ -159,33 +298,133 @@ def search_doctor(db: Session, term: str):
     - ID (numeric)
     - Name
     - Specialization
+    Matching is case-insensitive "contains", done on the cached directory.
     """
-    query = db.query(Doctor)
-    like = f"%{term}%"
-
-    # If search term is a number: also check ID
-    if term.isdigit():
-        return query.filter(
-            (Doctor.id == int(term)) |
-            (Doctor.name.ilike(like)) |
-            (Doctor.specialization.ilike(like))
-        ).all()
-    
-    # If not a number: search by name or specialization
-    return query.filter(
-        (Doctor.name.ilike(like)) |
-        (Doctor.specialization.ilike(like))
-    ).all()
+    needle = term.lower()
+    exact_id = int(term) if term.isdigit() else None
+    return [
+        d for d in _doctor_directory(db)
+        if d.id == exact_id
+        or needle in (d.name or "").lower()
+        or needle in (d.specialization or "").lower()
+    ]
+
+
+# ---------------------------------------------------------
+#                DOCTOR DIRECTORY CACHE
+# ---------------------------------------------------------
+# The doctors table changes a few times a day but is read by every listing,
+# search and booking page, so the public part of it (no credentials) is kept
+# in memory. Writes through crud or /admin/update_doctor invalidate it; other
+# workers pick changes up within DOCTOR_CACHE_TTL seconds.
+
+DOCTOR_CACHE_TTL = float(os.getenv("DOCTOR_CACHE_TTL", "300"))
+# Above this many doctors the directory is not cached (reads go to the DB)
+DOCTOR_CACHE_MAX_ROWS = int(os.getenv("DOCTOR_CACHE_MAX_ROWS", "10000"))
+
+DoctorEntry = namedtuple("DoctorEntry", ["id", "name", "specialization"])
 
+doctor_directory = TTLCache(maxsize=1, ttl=DOCTOR_CACHE_TTL)
 
 
+def _doctor_directory(db: Session):
+    """All doctors ordered by ID, as read-only DoctorEntry tuples."""
+    doctors = doctor_directory.get("all")
+    if doctors is None:
+        rows = db.query(Doctor.id, Doctor.name, Doctor.specialization).order_by(Doctor.id)
+        doctors = [DoctorEntry(*row) for row in rows]
+        if len(doctors) <= DOCTOR_CACHE_MAX_ROWS:
+            doctor_directory.set("all", doctors)
+    return doctors
+
+
+def invalidate_doctor_directory():
+    doctor_directory.clear()
+
+
+# ---------------------------------------------------------
+#                DOCTOR PROFILE CACHE
+# ---------------------------------------------------------
+# Identity of logged-in doctors (ID, name, specialization), so doctor pages
+# don't look the doctor up on every request. Filled at login; crud.update_doctor,
+# crud.delete_doctor and /admin/update_doctor invalidate the entry.
+
+DOCTOR_PROFILE_CACHE_SIZE = int(os.getenv("DOCTOR_PROFILE_CACHE_SIZE", "1024"))
+
+doctor_profiles = TTLCache(maxsize=DOCTOR_PROFILE_CACHE_SIZE, ttl=DOCTOR_CACHE_TTL)
+
+
+def cache_doctor_profile(doctor):
+    """Store a doctor (ORM object or row) and return its DoctorEntry."""
+    profile = DoctorEntry(doctor.id, doctor.name, doctor.specialization)
+    doctor_profiles.set(profile.id, profile)
+    return profile
+
+
+def get_doctor_profile(db: Session, doctor_id: int):
+    """Cached DoctorEntry for a doctor, loaded on a miss; None if there is no such doctor."""
+    profile = doctor_profiles.get(doctor_id)
+    if profile is None:
+        row = db.execute(
+            select(Doctor.id, Doctor.name, Doctor.specialization).where(Doctor.id == doctor_id)
+        ).first()
+        if row is None:
+            return None
+        profile = cache_doctor_profile(row)
+    return profile
+
+
+def invalidate_doctor_profile(doctor_id: int):
+    doctor_profiles.pop(doctor_id)
+
 
 
 # ---------------------------------------------------------
 #                     APPOINTMENTS CRUD
 # ---------------------------------------------------------
 
+class SlotTakenError(Exception):
+    """The doctor already has a live appointment at this date/time."""
+
+
+def _is_slot_violation(error: IntegrityError):
+    # PostgreSQL names the index; SQLite lists the indexed columns.
+    message = str(error.orig)
+    return (
+        "uq_appointments_active_slot" in message or
+        "UNIQUE constraint failed: appointments." in message
+    )
+
+
+def _apply_stats(db: Session, changes):
+    """Add daily_stats deltas in the current transaction."""
+    daily_stats.apply(db, changes)
+
+
+def _commit_slot(db: Session, stats=None):
+    """
+    Commit, turning a hit on uq_appointments_active_slot into SlotTakenError.
+    The unique index does the conflict check, so no extra SELECT is needed.
+    `stats` deltas are applied in the same transaction.
+    """
+    try:
+        # SessionLocal has autoflush off: flush explicitly so a slot clash
+        # surfaces from the appointment INSERT, before the stats are touched
+        db.flush()
+        if stats:
+            _apply_stats(db, stats)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _is_slot_violation(e):
+            raise SlotTakenError("Doctor already has an appointment at this time.") from e
+        raise
+
+
 def create_appointment(db: Session, patient_id: int, doctor_id: int, date: str, time: str):
+    """
+    Book a slot. Raises SlotTakenError if the doctor is already booked then.
+    """
     appointment_date = datetime.strptime(date, "%Y-%m-%d").date()
     appointment_time = datetime.strptime(time, "%H:%M").time()
 
@@ -198,18 +437,338 @@ def create_appointment(db: Session, patient_id: int, doctor_id: int, date: str,
     )
 
     db.add(appointment)
-    db.commit()
+    try:
+        _commit_slot(db, daily_stats.delta(doctor_id, appointment_date, "Booked"))
+    except SlotTakenError:
+        # Someone else holds the slot; make sure the index knows it too
+        availability.index.mark_taken(doctor_id, appointment_date, appointment_time)
+        raise
     db.refresh(appointment)
+    availability.index.book(doctor_id, appointment_date, appointment_time)
     return appointment
 
 
+# Largest batch accepted by create_appointments_batch
+BATCH_BOOKING_MAX = int(os.getenv("BATCH_BOOKING_MAX", "1000"))
+
+
+def _insert_slots(db: Session, rows):
+    """Insert appointment rows in one executemany; a taken slot raises SlotTakenError."""
+    try:
+        db.execute(insert(Appointment), rows)
+    except IntegrityError as e:
+        db.rollback()
+        if _is_slot_violation(e):
+            raise SlotTakenError("Doctor already has an appointment at this time.") from e
+        raise
+
+
+def _batch_result(status, appointment_id=None, error=None):
+    return {"status": status, "appointment_id": appointment_id, "error": error}
+
+
+def create_appointments_batch(db: Session, items, retries: int = 1):
+    """
+    Book many slots at once. items: (patient_id, doctor_id, "YYYY-MM-DD", "HH:MM").
+    Unknown patients/doctors and taken slots are found with set-based
+    queries (one per table), slots repeated inside the batch are rejected in
+    memory, and all valid rows are inserted in one transaction.
+    Returns one result per item, in order, with status "booked", "conflict"
+    (slot already taken), "duplicate" (same slot earlier in the batch) or
+    "invalid". If a concurrent booking takes a slot between the check and
+    the commit, the batch is re-checked `retries` times before
+    SlotTakenError is raised.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    parsed = {}  # item index -> (patient_id, (doctor_id, date, time))
+    wanted = {}  # (doctor_id, date, time) -> index of the item that gets it
+    for i, item in enumerate(items):
+        try:
+            patient_id, doctor_id, date, time = item
+            key = (
+                int(doctor_id),
+                datetime.strptime(date, "%Y-%m-%d").date(),
+                datetime.strptime(time, "%H:%M").time()
+            )
+            patient_id = int(patient_id)
+        except (TypeError, ValueError):
+            results[i] = _batch_result(
+                "invalid", error="Expected patient_id, doctor_id, date (YYYY-MM-DD) and time (HH:MM)."
+            )
+            continue
+        if key in wanted:
+            results[i] = _batch_result("duplicate", error=f"Same slot as item {wanted[key]}.")
+            continue
+        wanted[key] = i
+        parsed[i] = (patient_id, key)
+
+    if parsed:
+        known_patients = set(db.scalars(
+            select(Patient.id).where(Patient.id.in_({p for p, _ in parsed.values()}))
+        ))
+        known_doctors = set(db.scalars(
+            select(Doctor.id).where(Doctor.id.in_({key[0] for _, key in parsed.values()}))
+        ))
+        for i, (patient_id, key) in list(parsed.items()):
+            if patient_id not in known_patients:
+                results[i] = _batch_result("invalid", error=f"Patient {patient_id} not found.")
+            elif key[0] not in known_doctors:
+                results[i] = _batch_result("invalid", error=f"Doctor {key[0]} not found.")
+            else:
+                continue
+            del parsed[i]
+
+    slot = (Appointment.doctor_id, Appointment.appointment_date, Appointment.appointment_time)
+    live = Appointment.status != "Cancelled"
+    for attempt in range(retries + 1):
+        taken = set()
+        if parsed:
+            taken = {tuple(row) for row in db.execute(
+                select(*slot).where(live, tuple_(*slot).in_([key for _, key in parsed.values()]))
+            )}
+        free = {parsed[i][1]: i for i in parsed if parsed[i][1] not in taken}
+        try:
+            ids = {}
+            if free:
+                # One executemany; the ORM would fall back to one INSERT per row to get the IDs back
+                _insert_slots(db, [
+                    {
+                        "patient_id": parsed[i][0],
+                        "doctor_id": key[0],
+                        "appointment_date": key[1],
+                        "appointment_time": key[2],
+                        "status": "Booked"
+                    }
+                    for key, i in free.items()
+                ])
+                # Live slots are unique, so the slot identifies the new row
+                ids = {tuple(row[1:]): row[0] for row in db.execute(
+                    select(Appointment.id, *slot).where(live, tuple_(*slot).in_(list(free)))
+                )}
+            _commit_slot(db, Counter((key[0], key[1], "Booked") for key in free))
+        except SlotTakenError:
+            if attempt == retries:
+                raise
+            continue
+        break
+
+    for i, (_, key) in parsed.items():
+        if key in free:
+            availability.index.book(*key)
+            results[i] = _batch_result("booked", ids[key])
+        else:
+            # Taken slots may be missing from this worker's index too
+            availability.index.mark_taken(*key)
+            results[i] = _batch_result("conflict", error="Doctor already has an appointment at this time.")
+    return results
+
+
+# ---------------------------------------------------------
+#                RECURRING APPOINTMENT SERIES
+# ---------------------------------------------------------
+
+class SeriesConflictError(SlotTakenError):
+    """Some occurrences of a series fall on taken slots; `dates` lists them."""
+
+    def __init__(self, dates):
+        super().__init__(f"{len(dates)} occurrence(s) clash with existing appointments.")
+        self.dates = dates
+
+
+def expand_series(start_date, end_date, weekdays, interval_weeks=1):
+    """
+    Dates from start_date to end_date (inclusive) falling on `weekdays`
+    (0 = Monday) in every `interval_weeks`-th week, counting from the
+    week of start_date.
+    """
+    wanted = set(weekdays)
+    first_monday = start_date - timedelta(days=start_date.weekday())
+    dates = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in wanted and ((day - first_monday).days // 7) % interval_weeks == 0:
+            dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def create_appointment_series(
+    db: Session, patient_id: int, doctor_id: int, start_date: str, end_date: str, time: str,
+    weekdays=None, interval_weeks: int = 1, skip_conflicts: bool = False
+):
+    """
+    Book a recurring series. weekdays defaults to the weekday of start_date.
+    All occurrences are checked against existing bookings in one query
+    (on ix_appointments_doctor_slot) and inserted in one executemany.
+    Taken dates raise SeriesConflictError, or are left out when
+    skip_conflicts is set. Raises ValueError for a bad rule or unknown
+    patient/doctor. Returns (series, booked dates, skipped dates).
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    appointment_time = datetime.strptime(time, "%H:%M").time()
+    weekdays = sorted(set(weekdays)) if weekdays else [start.weekday()]
+    if end < start:
+        raise ValueError("End date is before start date.")
+    if interval_weeks < 1 or not all(0 <= d <= 6 for d in weekdays):
+        raise ValueError("Weekdays must be 0 (Monday) to 6 and the interval at least 1 week.")
+    dates = expand_series(start, end, weekdays, interval_weeks)
+    if not dates:
+        raise ValueError("The rule gives no dates in this range.")
+    if len(dates) > BATCH_BOOKING_MAX:
+        raise ValueError(f"A series can have at most {BATCH_BOOKING_MAX} occurrences.")
+    if db.get(Patient, patient_id) is None:
+        raise ValueError(f"Patient {patient_id} not found.")
+    if db.get(Doctor, doctor_id) is None:
+        raise ValueError(f"Doctor {doctor_id} not found.")
+
+    taken = set(db.scalars(
+        select(Appointment.appointment_date).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date.in_(dates),
+            Appointment.appointment_time == appointment_time,
+            Appointment.status != "Cancelled"
+        )
+    ))
+    for day in taken:
+        availability.index.mark_taken(doctor_id, day, appointment_time)
+    if taken and not skip_conflicts:
+        raise SeriesConflictError(sorted(taken))
+    free = [day for day in dates if day not in taken]
+    if not free:
+        raise SeriesConflictError(sorted(taken))
+
+    series = AppointmentSeries(
+        patient_id=patient_id,
+        doctor_id=doctor_id,
+        start_date=start,
+        end_date=end,
+        appointment_time=appointment_time,
+        weekdays=",".join(str(d) for d in weekdays),
+        interval_weeks=interval_weeks,
+        status="Active"
+    )
+    db.add(series)
+    db.flush()
+    _insert_slots(db, [
+        {
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "appointment_date": day,
+            "appointment_time": appointment_time,
+            "status": "Booked",
+            "series_id": series.id
+        }
+        for day in free
+    ])
+    _commit_slot(db, Counter((doctor_id, day, "Booked") for day in free))
+    for day in free:
+        availability.index.book(doctor_id, day, appointment_time)
+    return series, free, sorted(taken)
+
+
+def get_appointment_series(db: Session, series_id: int):
+    return db.get(AppointmentSeries, series_id)
+
+
+def get_series_occurrences(db: Session, series_id: int):
+    return db.scalars(
+        select(Appointment)
+        .where(Appointment.series_id == series_id)
+        .order_by(Appointment.appointment_date)
+    ).all()
+
+
+def cancel_appointment_series(db: Session, series_id: int, from_date=None):
+    """
+    Cancel every live occurrence on or after from_date (default today) with
+    one UPDATE, and mark the series cancelled. Earlier occurrences are kept
+    as history. Returns (series, number cancelled), or None if there is no
+    such series.
+    """
+    series = get_appointment_series(db, series_id)
+    if series is None:
+        return None
+    from_date = from_date or date_type.today()
+    where = (
+        Appointment.series_id == series_id,
+        Appointment.appointment_date >= from_date,
+        Appointment.status != "Cancelled"
+    )
+    # Locked, so the stats deltas match exactly the rows the UPDATE changes
+    freed = db.execute(
+        select(Appointment.doctor_id, Appointment.appointment_date, Appointment.appointment_time,
+               Appointment.status)
+        .where(*where)
+        .with_for_update()
+    ).all()
+    db.execute(
+        update(Appointment).where(*where).values(status="Cancelled")
+        .execution_options(synchronize_session=False)
+    )
+    series.status = "Cancelled"
+    changes = Counter()
+    for doctor_id, day, _, status in freed:
+        changes.update(daily_stats.transition(doctor_id, day, status, "Cancelled"))
+    _apply_stats(db, changes)
+    db.commit()
+    for doctor_id, day, t, _ in freed:
+        availability.index.release(doctor_id, day, t)
+    return series, len(freed)
+
+
 def get_appointment(db: Session, appointment_id: int):
     return db.query(Appointment).filter(Appointment.id == appointment_id).first()
 
 
 def get_appointments(db: Session, search: str = None, include_cancelled: bool = False):
-    query = db.query(Appointment)
+    query = _filter_appointments(db.query(Appointment), search, include_cancelled)
+    return query.all()
+
+
+def get_appointments_page(
+    db: Session,
+    search: str = None,
+    include_cancelled: bool = False,
+    status: str = None,
+    doctor_id: int = None,
+    patient_id: int = None,
+    after: str = None,
+    page_size: int = None
+):
+    """
+    One page of appointments ordered by (date, time, id).
+    Returns (appointments, next_cursor); next_cursor is None on the last page.
+    """
+    size = _page_size(page_size)
+    stmt = _appointments_page_stmt(search, include_cancelled, status, doctor_id, patient_id, after, size)
+    rows = db.scalars(stmt).all()
+    return _split_page(rows, size, _appointment_cursor)
+
+
+def _appointments_page_stmt(search, include_cancelled, status, doctor_id, patient_id, after, size):
+    """
+    SELECT for one appointments page; shared with crud_async.
+    """
+    stmt = _filter_appointments(select(Appointment), search, include_cancelled)
+
+    if status:
+        stmt = stmt.filter(Appointment.status == status)
+    if doctor_id is not None:
+        stmt = stmt.filter(Appointment.doctor_id == doctor_id)
+    if patient_id is not None:
+        stmt = stmt.filter(Appointment.patient_id == patient_id)
 
+    key = (Appointment.appointment_date, Appointment.appointment_time, Appointment.id)
+    last = _decode_appointment_cursor(after)
+    if last is not None:
+        stmt = stmt.filter(tuple_(*key) > tuple_(*last))
+
+    return stmt.order_by(*key).limit(size + 1)
+
+
+def _filter_appointments(query, search, include_cancelled):
     if not include_cancelled:
         query = query.filter(Appointment.status != "Cancelled")
 
@@ -222,8 +781,7 @@ def get_appointments(db: Session, search: str = None, include_cancelled: bool =
             (Appointment.appointment_date.like(like)) |
             (Appointment.appointment_time.like(like))
         )
-
-    return query.all()
+    return query
 
 
 def update_appointment_status(db: Session, appointment_id: int, status: str):
@@ -231,19 +789,57 @@ def update_appointment_status(db: Session, appointment_id: int, status: str):
     if not appointment:
         return None
 
+    changes = daily_stats.transition(
+        appointment.doctor_id, appointment.appointment_date, appointment.status, status
+    )
     appointment.status = status
-    db.commit()
+    _commit_slot(db, changes)  # re-activating a cancelled row can collide
     db.refresh(appointment)
+    _sync_availability(appointment)
+    return appointment
+
+
+def cancel_appointment(db: Session, appointment: Appointment):
+    """
+    Mark an appointment cancelled and free its slot.
+    """
+    changes = daily_stats.transition(
+        appointment.doctor_id, appointment.appointment_date, appointment.status, "Cancelled"
+    )
+    appointment.status = "Cancelled"
+    _apply_stats(db, changes)
+    db.commit()
+    _sync_availability(appointment)
     return appointment
 
 
+def _sync_availability(appointment: Appointment):
+    if appointment.appointment_date is None or appointment.appointment_time is None:
+        return
+    if appointment.status == "Cancelled":
+        availability.index.release(
+            appointment.doctor_id, appointment.appointment_date, appointment.appointment_time
+        )
+    else:
+        availability.index.book(
+            appointment.doctor_id, appointment.appointment_date, appointment.appointment_time
+        )
+
+
 def delete_appointment(db: Session, appointment_id: int):
     appointment = get_appointment(db, appointment_id)
     if not appointment:
         return None
 
     db.delete(appointment)
+    _apply_stats(db, daily_stats.delta(
+        appointment.doctor_id, appointment.appointment_date, appointment.status, -1
+    ))
     db.commit()
+    if appointment.status != "Cancelled" and appointment.appointment_time is not None:
+        availability.index.release(
+            appointment.doctor_id, appointment.appointment_date, appointment.appointment_time
+        )
     return appointment
 
 def get_appointments_for_doctor(db: Session, doctor_id: int):
@@ -253,6 +849,45 @@ def get_appointments_for_doctor(db: Session, doctor_id: int):
     ).all()
 
 
+def schedule_range(day, view: str = "day"):
+    """(first, last) date of the day, or of the Monday-Sunday week containing it."""
+    if view == "week":
+        monday = day - timedelta(days=day.weekday())
+        return monday, monday + timedelta(days=6)
+    return day, day
+
+
+def _doctor_schedule_stmt(doctor_id, first, last):
+    """
+    A doctor's live appointments between two dates with the patient's name
+    and contact, as one joined SELECT (rows, not ORM objects, so there is
+    nothing left to lazy-load). Shared with crud_async.
+    """
+    return (
+        select(
+            Appointment.id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.status,
+            Appointment.series_id,
+            Appointment.patient_id,
+            Patient.name.label("patient_name"),
+            Patient.contact.label("patient_contact")
+        )
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_date.between(first, last),
+            Appointment.status != "Cancelled"
+        )
+        .order_by(Appointment.appointment_date, Appointment.appointment_time, Appointment.id)
+    )
+
+
+def get_doctor_schedule(db: Session, doctor_id: int, first, last):
+    return db.execute(_doctor_schedule_stmt(doctor_id, first, last)).all()
+
+
 
 # ---------------------------------------------------------
 #                OTP VERIFICATION (PATIENT)
@@ -262,10 +897,10 @@ def get_patient_otp(db: Session, patient_id: int, entered_otp: str):
     """
     Returns True only if OTP matches.
     """
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = db.get(Patient, patient_id)
     if not patient:
         return False
-    return patient.otp_code == entered_otp
+    return otp_matches(patient.otp_code, entered_otp)
 
 
 def authenticate_doctor(db, username, password):
@@ -0,0 +1,162 @@
+# crud_async.py
+"""
+Async versions of the crud functions behind the busiest routes
+(booking, viewing appointments, doctor login). Same names and behaviour
+as crud.py, but they take an AsyncSession and must be awaited.
+"""
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import availability
+import daily_stats
+from crud import (
+    SlotTakenError,
+    _appointment_cursor,
+    _appointments_page_stmt,
+    _doctor_schedule_stmt,
+    _is_slot_violation,
+    _page_size,
+    _split_page,
+    cache_doctor_profile,
+    doctor_profiles,
+    _sync_availability,
+)
+from models import Patient, Doctor, Appointment
+
+
+# ---------------------------------------------------------
+#                     PATIENT
+# ---------------------------------------------------------
+
+async def get_patient(db: AsyncSession, patient_id: int):
+    return await db.get(Patient, patient_id)
+
+
+# ---------------------------------------------------------
+#                     DOCTOR
+# ---------------------------------------------------------
+
+async def authenticate_doctor(db: AsyncSession, username: str, password: str):
+    result = await db.scalars(
+        select(Doctor).where(Doctor.username == username, Doctor.password == password).limit(1)
+    )
+    return result.first()
+
+
+async def get_doctor_profile(db: AsyncSession, doctor_id: int):
+    """Cached DoctorEntry for a doctor, loaded on a miss; None if there is no such doctor."""
+    profile = doctor_profiles.get(doctor_id)
+    if profile is None:
+        result = await db.execute(
+            select(Doctor.id, Doctor.name, Doctor.specialization).where(Doctor.id == doctor_id)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        profile = cache_doctor_profile(row)
+    return profile
+
+
+# ---------------------------------------------------------
+#                     APPOINTMENTS
+# ---------------------------------------------------------
+
+async def _apply_stats(db: AsyncSession, changes):
+    await db.run_sync(daily_stats.apply, changes)
+
+
+async def create_appointment(db: AsyncSession, patient_id: int, doctor_id: int, date: str, time: str):
+    """
+    Book a slot. Raises SlotTakenError if the doctor is already booked then.
+    """
+    appointment_date = datetime.strptime(date, "%Y-%m-%d").date()
+    appointment_time = datetime.strptime(time, "%H:%M").time()
+
+    appointment = Appointment(
+        patient_id=patient_id,
+        doctor_id=doctor_id,
+        appointment_date=appointment_date,
+        appointment_time=appointment_time,
+        status="Booked"
+    )
+
+    db.add(appointment)
+    try:
+        await _apply_stats(db, daily_stats.delta(doctor_id, appointment_date, "Booked"))
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if _is_slot_violation(e):
+            availability.index.mark_taken(doctor_id, appointment_date, appointment_time)
+            raise SlotTakenError("Doctor already has an appointment at this time.") from e
+        raise
+    availability.index.book(doctor_id, appointment_date, appointment_time)
+    return appointment
+
+
+async def get_appointment(db: AsyncSession, appointment_id: int):
+    return await db.get(Appointment, appointment_id)
+
+
+async def get_appointment_for_patient(db: AsyncSession, appointment_id: int, patient_id: int):
+    """
+    Row (Appointment, otp_code) if the appointment exists and belongs
+    to the patient, else None. Appointment PK lookup joined to the patient's PK.
+    """
+    result = await db.execute(
+        select(Appointment, Patient.otp_code)
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .where(Appointment.id == appointment_id, Appointment.patient_id == patient_id)
+    )
+    return result.first()
+
+
+async def get_appointments_for_patient(db: AsyncSession, patient_id: int):
+    result = await db.scalars(
+        select(Appointment)
+        .where(Appointment.patient_id == patient_id)
+        .order_by(Appointment.appointment_date, Appointment.appointment_time, Appointment.id)
+    )
+    return result.all()
+
+
+async def get_appointments_page(
+    db: AsyncSession,
+    search: str = None,
+    include_cancelled: bool = False,
+    status: str = None,
+    doctor_id: int = None,
+    patient_id: int = None,
+    after: str = None,
+    page_size: int = None
+):
+    """
+    One page of appointments ordered by (date, time, id).
+    Returns (appointments, next_cursor); next_cursor is None on the last page.
+    """
+    size = _page_size(page_size)
+    stmt = _appointments_page_stmt(search, include_cancelled, status, doctor_id, patient_id, after, size)
+    rows = (await db.scalars(stmt)).all()
+    return _split_page(rows, size, _appointment_cursor)
+
+
+async def get_doctor_schedule(db: AsyncSession, doctor_id: int, first, last):
+    result = await db.execute(_doctor_schedule_stmt(doctor_id, first, last))
+    return result.all()
+
+
+async def cancel_appointment(db: AsyncSession, appointment: Appointment):
+    """
+    Mark an appointment cancelled and free its slot.
+    """
+    changes = daily_stats.transition(
+        appointment.doctor_id, appointment.appointment_date, appointment.status, "Cancelled"
+    )
+    appointment.status = "Cancelled"
+    await _apply_stats(db, changes)
+    await db.commit()
+    _sync_availability(appointment)
+    return appointment
@@ -0,0 +1,195 @@
+# daily_stats.py
+"""
+Pre-aggregated appointment counts per (doctor, appointment date, status).
+
+crud and crud_async turn every booking, status change, cancellation and
+delete into +1/-1 deltas and apply them (one upsert where the dialect
+has one) in the same transaction as the appointment write, so the
+summary table never drifts from the appointments it counts. The admin dashboard and /api/stats/daily
+read only this table, whose size grows with doctors x days rather than
+with the number of appointments.
+
+rebuild() recomputes the table from appointments with a single GROUP BY.
+main.py runs it at startup when the table is empty; run it again after
+loading appointments behind the app's back (migrate_flatfiles.py does).
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import Appointment, DailyAppointmentStats, Doctor
+
+CANCELLED = "Cancelled"
+
+
+# ---------------- Deltas ----------------
+
+def delta(doctor_id, day, status, n=1):
+    """Counter of changes keyed by (doctor_id, date, status)."""
+    return Counter({(doctor_id, day, status or "Booked"): n})
+
+
+def transition(doctor_id, day, old_status, new_status):
+    """Deltas for one appointment moving from old_status to new_status."""
+    if (old_status or "Booked") == (new_status or "Booked"):
+        return Counter()
+    changes = delta(doctor_id, day, old_status, -1)
+    changes.update(delta(doctor_id, day, new_status))
+    return changes
+
+
+def _upsert(dialect_name):
+    """Native INSERT ... ON CONFLICT/DUPLICATE KEY adding to count, or None for other dialects."""
+    table = DailyAppointmentStats
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_duplicate_key_update(count=table.count + stmt.inserted["count"])
+    else:
+        return None
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.doctor_id, table.stat_date, table.status],
+        set_={"count": table.count + stmt.excluded["count"]}
+    )
+
+
+def apply(db, changes):
+    """
+    Add `changes` to the table in the session's current transaction, before
+    the commit: one executemany upsert where the dialect has one, otherwise
+    SELECT ... FOR UPDATE per row followed by an UPDATE or INSERT (an INSERT
+    that loses a race for a new row is retried as an UPDATE). Takes a
+    sync Session; async callers use `await db.run_sync(apply, changes)`.
+    """
+    rows = [
+        {"doctor_id": doctor_id, "stat_date": day, "status": status, "count": n}
+        for (doctor_id, day, status), n in changes.items()
+        if n and doctor_id is not None and day is not None
+    ]
+    if not rows:
+        return
+    stmt = _upsert(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+
+    table = DailyAppointmentStats
+    for row in rows:
+        key = (
+            table.doctor_id == row["doctor_id"],
+            table.stat_date == row["stat_date"],
+            table.status == row["status"]
+        )
+        found = db.execute(select(table.count).where(*key).with_for_update()).first()
+        if found is None:
+            # FOR UPDATE locks nothing when the row doesn't exist yet, so a
+            # concurrent first write for the same key can win the INSERT; the
+            # savepoint keeps our transaction usable and we add to its row
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table).values(**row))
+                continue
+            except IntegrityError:
+                pass
+        db.execute(update(table).where(*key).values(count=table.count + row["count"]))
+
+
+# ---------------- Rebuild ----------------
+
+def rebuild(db):
+    """Recompute the whole table from appointments (one INSERT ... SELECT ... GROUP BY)."""
+    status = func.coalesce(Appointment.status, "Booked")
+    db.execute(delete(DailyAppointmentStats))
+    db.execute(
+        insert(DailyAppointmentStats).from_select(
+            ["doctor_id", "stat_date", "status", "count"],
+            select(Appointment.doctor_id, Appointment.appointment_date, status, func.count())
+            .where(Appointment.doctor_id.is_not(None), Appointment.appointment_date.is_not(None))
+            .group_by(Appointment.doctor_id, Appointment.appointment_date, status)
+        )
+    )
+    db.commit()
+
+
+def ensure_built(db):
+    """Backfill once: rebuild if the table is empty but there are appointments."""
+    if db.execute(select(DailyAppointmentStats.doctor_id).limit(1)).first() is not None:
+        return False
+    if db.execute(select(Appointment.id).limit(1)).first() is None:
+        return False
+    rebuild(db)
+    return True
+
+
+# ---------------- Reads ----------------
+
+def daily_counts(db, date_from, date_to, doctor_id=None):
+    """
+    [{"doctor_id", "date", "counts": {status: n}, "total"}] for each doctor
+    and day in the range that has any appointments, ordered by date.
+    """
+    stmt = select(
+        DailyAppointmentStats.doctor_id,
+        DailyAppointmentStats.stat_date,
+        DailyAppointmentStats.status,
+        DailyAppointmentStats.count
+    ).where(
+        DailyAppointmentStats.stat_date.between(date_from, date_to),
+        DailyAppointmentStats.count != 0
+    ).order_by(DailyAppointmentStats.stat_date, DailyAppointmentStats.doctor_id)
+    if doctor_id is not None:
+        stmt = stmt.where(DailyAppointmentStats.doctor_id == doctor_id)
+
+    days = {}
+    for row_doctor, day, status, n in db.execute(stmt):
+        entry = days.setdefault((row_doctor, day), {
+            "doctor_id": row_doctor, "date": day.isoformat(), "counts": {}, "total": 0
+        })
+        entry["counts"][status] = n
+        entry["total"] += n
+    return list(days.values())
+
+
+def summary(db, day=None, window_days=30):
+    """
+    Dashboard figures: live appointments per doctor on `day` (default
+    today) and status totals / cancellation rate over the `window_days`
+    days ending on it. Two queries on the summary table.
+    """
+    day = day or date.today()
+    per_doctor = db.execute(
+        select(Doctor.id, Doctor.name, func.sum(DailyAppointmentStats.count).label("appointments"))
+        .join(Doctor, Doctor.id == DailyAppointmentStats.doctor_id)
+        .where(DailyAppointmentStats.stat_date == day, DailyAppointmentStats.status != CANCELLED)
+        .group_by(Doctor.id, Doctor.name)
+        .order_by(func.sum(DailyAppointmentStats.count).desc(), Doctor.id)
+    ).all()
+
+    first = day - timedelta(days=window_days - 1)
+    by_status = {
+        status: n for status, n in db.execute(
+            select(DailyAppointmentStats.status, func.sum(DailyAppointmentStats.count))
+            .where(DailyAppointmentStats.stat_date.between(first, day))
+            .group_by(DailyAppointmentStats.status)
+        ) if n
+    }
+    total = sum(by_status.values())
+    return {
+        "date": day.isoformat(),
+        "today": [
+            {"doctor_id": doctor_id, "doctor_name": name, "appointments": n}
+            for doctor_id, name, n in per_doctor if n
+        ],
+        "today_total": sum(n for _, _, n in per_doctor),
+        "window_from": first.isoformat(),
+        "window_days": window_days,
+        "by_status": by_status,
+        "cancellation_rate": round(by_status.get(CANCELLED, 0) / total, 4) if total else 0.0
+    }
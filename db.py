@@ -1,7 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 # PostgreSQL connection credentials (use environment variables for deployment)
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -10,11 +15,141 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "pass@123")
 DB_NAME = os.getenv("DB_NAME", "hospital_db")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
-# SQLAlchemy database URL for PostgreSQL
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# SQLAlchemy database URL for PostgreSQL.
+# DATABASE_URL overrides it completely (e.g. sqlite:///./hospital.db for local runs).
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+
+def _env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Engine / pool settings. Size the pool so that
+# uvicorn workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the server's max_connections.
+SQL_ECHO = _env_flag("SQL_ECHO", "false")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+class PoolStats:
+    """
+    Checkout counters and wait times for one engine's pool.
+    Read them through pool_stats() (served at /admin/pool_stats).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class _TimedCheckout:
+    """Pool mixin that records how long each checkout waited for a connection."""
+
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool with checkout wait times (sync engines)."""
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """
+    The async engines' pool with checkout wait times. _do_get runs in the
+    greenlet that awaits the asyncio queue, so this is the coroutine's wait.
+    """
+
+
+def make_engine(url, echo=SQL_ECHO):
+    """
+    Build an engine with the configured pool and attach a PoolStats to it.
+    In-memory SQLite keeps SQLAlchemy's default pool (no sizing applies).
+    """
+    options = {"echo": echo, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    stats = PoolStats()
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        new_engine = create_engine(url, **options)
+    else:
+        # Per-engine subclass so the stats survive pool.recreate() on dispose()
+        pool_class = type("TimedQueuePool", (TimedQueuePool,), {"stats": stats})
+        new_engine = create_engine(
+            url,
+            poolclass=pool_class,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            **options
+        )
+    event.listen(new_engine, "connect", stats.on_connect)
+    event.listen(new_engine, "checkout", stats.on_checkout)
+    event.listen(new_engine, "checkin", stats.on_checkin)
+    new_engine.pool_stats = stats
+    return new_engine
+
 
 # Create SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create session local class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -29,3 +164,242 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------- Async engine (asyncpg / aiosqlite) ----------------
+# Used by the busiest routes so they don't hold a thread-pool thread while
+# waiting on the database. Same database, same pool settings.
+
+def _async_url(url):
+    scheme, rest = url.split("://", 1)
+    if "+" in scheme and scheme.split("+", 1)[1] in ("asyncpg", "aiosqlite"):
+        return url
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(SQLALCHEMY_DATABASE_URL))
+
+
+def make_async_engine(url, echo=SQL_ECHO):
+    options = {"echo": echo, "pool_pre_ping": DB_POOL_PRE_PING}
+    stats = PoolStats()
+    if not (url.startswith("sqlite") and ":memory:" in url):
+        options.update(
+            poolclass=type("TimedAsyncQueuePool", (TimedAsyncQueuePool,), {"stats": stats}),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+    new_engine = create_async_engine(url, **options)
+    event.listen(new_engine.sync_engine, "connect", stats.on_connect)
+    event.listen(new_engine.sync_engine, "checkout", stats.on_checkout)
+    event.listen(new_engine.sync_engine, "checkin", stats.on_checkin)
+    new_engine.sync_engine.pool_stats = stats  # AsyncEngine itself has __slots__
+    return new_engine
+
+
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+
+# expire_on_commit=False: templates read attributes after commit, and an
+# expired attribute would need an implicit (sync) refresh.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+# Async dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ---------------- Read replicas ----------------
+# DATABASE_REPLICA_URLS lists read-only copies of the primary (comma-separated).
+# List/search/report routes read through get_read_db / get_async_read_db;
+# anything that writes, or must see its own write straight away, stays on the
+# primary. A replica that fails to connect is skipped for
+# DB_REPLICA_RETRY_AFTER seconds; with no healthy replica, reads go to the
+# primary. Locally, two SQLite files work: copy the database and pass
+# sqlite:///file:replica.db?mode=ro&uri=true (mode=ro makes a missing file an
+# error instead of a new empty database).
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")  # or least_connections
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "30"))
+
+
+class Replica:
+    """Sync + async engines for one replica, and its health."""
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = make_engine(url)
+        self.async_engine = make_async_engine(_async_url(url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.down_until = 0.0
+        self.picks = 0
+        self.failures = 0
+        self.last_error = None
+
+    def in_use(self):
+        """Connections currently checked out (sync and async pools)."""
+        return self.engine.pool_stats.checked_out + self.async_engine.sync_engine.pool_stats.checked_out
+
+    def stats(self):
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.down_until <= time.monotonic(),
+            "retry_in_s": round(max(0.0, self.down_until - time.monotonic()), 1),
+            "picks": self.picks,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "in_use": self.in_use(),
+            "status": self.engine.pool.status(),
+        }
+
+
+class ReplicaSet:
+    """
+    Picks a replica per session: round-robin, or the one with the fewest
+    checked-out connections. Each pick is verified by checking out a
+    connection (pre-ping applies), so a dead replica fails over before the
+    route runs its first query.
+    """
+
+    def __init__(self, urls, strategy=DB_REPLICA_STRATEGY, retry_after=DB_REPLICA_RETRY_AFTER):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"DB_REPLICA_STRATEGY must be round_robin or least_connections, not {strategy!r}")
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.replicas = [Replica(url) for url in urls]
+        self.primary_reads = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """Healthy replicas, in the order to try them."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.replicas if r.down_until <= now]
+            if not healthy:
+                return []
+            # Rotate first, so ties under least_connections are also spread
+            start = self._next % len(healthy)
+            self._next += 1
+            healthy = healthy[start:] + healthy[:start]
+            if self.strategy == "least_connections":
+                healthy.sort(key=Replica.in_use)
+        return healthy
+
+    def _failed(self, replica, error):
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_after
+            replica.last_error = str(error).splitlines()[0][:200]
+        print(f"[DB Replica] {replica.stats()['url']} unavailable, using others for {self.retry_after:.0f}s: "
+              f"{replica.last_error}")
+
+    def _picked(self, replica):
+        """Count a read served by `replica` (None = the primary)."""
+        with self._lock:
+            if replica is None:
+                self.primary_reads += 1
+            else:
+                replica.picks += 1
+
+    def session(self):
+        """A Session on a healthy replica, or on the primary."""
+        for replica in self.candidates():
+            db = replica.SessionLocal()
+            try:
+                db.connection()
+            except PoolTimeoutError:
+                db.close()  # busy, not down
+                continue
+            except DBAPIError as e:
+                db.close()
+                self._failed(replica, e)
+                continue
+            self._picked(replica)
+            return db
+        self._picked(None)
+        return SessionLocal()
+
+    async def async_session(self):
+        """An AsyncSession on a healthy replica, or on the primary."""
+        for replica in self.candidates():
+            db = replica.AsyncSessionLocal()
+            try:
+                await db.connection()
+            except PoolTimeoutError:
+                await db.close()
+                continue
+            except DBAPIError as e:
+                await db.close()
+                self._failed(replica, e)
+                continue
+            self._picked(replica)
+            return db
+        self._picked(None)
+        return AsyncSessionLocal()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "retry_after": self.retry_after,
+                "primary_reads": self.primary_reads,
+                "replicas": [r.stats() for r in self.replicas],
+            }
+
+
+replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+def read_session():
+    """Session for read-only work outside a request (e.g. exports)."""
+    return replicas.session()
+
+
+# Read-only dependencies: replica if one is configured and up, else primary
+def get_read_db():
+    db = replicas.session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    db = await replicas.async_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def pool_stats():
+    """
+    Pool configuration, live pool status and checkout/wait counters.
+    """
+    return {
+        "url": engine.url.render_as_string(hide_password=True),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pre_ping": DB_POOL_PRE_PING,
+        "status": engine.pool.status(),
+        **engine.pool_stats.snapshot(),
+        "async": {
+            "status": async_engine.pool.status(),
+            **async_engine.sync_engine.pool_stats.snapshot(),
+        },
+        "read_replicas": replicas.stats(),
+    }
@@ -0,0 +1,83 @@
+# export.py
+"""
+Streaming appointment export (CSV / NDJSON) for reporting.
+
+Rows are fetched as plain tuples with yield_per, which makes the PostgreSQL
+driver use a server-side cursor, and written out one batch at a time, so
+memory stays flat however many rows are exported.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from db import read_session
+from models import Appointment
+
+EXPORT_BATCH_SIZE = 1000
+COLUMNS = ["id", "patient_id", "doctor_id", "appointment_date", "appointment_time", "status"]
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def appointments_query(date_from=None, date_to=None, doctor_id=None, status=None):
+    stmt = select(
+        Appointment.id,
+        Appointment.patient_id,
+        Appointment.doctor_id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Appointment.status
+    )
+    if date_from:
+        stmt = stmt.where(Appointment.appointment_date >= date_from)
+    if date_to:
+        stmt = stmt.where(Appointment.appointment_date <= date_to)
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.doctor_id == doctor_id)
+    if status:
+        stmt = stmt.where(Appointment.status == status)
+    return stmt.order_by(Appointment.appointment_date, Appointment.appointment_time, Appointment.id)
+
+
+def _as_text(row):
+    appt_id, patient_id, doctor_id, day, t, status = row
+    return [
+        appt_id,
+        patient_id,
+        doctor_id,
+        day.isoformat() if day else "",
+        t.strftime("%H:%M") if t else "",
+        status or ""
+    ]
+
+
+def _csv_chunk(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(_as_text(row) for row in rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows):
+    return "".join(json.dumps(dict(zip(COLUMNS, _as_text(row)))) + "\n" for row in rows)
+
+
+def stream_appointments(fmt="csv", batch_size=EXPORT_BATCH_SIZE, **filters):
+    """
+    Generator of text chunks, one per batch of rows.
+    Opens its own session: a streamed response outlives the request's
+    dependencies, so the get_db session may already be closed.
+    """
+    stmt = appointments_query(**filters).execution_options(yield_per=batch_size)
+    with read_session() as db:
+        result = db.execute(stmt)
+        if fmt == "csv":
+            yield _csv_chunk([], header=True)
+        for batch in result.partitions():
+            yield _csv_chunk(batch) if fmt == "csv" else _ndjson_chunk(batch)
@@ -0,0 +1,487 @@
+# flat_store.py
+"""
+In-memory indexes over the hospital.py data files.
+
+Each CSV file is read once (on first use) into dicts keyed by ID, plus a
+contact -> patient ID index and a (doctor, date, time) -> appointment ID
+index, so existence/conflict checks and next-ID lookups are O(1) instead of
+a full re-parse of the file. New rows are appended to the file and only then
+added to the indexes, so memory never gets ahead of disk.
+
+Rows are kept as the lists of strings stored in the file, in file order.
+
+Several hospital.py processes may share the files. Every write takes an
+exclusive flock on data/.flat_store.lock and, under it, reloads the indexes
+if any file changed (inode, size or mtime) since this process last read it,
+so ID allocation, conflict checks and rewrites always see the other
+processes' rows. Lookups reload on change too, without the lock.
+
+The appointments file is an append-only log: a cancellation appends a
+tombstone row "X,<appointment id>" instead of rewriting the file, so a
+cancel is one small fsynced write and a crash can at worst tear the last
+line, which is dropped (with a warning) on the next load if it does not
+parse as a whole record. compact_appointments() drops cancelled
+records by writing the live rows to a temp file, fsyncing it and renaming
+it over the log. Compaction may drop the highest IDs, so before the rename
+it records the highest appointment ID ever issued in a sidecar file
+(appointments.txt.last_id); IDs are allocated above both it and the log,
+so an old confirmation never points at a new appointment. Patient/doctor
+edits use the same atomic rewrite.
+
+scan_rows() is the read path for listings and searches over big files: the
+file is memory-mapped and, when there is a search term, a byte regex finds
+candidate lines before any decoding or CSV parsing, so only matching lines
+are parsed and memory stays constant.
+"""
+import csv
+import logging
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, writers only reload on change
+    fcntl = None
+
+TOMBSTONE = "X"
+TOMBSTONE_LINE = re.compile(rb"^X,", re.MULTILINE)
+
+log = logging.getLogger(__name__)
+
+
+# ---------------- Streaming reads ----------------
+
+def byte_pattern(term, ignore_case=False):
+    """
+    Compile a search term for scan_rows(). Returns None (no prefilter) when
+    there is no term, or for a case-insensitive non-ASCII term, since bytes
+    regexes only fold ASCII case.
+    """
+    if not term or (ignore_case and not term.isascii()):
+        return None
+    return re.compile(re.escape(term.encode("utf-8")), re.IGNORECASE if ignore_case else 0)
+
+
+def scan_lines(filename, pattern=None):
+    """
+    Yield the raw lines (bytes) of a file through mmap. With a pattern, only
+    lines containing a match are yielded; the search runs over the mapped
+    bytes, so non-matching lines are never copied or decoded.
+    """
+    if not filename.exists() or filename.stat().st_size == 0:
+        return
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if pattern is None:
+            yield from iter(mm.readline, b"")
+            return
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            match = pattern.search(mm, pos)
+            if match is None:
+                return
+            start = mm.rfind(b"\n", 0, match.start()) + 1
+            end = mm.find(b"\n", match.end())
+            end = size if end == -1 else end + 1
+            yield mm[start:end]
+            pos = end
+
+
+def scan_rows(filename, pattern=None):
+    """CSV rows from scan_lines(); blank lines are skipped."""
+    lines = (line.decode("utf-8", errors="replace") for line in scan_lines(filename, pattern))
+    for row in csv.reader(lines):
+        if row:
+            yield row
+
+
+def cancelled_ids(filename):
+    """IDs (as strings) tombstoned in an appointments log; only tombstone lines are parsed."""
+    return {row[1].strip() for row in scan_rows(filename, TOMBSTONE_LINE) if len(row) >= 2}
+
+
+class SlotTakenError(Exception):
+    """The doctor already has a live appointment at this date/time."""
+
+
+class ContactExistsError(Exception):
+    """A patient with this contact number is already registered."""
+
+
+class FlatStore:
+    def __init__(self, patients_file, doctors_file, appointments_file):
+        self.patients_file = patients_file
+        self.doctors_file = doctors_file
+        self.appointments_file = appointments_file
+        self.lock_file = appointments_file.with_name(".flat_store.lock")
+        self.last_id_file = appointments_file.with_name(appointments_file.name + ".last_id")
+        self._loaded = False
+        self._stamp = None
+        self._lock_depth = 0
+
+    # ---------------- Loading ----------------
+
+    def load(self):
+        self.patients = {}       # pid -> row
+        self.contacts = {}       # contact -> pid
+        self.doctors = {}        # did -> row
+        self.appointments = {}   # aid -> row
+        self.slots = {}          # (did, date, time) -> aid
+        self._next_ids = {}
+        self.dead_records = 0    # cancelled appointments + tombstones in the log
+
+        for filename, width in ((self.patients_file, 7), (self.doctors_file, 3), (self.appointments_file, 5)):
+            self._repair_tail(filename, width)
+        for row in self._read(self.patients_file, 7):
+            pid = int(row[0])
+            self.patients[pid] = row
+            self.contacts[row[5].strip()] = pid
+        for row in self._read(self.doctors_file, 3):
+            self.doctors[int(row[0])] = row
+        last_aid = 0
+        for row in self._rows(self.appointments_file):
+            if row[0] == TOMBSTONE:
+                if len(row) >= 2 and row[1].strip().isdigit() and int(row[1]) in self.appointments:
+                    self._unindex_appointment(int(row[1]))
+                    self.dead_records += 2
+                continue
+            if len(row) < 5 or not row[0].strip().isdigit():
+                continue
+            aid = int(row[0])
+            self._index_appointment(aid, row[:5])
+            last_aid = max(last_aid, aid)
+
+        self._next_ids["patients"] = max(self.patients, default=0) + 1
+        self._next_ids["doctors"] = max(self.doctors, default=0) + 1
+        # Cancelled IDs stay in the log until compaction, and compacted ones are
+        # remembered in the sidecar, so don't hand either out again
+        self._next_ids["appointments"] = max(last_aid, self._read_last_id()) + 1
+        self._stamp = self._signature()
+        self._loaded = True
+
+    def _read_last_id(self):
+        try:
+            return int(self.last_id_file.read_text().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            log.warning("%s: ignoring unreadable high-water mark", self.last_id_file)
+            return 0
+
+    def _write_last_id(self, last_id):
+        tmp = self.last_id_file.with_name(self.last_id_file.name + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(f"{last_id}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._replace(tmp, self.last_id_file)
+
+    def _signature(self):
+        """(inode, size, mtime) of each file; changes whenever any process writes one."""
+        stamp = []
+        for filename in (self.patients_file, self.doctors_file, self.appointments_file):
+            try:
+                st = filename.stat()
+            except FileNotFoundError:
+                stamp.append(None)
+            else:
+                stamp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        return tuple(stamp)
+
+    def _ensure_loaded(self):
+        """Load on first use, and reload when another process has changed a file."""
+        if not self._loaded or self._signature() != self._stamp:
+            # Under the lock, so the tail repair can't cut another process's append short
+            with self._lock():
+                if not self._loaded or self._signature() != self._stamp:
+                    self.load()
+
+    @contextmanager
+    def _lock(self):
+        """
+        Exclusive lock shared by all processes using these files; re-entrant
+        within one store. Writers hold it from the (re)load through the write.
+        """
+        if self._lock_depth or fcntl is None:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        with open(self.lock_file, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self):
+        """Lock, catch up with other processes, and record our own write afterwards."""
+        with self._lock():
+            self._ensure_loaded()
+            yield
+            # Our write is already in the indexes; don't reload for it
+            self._stamp = self._signature()
+
+    @staticmethod
+    def _rows(filename):
+        if not filename.exists():
+            return
+        with open(filename, "r", newline="") as f:
+            for row in csv.reader(f):
+                if row:
+                    yield row
+
+    @classmethod
+    def _read(cls, filename, width):
+        """Rows with at least `width` columns and an integer ID; others are skipped."""
+        for row in cls._rows(filename):
+            if len(row) < width:
+                continue
+            try:
+                int(row[0])
+            except ValueError:
+                continue
+            yield row[:width]
+
+    @staticmethod
+    def _is_record(line, width):
+        """True if a raw line is a whole row: `width` columns and an integer ID, or a tombstone."""
+        row = next(csv.reader([line.decode("utf-8", errors="replace").rstrip("\r")]), [])
+        if row and row[0] == TOMBSTONE:
+            return len(row) >= 2 and row[1].strip().isdigit()
+        if len(row) < width:
+            return False
+        try:
+            int(row[0])
+        except ValueError:
+            return False
+        return True
+
+    @classmethod
+    def _repair_tail(cls, filename, width, chunk=4096):
+        """
+        Make the file end with a newline. A last line without one is kept (and
+        terminated) if it parses as a whole record - a legacy or hand-edited
+        file. Otherwise it is a torn append from a crash, which was never
+        acknowledged, and is cut off so half a row is not read as a record.
+        """
+        if not filename.exists():
+            return
+        size = filename.stat().st_size
+        with open(filename, "rb+") as f:
+            line_start = 0
+            end = size
+            while end > 0:
+                start = max(0, end - chunk)
+                f.seek(start)
+                block = f.read(end - start)
+                if end == size and block.endswith(b"\n"):
+                    return
+                cut = block.rfind(b"\n")
+                if cut != -1:
+                    line_start = start + cut + 1
+                    break
+                end = start
+            else:
+                if size == 0:
+                    return
+            f.seek(line_start)
+            tail = f.read(size - line_start)
+            if cls._is_record(tail, width):
+                f.seek(size)
+                f.write(b"\n")
+            else:
+                log.warning("%s: dropping incomplete last line %r", filename, tail[:200])
+                f.truncate(line_start)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _append(filename, row):
+        with open(filename, "a", newline="") as f:
+            csv.writer(f).writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def _rewrite(cls, filename, rows):
+        """Atomic replace: write a temp file, fsync it, rename it over the original."""
+        cls._replace(cls._write_temp(filename, rows), filename)
+
+    @staticmethod
+    def _write_temp(filename, rows):
+        tmp = filename.with_name(filename.name + ".tmp")
+        with open(tmp, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    @staticmethod
+    def _replace(tmp, filename):
+        os.replace(tmp, filename)
+        if hasattr(os, "O_DIRECTORY"):
+            # Make the rename itself durable
+            fd = os.open(filename.parent, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _take_id(self, name):
+        new_id = self._next_ids[name]
+        self._next_ids[name] = new_id + 1
+        return new_id
+
+    # ---------------- Lookups ----------------
+
+    def next_id(self, name):
+        """Next free ID for 'patients', 'doctors' or 'appointments'."""
+        self._ensure_loaded()
+        return self._next_ids[name]
+
+    def patient_exists(self, pid):
+        self._ensure_loaded()
+        return int(pid) in self.patients
+
+    def doctor_exists(self, did):
+        self._ensure_loaded()
+        return int(did) in self.doctors
+
+    def contact_exists(self, contact):
+        self._ensure_loaded()
+        return contact.strip() in self.contacts
+
+    def has_conflict(self, did, date, time_slot):
+        self._ensure_loaded()
+        return (int(did), date.strip(), time_slot.strip()) in self.slots
+
+    def get_patient(self, pid):
+        self._ensure_loaded()
+        return self.patients.get(int(pid))
+
+    def get_doctor(self, did):
+        self._ensure_loaded()
+        return self.doctors.get(int(did))
+
+    # ---------------- Patients ----------------
+
+    def add_patient(self, name, age, gender, dob, contact, symptoms):
+        """
+        Append a patient; returns the new ID. Raises ContactExistsError if the
+        contact is taken, OSError if the write fails.
+        """
+        with self._writing():
+            if contact.strip() in self.contacts:
+                raise ContactExistsError(contact)
+            pid = self._next_ids["patients"]
+            row = [str(pid), name, str(age), gender, dob, contact, symptoms]
+            self._append(self.patients_file, row)
+            self._take_id("patients")
+            self.patients[pid] = row
+            self.contacts[contact.strip()] = pid
+        return pid
+
+    def update_patient(self, row):
+        """Replace a patient row (same ID) and rewrite the file."""
+        with self._writing():
+            pid = int(row[0])
+            old = self.patients[pid]
+            self.patients[pid] = row
+            try:
+                self._rewrite(self.patients_file, self.patients.values())
+            except OSError:
+                self.patients[pid] = old
+                raise
+            if self.contacts.get(old[5].strip()) == pid:
+                del self.contacts[old[5].strip()]
+            self.contacts[row[5].strip()] = pid
+
+    # ---------------- Doctors ----------------
+
+    def add_doctor(self, name, spec):
+        with self._writing():
+            did = self._next_ids["doctors"]
+            row = [str(did), name, spec]
+            self._append(self.doctors_file, row)
+            self._take_id("doctors")
+            self.doctors[did] = row
+        return did
+
+    def update_doctor(self, row):
+        with self._writing():
+            did = int(row[0])
+            old = self.doctors[did]
+            self.doctors[did] = row
+            try:
+                self._rewrite(self.doctors_file, self.doctors.values())
+            except OSError:
+                self.doctors[did] = old
+                raise
+
+    # ---------------- Appointments ----------------
+
+    def _index_appointment(self, aid, row):
+        self.appointments[aid] = row
+        self.slots[(int(row[2]), row[3].strip(), row[4].strip())] = aid
+
+    def _unindex_appointment(self, aid):
+        row = self.appointments.pop(aid)
+        key = (int(row[2]), row[3].strip(), row[4].strip())
+        if self.slots.get(key) == aid:
+            del self.slots[key]
+        return row
+
+    def add_appointment(self, pid, did, date, time_slot):
+        """Append an appointment; returns the new ID. Raises SlotTakenError on a conflict."""
+        with self._writing():
+            if (int(did), date.strip(), time_slot.strip()) in self.slots:
+                raise SlotTakenError(did, date, time_slot)
+            aid = self._next_ids["appointments"]
+            row = [str(aid), str(pid), str(did), date, time_slot]
+            self._append(self.appointments_file, row)
+            self._take_id("appointments")
+            self._index_appointment(aid, row)
+        return aid
+
+    def cancel_appointment(self, aid):
+        """Append a tombstone for an appointment; returns False if there is no such ID."""
+        aid = int(aid)
+        with self._writing():
+            if aid not in self.appointments:
+                return False
+            self._append(self.appointments_file, [TOMBSTONE, aid])
+            self._unindex_appointment(aid)
+            self.dead_records += 2
+        return True
+
+    def compact_appointments(self):
+        """
+        Rewrite the appointments log with only live appointments.
+        Returns the number of records removed.
+
+        Runs under the lock after catching up with other processes, and the
+        log is checked again just before the rename: if it changed while the
+        temp file was written (a writer that doesn't lock), the pass starts
+        over from a fresh load instead of dropping those records.
+        """
+        with self._writing():
+            while True:
+                stamp = self._stamp
+                tmp = self._write_temp(self.appointments_file, self.appointments.values())
+                if self._signature() == stamp:
+                    break
+                os.remove(tmp)
+                self.load()
+            # Durable before the rows carrying the highest IDs can disappear
+            self._write_last_id(self._next_ids["appointments"] - 1)
+            self._replace(tmp, self.appointments_file)
+            removed, self.dead_records = self.dead_records, 0
+        return removed
@@ -1,8 +1,13 @@
 import os
 import csv
+import sys
 from pathlib import Path
 from datetime import datetime
 
+from flat_store import (
+    ContactExistsError, FlatStore, SlotTakenError, byte_pattern, cancelled_ids, scan_rows,
+)
+
 # File paths
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(exist_ok=True)  # Ensure data directory exists
@@ -10,26 +15,10 @@ PATIENTS_FILE = DATA_DIR / "patients.txt"
 DOCTORS_FILE = DATA_DIR / "doctors.txt"
 APPOINTMENTS_FILE = DATA_DIR / "appointments.txt"
 
+# Indexes over the three files, loaded on first use
+store = FlatStore(PATIENTS_FILE, DOCTORS_FILE, APPOINTMENTS_FILE)
+
 # ---------------- Helper Functions ----------------
-def get_next_id(filename):
-    """Get next ID by scanning the file for the last ID."""
-    if not filename.exists():
-        return 1
-    last_id = 0
-    try:
-        with open(filename, "r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if row and row[0].strip():
-                    try:
-                        id_val = int(row[0])
-                        last_id = max(last_id, id_val)
-                    except ValueError:
-                        continue  # Skip invalid rows
-    except IOError as e:
-        print(f"Error reading {filename}: {e}")
-        return 1
-    return last_id + 1
 
 def file_exists(filename):
     return filename.exists() and filename.stat().st_size > 0
@@ -109,7 +98,6 @@ def authenticate():
 
 # ---------------- Patient Management ----------------
 def add_patient():
-    pid = get_next_id(PATIENTS_FILE)
     name = input("Enter patient name: ").strip()
     if not name:
         print("Name cannot be empty.")
@@ -125,49 +113,35 @@ def add_patient():
         return
 
     try:
-        with open(PATIENTS_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([pid, name, age, gender, dob, contact, symptoms])
+        pid = store.add_patient(name, age, gender, dob, contact, symptoms)
         print(f"Patient registered successfully with ID: {pid}")
+    except ContactExistsError:
+        print("Patient with this contact already exists.")
     except IOError as e:
         print(f"Error saving patient: {e}")
 
 def contact_exists(contact):
-    if not file_exists(PATIENTS_FILE):
-        return False
-    try:
-        with open(PATIENTS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 6 and row[5].strip() == contact:
-                    return True
-    except IOError:
-        pass
-    return False
+    return store.contact_exists(contact)
 
 def view_patients(search_term=None):
     if not file_exists(PATIENTS_FILE):
         print("No patient records found.")
         return
     try:
-        with open(PATIENTS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-            if not rows:
-                print("No data available in patients file.")
-                return
-            print("\n--- Patient Details ---")
-            for row in rows:
-                if len(row) < 7:
-                    continue
-                pid, name, age, gender, dob, contact, symptoms = row
-                if search_term:
-                    if search_term.lower() in name.lower() or search_term.lower() in contact.lower():
-                        print(f"ID: {pid} | Name: {name} | Age: {age} | Gender: {gender} | DOB: {dob} | Contact: {contact} | Symptoms: {symptoms}")
-                else:
-                    print(f"ID: {pid} | Name: {name} | Age: {age} | Gender: {gender} | DOB: {dob} | Contact: {contact} | Symptoms: {symptoms}")
+        # Only lines containing the term are CSV-parsed; name/contact are checked after
+        pattern = byte_pattern(search_term, ignore_case=True)
+        print("\n--- Patient Details ---")
+        for row in scan_rows(PATIENTS_FILE, pattern):
+            if len(row) < 7:
+                continue
+            pid, name, age, gender, dob, contact, symptoms = row[:7]
             if search_term:
-                print(f"Search completed for '{search_term}'.")
+                if search_term.lower() in name.lower() or search_term.lower() in contact.lower():
+                    print(f"ID: {pid} | Name: {name} | Age: {age} | Gender: {gender} | DOB: {dob} | Contact: {contact} | Symptoms: {symptoms}")
+            else:
+                print(f"ID: {pid} | Name: {name} | Age: {age} | Gender: {gender} | DOB: {dob} | Contact: {contact} | Symptoms: {symptoms}")
+        if search_term:
+            print(f"Search completed for '{search_term}'.")
     except IOError as e:
         print(f"Error reading patients: {e}")
 
@@ -180,7 +154,6 @@ def search_patients():
 
 # ---------------- Doctor Management ----------------
 def add_doctor():
-    did = get_next_id(DOCTORS_FILE)
     name = input("Enter doctor name: ").strip()
     if not name:
         print("Name cannot be empty.")
@@ -190,9 +163,7 @@ def add_doctor():
         print("Specialization cannot be empty.")
         return
     try:
-        with open(DOCTORS_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([did, name, spec])
+        did = store.add_doctor(name, spec)
         print(f"Doctor added successfully with ID: {did}")
     except IOError as e:
         print(f"Error saving doctor: {e}")
@@ -232,40 +203,15 @@ def search_doctors():
 
 # ---------------- Appointment Management ----------------
 def patient_exists(pid):
-    if not file_exists(PATIENTS_FILE):
-        return False
-    with open(PATIENTS_FILE, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) >= 1 and row[0].strip() == str(pid):
-                return True
-    return False
+    return store.patient_exists(pid)
 
 def doctor_exists(did):
-    if not file_exists(DOCTORS_FILE):
-        return False
-    with open(DOCTORS_FILE, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) >= 1 and row[0].strip() == str(did):
-                return True
-    return False
+    return store.doctor_exists(did)
 
 def has_conflict(did, date, time_slot):
-    if not file_exists(APPOINTMENTS_FILE):
-        return False
-    with open(APPOINTMENTS_FILE, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 5:
-                continue
-            _, _, row_did, row_date, row_time = row
-            if row_did.strip() == str(did) and row_date.strip() == date and row_time.strip() == time_slot:
-                return True
-    return False
+    return store.has_conflict(did, date, time_slot)
 
 def book_appointment():
-    aid = get_next_id(APPOINTMENTS_FILE)
     pid = validate_integer("Enter patient ID: ")
     did = validate_integer("Enter doctor ID: ")
 
@@ -284,10 +230,11 @@ def book_appointment():
         time_slot = validate_time_input("Please enter a different time (HH:MM): ")
 
     try:
-        with open(APPOINTMENTS_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([aid, pid, did, date, time_slot])
+        aid = store.add_appointment(pid, did, date, time_slot)
         print(f"Appointment booked successfully with ID: {aid}")
+    except SlotTakenError:
+        # Booked from another terminal since the check above
+        print("Conflict: Doctor already has an appointment at this time on this date.")
     except IOError as e:
         print(f"Error booking appointment: {e}")
 
@@ -296,17 +243,19 @@ def view_appointments(search_term=None):
         print("No appointments found.")
         return
     try:
-        with open(APPOINTMENTS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-            print("\n--- Appointments ---")
-            for row in rows:
-                if len(row) < 5:
-                    continue
-                aid, pid, did, date, time_slot = row
-                if search_term and search_term not in f"{aid} {pid} {did} {date} {time_slot}":
-                    continue
-                print(f"ID: {aid} | Patient ID: {pid} | Doctor ID: {did} | Date: {date} | Time: {time_slot}")
+        # A term without spaces lies inside one field, so it must appear in the raw line
+        pattern = byte_pattern(search_term) if search_term and " " not in search_term else None
+        cancelled = cancelled_ids(APPOINTMENTS_FILE)
+        print("\n--- Appointments ---")
+        for row in scan_rows(APPOINTMENTS_FILE, pattern):
+            if len(row) < 5:
+                continue
+            aid, pid, did, date, time_slot = row[:5]
+            if aid.strip() in cancelled:
+                continue
+            if search_term and search_term not in f"{aid} {pid} {did} {date} {time_slot}":
+                continue
+            print(f"ID: {aid} | Patient ID: {pid} | Doctor ID: {did} | Date: {date} | Time: {time_slot}")
     except IOError as e:
         print(f"Error reading appointments: {e}")
 
@@ -315,62 +264,46 @@ def cancel_appointment():
         print("No appointments to cancel.")
         return
     aid = validate_integer("Enter appointment ID to cancel: ")
-    found = False
-    lines = []
     try:
-        with open(APPOINTMENTS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 1 and row[0].strip() != str(aid):
-                    lines.append(row)
-                else:
-                    found = True
-        if found:
-            with open(APPOINTMENTS_FILE, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerows(lines)
+        if store.cancel_appointment(aid):
             print(f"Appointment ID {aid} canceled successfully.")
         else:
             print(f"Appointment ID {aid} not found.")
     except IOError as e:
         print(f"Error canceling appointment: {e}")
 
+def compact_appointments():
+    """Drop cancelled appointments from the log (atomic rewrite)."""
+    try:
+        removed = store.compact_appointments()
+        print(f"Appointments file compacted: {removed} cancelled record(s) removed.")
+    except IOError as e:
+        print(f"Error compacting appointments: {e}")
+
  # ---------------- edit details ----------------
 def edit_patient():
     pid = validate_integer("Enter patient ID to edit: ")
-    lines = []
-    updated = False
     try:
-        with open(PATIENTS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 7 and row[0].strip() == str(pid):
-                    print(f"\nCurrent Details:\nID: {row[0]} | Name: {row[1]} | Age: {row[2]} | Gender: {row[3]} | DOB: {row[4]} | Contact: {row[5]} | Symptoms: {row[6]}")
-                    name = input(f"Enter new name (leave blank to keep '{row[1]}'): ").strip()
-                    age_input = input(f"Enter new age (leave blank to keep '{row[2]}'): ").strip()
-                    gender = input(f"Enter new gender (leave blank to keep '{row[3]}'): ").strip().title()
-                    dob = input(f"Enter new DOB (leave blank to keep '{row[4]}'): ").strip()
-                    contact = input(f"Enter new contact (leave blank to keep '{row[5]}'): ").strip()
-                    symptoms = input(f"Enter new symptoms (leave blank to keep '{row[6]}'): ").strip()
-
-                    new_row = [
-                        row[0],
-                        name if name else row[1],
-                        age_input if age_input else row[2],
-                        gender if gender else row[3],
-                        dob if dob else row[4],
-                        contact if contact else row[5],
-                        symptoms if symptoms else row[6]
-                    ]
-                    lines.append(new_row)
-                    updated = True
-                else:
-                    lines.append(row)
-
-        if updated:
-            with open(PATIENTS_FILE, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerows(lines)
+        row = store.get_patient(pid)
+        if row:
+            print(f"\nCurrent Details:\nID: {row[0]} | Name: {row[1]} | Age: {row[2]} | Gender: {row[3]} | DOB: {row[4]} | Contact: {row[5]} | Symptoms: {row[6]}")
+            name = input(f"Enter new name (leave blank to keep '{row[1]}'): ").strip()
+            age_input = input(f"Enter new age (leave blank to keep '{row[2]}'): ").strip()
+            gender = input(f"Enter new gender (leave blank to keep '{row[3]}'): ").strip().title()
+            dob = input(f"Enter new DOB (leave blank to keep '{row[4]}'): ").strip()
+            contact = input(f"Enter new contact (leave blank to keep '{row[5]}'): ").strip()
+            symptoms = input(f"Enter new symptoms (leave blank to keep '{row[6]}'): ").strip()
+
+            new_row = [
+                row[0],
+                name if name else row[1],
+                age_input if age_input else row[2],
+                gender if gender else row[3],
+                dob if dob else row[4],
+                contact if contact else row[5],
+                symptoms if symptoms else row[6]
+            ]
+            store.update_patient(new_row)
             print(f"✅ Patient ID {pid} updated successfully.")
         else:
             print(f"❌ Patient ID {pid} not found.")
@@ -380,27 +313,15 @@ def edit_patient():
 
 def edit_doctor():
     did = validate_integer("Enter doctor ID to edit: ")
-    lines = []
-    updated = False
     try:
-        with open(DOCTORS_FILE, "r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 3 and row[0].strip() == str(did):
-                    print(f"\nCurrent Details:\nID: {row[0]} | Name: {row[1]} | Specialization: {row[2]}")
-                    name = input(f"Enter new name (leave blank to keep '{row[1]}'): ").strip()
-                    spec = input(f"Enter new specialization (leave blank to keep '{row[2]}'): ").strip()
-
-                    new_row = [row[0], name if name else row[1], spec if spec else row[2]]
-                    lines.append(new_row)
-                    updated = True
-                else:
-                    lines.append(row)
-
-        if updated:
-            with open(DOCTORS_FILE, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerows(lines)
+        row = store.get_doctor(did)
+        if row:
+            print(f"\nCurrent Details:\nID: {row[0]} | Name: {row[1]} | Specialization: {row[2]}")
+            name = input(f"Enter new name (leave blank to keep '{row[1]}'): ").strip()
+            spec = input(f"Enter new specialization (leave blank to keep '{row[2]}'): ").strip()
+
+            new_row = [row[0], name if name else row[1], spec if spec else row[2]]
+            store.update_doctor(new_row)
             print(f"✅ Doctor ID {did} updated successfully.")
         else:
             print(f"❌ Doctor ID {did} not found.")
@@ -475,7 +396,8 @@ def admin_menu():
         print("9. Book Appointment")
         print("10. View Appointments")
         print("11. Cancel Appointment")
-        print("12. Exit to Main Menu")
+        print("12. Compact Appointments File")
+        print("13. Exit to Main Menu")
 
         choice = input("Enter your choice: ").strip()
         if choice == "1":
@@ -501,6 +423,8 @@ def admin_menu():
         elif choice == "11":
             cancel_appointment()
         elif choice == "12":
+            compact_appointments()
+        elif choice == "13":
             print("Returning to main menu...")
             break
         else:
@@ -535,4 +459,7 @@ def main_menu():
 
 # ---------------- Main ----------------
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    if sys.argv[1:] == ["compact"]:
+        compact_appointments()
+    else:
+        main_menu()
\ No newline at end of file
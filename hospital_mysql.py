@@ -7,11 +7,17 @@ Requires: mysql-connector-python, python-dotenv (optional)
 
 import os
 import csv
+import threading
+import time
 import mysql.connector
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import CNX_POOL_MAXSIZE, MySQLConnectionPool
 from dotenv import load_dotenv
+from otp_guard import otp_matches
 import random
 
 # Load .env if present
@@ -24,22 +30,126 @@ DB_PASS = os.getenv("DB_PASS", "pass@123")          # change to your password
 DB_NAME = os.getenv("DB_NAME", "hospital_db")
 DB_PORT = int(os.getenv("DB_PORT", 3306))
 
+# Connection pool. MYSQL_POOL_SIZE is separate from db.py's DB_POOL_SIZE (the
+# web app's SQLAlchemy pool); mysql-connector allows at most CNX_POOL_MAXSIZE (32).
+DB_POOL_NAME = os.getenv("DB_POOL_NAME", "hospital_pool")
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 5))
+if not 0 < MYSQL_POOL_SIZE <= CNX_POOL_MAXSIZE:
+    raise ValueError(f"MYSQL_POOL_SIZE must be between 1 and {CNX_POOL_MAXSIZE}, got {MYSQL_POOL_SIZE}")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds to wait when all are in use
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "connection_ids": set()}
+
 # ---------------- Helper Functions ----------------
+def get_pool():
+    """Create the process-wide pool on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = MySQLConnectionPool(
+                    pool_name=DB_POOL_NAME,
+                    pool_size=MYSQL_POOL_SIZE,
+                    pool_reset_session=True,
+                    host=DB_HOST,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    database=DB_NAME,
+                    port=DB_PORT,
+                    autocommit=False
+                )
+            except Error as e:
+                print(f"[DB Error] Could not connect to database: {e}")
+                raise
+        return _pool
+
+class PoolTimeoutError(PoolError):
+    """No pooled connection became free within DB_POOL_TIMEOUT seconds."""
+
+
+# One permit per pooled connection: waiters block here and are woken in arrival order,
+# instead of spinning on pool.get_connection(), which fails at once when empty.
+_pool_slots = threading.BoundedSemaphore(MYSQL_POOL_SIZE)
+
 def get_db_connection():
-    """Return a new DB connection. Caller must close it."""
+    """
+    Borrow a connection from the pool, waiting up to DB_POOL_TIMEOUT seconds
+    if all are in use (raises PoolTimeoutError after that). Give it back with
+    release_db_connection(), or use db_connection() which does.
+    """
+    pool = get_pool()
+    start = time.perf_counter()
+    waited = not _pool_slots.acquire(blocking=False)
+    if waited and not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        message = f"No free connection after {DB_POOL_TIMEOUT}s (pool size {MYSQL_POOL_SIZE})"
+        print(f"[DB Error] {message}")
+        raise PoolTimeoutError(message)
     try:
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME,
-            port=DB_PORT,
-            autocommit=False
-        )
-        return conn
-    except Error as e:
-        print(f"[DB Error] Could not connect to database: {e}")
+        conn = pool.get_connection()
+    except Exception:
+        _pool_slots.release()
+        raise
+    with _pool_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["connection_ids"].add(conn.connection_id)
+        if waited:
+            _pool_stats["waits"] += 1
+            _pool_stats["wait_seconds"] += time.perf_counter() - start
+    return conn
+
+def release_db_connection(conn):
+    """Return a connection from get_db_connection() to the pool."""
+    try:
+        conn.close()
+    finally:
+        _pool_slots.release()
+
+@contextmanager
+def db_connection():
+    """
+    with db_connection() as conn: ...
+    Uncommitted work is rolled back on error; the connection always goes
+    back to the pool.
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except Error:
+            pass
         raise
+    finally:
+        release_db_connection(conn)
+
+def pool_stats():
+    """
+    Checkouts vs. distinct server connections (by connection id) since
+    start-up; reused = checkouts that did not need a new connection.
+    """
+    with _pool_lock:
+        checkouts = _pool_stats["checkouts"]
+        opened = len(_pool_stats["connection_ids"])
+        return {
+            "pool_size": MYSQL_POOL_SIZE,
+            "checkouts": checkouts,
+            "connections_opened": opened,
+            "reused": checkouts - opened,
+            "reuse_ratio": round((checkouts - opened) / checkouts, 3) if checkouts else 0.0,
+            "waits": _pool_stats["waits"],
+            "wait_seconds": round(_pool_stats["wait_seconds"], 3),
+        }
+
+def show_pool_stats():
+    stats = pool_stats()
+    print("\n--- Connection Pool ---")
+    print(f"Pool size: {stats['pool_size']} | Checkouts: {stats['checkouts']} | "
+          f"Connections opened: {stats['connections_opened']} | Reused: {stats['reused']} "
+          f"({stats['reuse_ratio']:.0%})")
+    print(f"Waited for a free connection: {stats['waits']} time(s), {stats['wait_seconds']}s total")
 
 def initialize_db():
     """Create tables if they do not exist."""
@@ -77,20 +187,16 @@ def initialize_db():
         FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
     ) ENGINE=InnoDB;
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(ddl_patients)
-        cur.execute(ddl_doctors)
-        cur.execute(ddl_appointments)
-        conn.commit()
-        cur.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(ddl_patients)
+            cur.execute(ddl_doctors)
+            cur.execute(ddl_appointments)
+            conn.commit()
+            cur.close()
     except Exception as e:
         print(f"[DB Init Error] {e}")
-    finally:
-        if conn:
-            conn.close()
 
 def sql_date_from_ddmmyyyy(s):
     """Convert dd-mm-yyyy to yyyy-mm-dd (for DATE column)."""
@@ -108,20 +214,19 @@ def sql_time_from_HHMM(s):
         return None
     
 def auto_fix_old_doctors():
-    conn = get_db_connection()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-        UPDATE doctors
-        SET username = CAST(id AS CHAR),
-            password = CONCAT('doctor_', CAST(id AS CHAR))
-        WHERE username IS NULL OR password IS NULL 
-              OR username = '' OR password = '';
-    """)
+        cur.execute("""
+            UPDATE doctors
+            SET username = CAST(id AS CHAR),
+                password = CONCAT('doctor_', CAST(id AS CHAR))
+            WHERE username IS NULL OR password IS NULL 
+                  OR username = '' OR password = '';
+        """)
 
-    conn.commit()
-    cur.close()
-    conn.close()
+        conn.commit()
+        cur.close()
 
     
 #-------------otp-------
@@ -208,84 +313,77 @@ def add_patient():
     contact = validate_phone("Enter contact: ")
     symptoms = input("Enter symptoms: ").strip()
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    otp = generate_otp()
-    cur.execute("""INSERT INTO patients (name, age, gender, dob, contact, symptoms, otp_code)
-                   VALUES (%s,%s,%s,%s,%s,%s,%s)""",
-                (name, age, gender, sql_date_from_ddmmyyyy(dob), contact, symptoms, otp))
-    conn.commit()
-    pid = cur.lastrowid
-    print(f"✅ Patient registered (ID: {pid}). OTP assigned: {otp}")
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+
+        otp = generate_otp()
+        cur.execute("""INSERT INTO patients (name, age, gender, dob, contact, symptoms, otp_code)
+                       VALUES (%s,%s,%s,%s,%s,%s,%s)""",
+                    (name, age, gender, sql_date_from_ddmmyyyy(dob), contact, symptoms, otp))
+        conn.commit()
+        pid = cur.lastrowid
+        print(f"✅ Patient registered (ID: {pid}). OTP assigned: {otp}")
+        cur.close()
 
 def verify_patient_otp(pid):
     """Check if entered OTP matches."""
     otp_input = input("Enter your 4-digit OTP: ").strip()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT otp_code FROM patients WHERE id=%s", (pid,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
-    if row and otp_input == row[0]:
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT otp_code FROM patients WHERE id=%s", (pid,))
+        row = cur.fetchone()
+        cur.close()
+    if row and otp_matches(row[0], otp_input):
         return True
     print("❌ Invalid OTP.")
     return False
 
 def view_patients(term=None, search_id=None, show_otp=True):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-
-        if term:
-            like = f"%{term}%"
-            try:
-                search_id = int(term)
-            except ValueError:
-                search_id = None
-
-            if search_id is not None:
-                cur.execute("""
-                    SELECT * FROM patients 
-                    WHERE id = %s OR name LIKE %s OR contact LIKE %s 
-                    ORDER BY id
-                """, (search_id, like, like))
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+
+            if term:
+                like = f"%{term}%"
+                try:
+                    search_id = int(term)
+                except ValueError:
+                    search_id = None
+
+                if search_id is not None:
+                    cur.execute("""
+                        SELECT * FROM patients 
+                        WHERE id = %s OR name LIKE %s OR contact LIKE %s 
+                        ORDER BY id
+                    """, (search_id, like, like))
+                else:
+                    cur.execute("""
+                        SELECT * FROM patients 
+                        WHERE name LIKE %s OR contact LIKE %s 
+                        ORDER BY id
+                    """, (like, like))
             else:
-                cur.execute("""
-                    SELECT * FROM patients 
-                    WHERE name LIKE %s OR contact LIKE %s 
-                    ORDER BY id
-                """, (like, like))
-        else:
-            cur.execute("SELECT * FROM patients ORDER BY id")
+                cur.execute("SELECT * FROM patients ORDER BY id")
 
-        rows = cur.fetchall()
+            rows = cur.fetchall()
 
-        if not rows:
-            print("No patient records found.")
-            return
+            if not rows:
+                print("No patient records found.")
+                return
 
-        print("\n--- Patient Details ---")
-        for r in rows:
-            dob = r['dob'].strftime("%d-%m-%Y") if hasattr(r['dob'], "strftime") else (r['dob'] or "")
-            base_info = f"ID: {r['id']} | Name: {r['name']} | Age: {r['age']} | Gender: {r['gender']} | DOB: {dob} | Contact: {r['contact']} | Symptoms: {r['symptoms']}"
-            if show_otp:
-                base_info += f" | OTP: {r.get('otp_code', 'N/A')}"
-            print(base_info)
+            print("\n--- Patient Details ---")
+            for r in rows:
+                dob = r['dob'].strftime("%d-%m-%Y") if hasattr(r['dob'], "strftime") else (r['dob'] or "")
+                base_info = f"ID: {r['id']} | Name: {r['name']} | Age: {r['age']} | Gender: {r['gender']} | DOB: {dob} | Contact: {r['contact']} | Symptoms: {r['symptoms']}"
+                if show_otp:
+                    base_info += f" | OTP: {r.get('otp_code', 'N/A')}"
+                print(base_info)
 
-        cur.close()
+            cur.close()
 
     except Exception as e:
         print(f"[DB Error] Could not read patients: {e}")
 
-    finally:
-        if conn:
-            conn.close()
-
 
 def search_patients(role="admin"):
     """
@@ -313,37 +411,33 @@ def search_patients(role="admin"):
 
 def edit_patient():
     pid = validate_integer("Enter patient ID to edit: ")
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM patients WHERE id = %s", (pid,))
-        r = cur.fetchone()
-        if not r:
-            print(f"Patient ID {pid} not found.")
-            return
-        print(f"\nCurrent: ID: {r['id']} | Name: {r['name']} | Age: {r['age']} | Gender: {r['gender']} | DOB: {r['dob']} | Contact: {r['contact']} | Symptoms: {r['symptoms']}")
-        name = input(f"Enter new name (leave blank to keep '{r['name']}'): ").strip() or r['name']
-        age_input = input(f"Enter new age (leave blank to keep '{r['age']}'): ").strip()
-        age = int(age_input) if age_input else r['age']
-        gender = input(f"Enter new gender (leave blank to keep '{r['gender']}'): ").strip().title() or r['gender']
-        dob_input = input(f"Enter new DOB (dd-mm-yyyy) (leave blank to keep '{r['dob']}'): ").strip()
-        dob_sql = sql_date_from_ddmmyyyy(dob_input) if dob_input else (r['dob'].strftime("%Y-%m-%d") if r['dob'] else None)
-        contact = input(f"Enter new contact (leave blank to keep '{r['contact']}'): ").strip() or r['contact']
-        symptoms = input(f"Enter new symptoms (leave blank to keep current): ").strip() or r['symptoms']
-
-        cur.execute("""UPDATE patients SET name=%s, age=%s, gender=%s, dob=%s, contact=%s, symptoms=%s WHERE id=%s""",
-                    (name, age, gender, dob_sql, contact, symptoms, pid))
-        conn.commit()
-        print(f"✅ Patient ID {pid} updated successfully.")
-        cur.close()
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute("SELECT * FROM patients WHERE id = %s", (pid,))
+            r = cur.fetchone()
+            if not r:
+                print(f"Patient ID {pid} not found.")
+                return
+            print(f"\nCurrent: ID: {r['id']} | Name: {r['name']} | Age: {r['age']} | Gender: {r['gender']} | DOB: {r['dob']} | Contact: {r['contact']} | Symptoms: {r['symptoms']}")
+            name = input(f"Enter new name (leave blank to keep '{r['name']}'): ").strip() or r['name']
+            age_input = input(f"Enter new age (leave blank to keep '{r['age']}'): ").strip()
+            age = int(age_input) if age_input else r['age']
+            gender = input(f"Enter new gender (leave blank to keep '{r['gender']}'): ").strip().title() or r['gender']
+            dob_input = input(f"Enter new DOB (dd-mm-yyyy) (leave blank to keep '{r['dob']}'): ").strip()
+            dob_sql = sql_date_from_ddmmyyyy(dob_input) if dob_input else (r['dob'].strftime("%Y-%m-%d") if r['dob'] else None)
+            contact = input(f"Enter new contact (leave blank to keep '{r['contact']}'): ").strip() or r['contact']
+            symptoms = input(f"Enter new symptoms (leave blank to keep current): ").strip() or r['symptoms']
+
+            cur.execute("""UPDATE patients SET name=%s, age=%s, gender=%s, dob=%s, contact=%s, symptoms=%s WHERE id=%s""",
+                        (name, age, gender, dob_sql, contact, symptoms, pid))
+            conn.commit()
+            print(f"✅ Patient ID {pid} updated successfully.")
+            cur.close()
     except mysql.connector.IntegrityError as ie:
         print("Update failed: contact must be unique or constraint violation.")
     except Exception as e:
         print(f"[DB Error] Could not edit patient: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 # ---------------- Doctor Management with Authentication ----------------
 
@@ -358,43 +452,38 @@ def add_doctor():
         print("Specialization cannot be empty.")
         return
 
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        # Insert doctor first (ID auto-generated)
-        cur.execute(
-            "INSERT INTO doctors (name, specialization) VALUES (%s, %s)",
-            (name, spec)
-        )
+            # Insert doctor first (ID auto-generated)
+            cur.execute(
+                "INSERT INTO doctors (name, specialization) VALUES (%s, %s)",
+                (name, spec)
+            )
 
-        doctor_id = cur.lastrowid  # Newly created ID
+            doctor_id = cur.lastrowid  # Newly created ID
 
-        # Auto-generate username and password
-        username = str(doctor_id)
-        password = f"doctor_{doctor_id}"   # As you wanted
+            # Auto-generate username and password
+            username = str(doctor_id)
+            password = f"doctor_{doctor_id}"   # As you wanted
 
-        # Update doctor row with login credentials
-        cur.execute(
-            "UPDATE doctors SET username=%s, password=%s WHERE id=%s",
-            (username, password, doctor_id)
-        )
+            # Update doctor row with login credentials
+            cur.execute(
+                "UPDATE doctors SET username=%s, password=%s WHERE id=%s",
+                (username, password, doctor_id)
+            )
 
-        conn.commit()
+            conn.commit()
 
-        print(f"\nDoctor added successfully with ID: {doctor_id}")
-        print(f"Login credentials generated.")
+            print(f"\nDoctor added successfully with ID: {doctor_id}")
+            print(f"Login credentials generated.")
 
-        cur.close()
+            cur.close()
 
     except Exception as e:
         print(f"[DB Error] Could not add doctor: {e}")
 
-    finally:
-        if conn:
-            conn.close()
-
 
 
 
@@ -406,18 +495,17 @@ def doctor_authenticate():
         username = input("Enter your username (Doctor ID): ").strip()
         password = input("Enter your password: ").strip()
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        # Check username + password
-        cur.execute(
-            "SELECT id FROM doctors WHERE username=%s AND password=%s",
-            (username, password)
-        )
-        row = cur.fetchone()
+            # Check username + password
+            cur.execute(
+                "SELECT id FROM doctors WHERE username=%s AND password=%s",
+                (username, password)
+            )
+            row = cur.fetchone()
 
-        cur.close()
-        conn.close()
+            cur.close()
 
         if row:
             doctor_id = row[0]
@@ -435,69 +523,61 @@ def doctor_authenticate():
 
 def view_appointments_for_doctor(did):
     """Show only appointments for logged-in doctor."""
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("""SELECT a.id, a.patient_id, a.appointment_date, a.appointment_time, a.status
-                       FROM appointments a
-                       WHERE a.doctor_id=%s AND a.status!='Cancelled'
-                       ORDER BY a.appointment_date, a.appointment_time""", (did,))
-        rows = cur.fetchall()
-        if not rows:
-            print("No appointments found.")
-            return
-
-        print("\n--- Your Appointments ---")
-        for r in rows:
-            date_str = r['appointment_date'].strftime("%d-%m-%Y") if r['appointment_date'] else ""
-            if r['appointment_time']:
-                if hasattr(r['appointment_time'], 'seconds'):
-                    total_seconds = r['appointment_time'].seconds
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    time_str = f"{hours:02d}:{minutes:02d}"
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute("""SELECT a.id, a.patient_id, a.appointment_date, a.appointment_time, a.status
+                           FROM appointments a
+                           WHERE a.doctor_id=%s AND a.status!='Cancelled'
+                           ORDER BY a.appointment_date, a.appointment_time""", (did,))
+            rows = cur.fetchall()
+            if not rows:
+                print("No appointments found.")
+                return
+
+            print("\n--- Your Appointments ---")
+            for r in rows:
+                date_str = r['appointment_date'].strftime("%d-%m-%Y") if r['appointment_date'] else ""
+                if r['appointment_time']:
+                    if hasattr(r['appointment_time'], 'seconds'):
+                        total_seconds = r['appointment_time'].seconds
+                        hours = total_seconds // 3600
+                        minutes = (total_seconds % 3600) // 60
+                        time_str = f"{hours:02d}:{minutes:02d}"
+                    else:
+                        time_str = r['appointment_time'].strftime("%H:%M")
                 else:
-                    time_str = r['appointment_time'].strftime("%H:%M")
-            else:
-                time_str = ""
-            print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
-        cur.close()
+                    time_str = ""
+                print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
+            cur.close()
     except Exception as e:
         print(f"[DB Error] Could not read appointments: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 def view_doctors(search_term=None):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-
-        if search_term:
-            like = f"%{search_term}%"
-            cur.execute("""SELECT * FROM doctors 
-                           WHERE name LIKE %s OR specialization LIKE %s 
-                           ORDER BY id""", (like, like))
-        else:
-            cur.execute("SELECT * FROM doctors ORDER BY id")
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+
+            if search_term:
+                like = f"%{search_term}%"
+                cur.execute("""SELECT * FROM doctors 
+                               WHERE name LIKE %s OR specialization LIKE %s 
+                               ORDER BY id""", (like, like))
+            else:
+                cur.execute("SELECT * FROM doctors ORDER BY id")
 
-        rows = cur.fetchall()
-        if not rows:
-            print("No doctor records found.")
-            return
+            rows = cur.fetchall()
+            if not rows:
+                print("No doctor records found.")
+                return
 
-        print("\n--- Doctor Details ---")
-        for r in rows:
-            print(f"ID: {r['id']} | Name: {r['name']} | Specialization: {r['specialization']}")
-        cur.close()
+            print("\n--- Doctor Details ---")
+            for r in rows:
+                print(f"ID: {r['id']} | Name: {r['name']} | Specialization: {r['specialization']}")
+            cur.close()
     except Exception as e:
         print(f"[DB Error] Could not read doctors: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 
@@ -512,163 +592,184 @@ def search_doctors():
 
 def edit_doctor():
     did = validate_integer("Enter doctor ID to edit: ")
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM doctors WHERE id = %s", (did,))
-        r = cur.fetchone()
-        if not r:
-            print(f"Doctor ID {did} not found.")
-            return
-        print(f"Current: ID: {r['id']} | Name: {r['name']} | Specialization: {r['specialization']}")
-        name = input(f"Enter new name (leave blank to keep '{r['name']}'): ").strip() or r['name']
-        spec = input(f"Enter new specialization (leave blank to keep '{r['specialization']}'): ").strip() or r['specialization']
-        cur.execute("UPDATE doctors SET name=%s, specialization=%s WHERE id=%s", (name, spec, did))
-        conn.commit()
-        print(f"✅ Doctor ID {did} updated successfully.")
-        cur.close()
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute("SELECT * FROM doctors WHERE id = %s", (did,))
+            r = cur.fetchone()
+            if not r:
+                print(f"Doctor ID {did} not found.")
+                return
+            print(f"Current: ID: {r['id']} | Name: {r['name']} | Specialization: {r['specialization']}")
+            name = input(f"Enter new name (leave blank to keep '{r['name']}'): ").strip() or r['name']
+            spec = input(f"Enter new specialization (leave blank to keep '{r['specialization']}'): ").strip() or r['specialization']
+            cur.execute("UPDATE doctors SET name=%s, specialization=%s WHERE id=%s", (name, spec, did))
+            conn.commit()
+            print(f"✅ Doctor ID {did} updated successfully.")
+            cur.close()
     except Exception as e:
         print(f"[DB Error] Could not edit doctor: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 # ---------------- Appointment Management (DB) ----------------
 def patient_exists(pid):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM patients WHERE id=%s", (pid,))
-        res = cur.fetchone()
-        cur.close()
-        return bool(res)
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM patients WHERE id=%s", (pid,))
+            res = cur.fetchone()
+            cur.close()
+            return bool(res)
     except Exception:
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def doctor_exists(did):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM doctors WHERE id=%s", (did,))
-        res = cur.fetchone()
-        cur.close()
-        return bool(res)
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM doctors WHERE id=%s", (did,))
+            res = cur.fetchone()
+            cur.close()
+            return bool(res)
     except Exception:
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def has_conflict(did, date_sql, time_sql):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""SELECT 1 FROM appointments 
-                       WHERE doctor_id=%s AND appointment_date=%s AND appointment_time=%s AND status!='Cancelled'""",
-                    (did, date_sql, time_sql))
-        res = cur.fetchone()
-        cur.close()
-        return bool(res)
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""SELECT 1 FROM appointments 
+                           WHERE doctor_id=%s AND appointment_date=%s AND appointment_time=%s AND status!='Cancelled'""",
+                        (did, date_sql, time_sql))
+            res = cur.fetchone()
+            cur.close()
+            return bool(res)
     except Exception:
         return False
-    finally:
-        if conn:
-            conn.close()
+
+BOOKING_MESSAGES = {
+    "no_patient": "❌ Patient not found.",
+    "no_doctor": "❌ Doctor not found.",
+    "bad_otp": "❌ Invalid OTP.",
+    "conflict": "⚠️ Doctor already booked at that time.",
+}
+_RETRYABLE_ERRNOS = (1205, 1213)  # lock wait timeout, deadlock
+
+def book_appointment_tx(pid, did, date_sql, time_sql, otp=None, retries=3):
+    """
+    Book in one transaction: lock the doctor row (which also serialises
+    bookings for that doctor) and read the patient's OTP in the same
+    statement, re-check the slot with a locking read, insert, commit.
+    Four round trips on one pooled connection; two terminals can no longer
+    both pass the conflict check. otp=None skips the OTP check (admin).
+    Returns (status, appointment_id); status is "booked" or a key of
+    BOOKING_MESSAGES.
+    """
+    for attempt in range(retries):
+        try:
+            with db_connection() as conn:
+                cur = conn.cursor()
+                try:
+                    cur.execute("""SELECT d.id, p.id, p.otp_code
+                                   FROM doctors d LEFT JOIN patients p ON p.id=%s
+                                   WHERE d.id=%s FOR UPDATE""", (pid, did))
+                    row = cur.fetchone()
+                    if not row:
+                        status = "no_doctor"
+                    elif row[1] is None:
+                        status = "no_patient"
+                    elif otp is not None and not otp_matches(row[2], otp):
+                        status = "bad_otp"
+                    else:
+                        cur.execute("""SELECT id FROM appointments
+                                       WHERE doctor_id=%s AND appointment_date=%s AND appointment_time=%s
+                                       AND status!='Cancelled' LIMIT 1 FOR UPDATE""",
+                                    (did, date_sql, time_sql))
+                        status = "conflict" if cur.fetchone() else "booked"
+                    if status != "booked":
+                        conn.rollback()
+                        return status, None
+                    cur.execute("""INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time)
+                                   VALUES (%s,%s,%s,%s)""", (pid, did, date_sql, time_sql))
+                    conn.commit()
+                    return "booked", cur.lastrowid
+                finally:
+                    cur.close()
+        except Error as e:
+            if getattr(e, "errno", None) in _RETRYABLE_ERRNOS and attempt < retries - 1:
+                continue
+            raise
 
 def book_appointment(is_admin=False):
     pid = validate_integer("Enter patient ID: ")
     did = validate_integer("Enter doctor ID: ")
-
-    if not patient_exists(pid):
-        print("❌ Patient not found.")
-        return
-    if not doctor_exists(did):
-        print("❌ Doctor not found.")
-        return
-    if not is_admin and not verify_patient_otp(pid):
-        return
-
+    otp = None if is_admin else input("Enter your 4-digit OTP: ").strip()
     date = validate_date_input("Enter date (dd-mm-yyyy): ")
     time = validate_time_input("Enter time (HH:MM): ")
     date_sql, time_sql = sql_date_from_ddmmyyyy(date), sql_time_from_HHMM(time)
 
-    if has_conflict(did, date_sql, time_sql):
-        print("⚠️ Doctor already booked at that time.")
+    try:
+        status, aid = book_appointment_tx(pid, did, date_sql, time_sql, otp)
+    except Error as e:
+        print(f"[DB Error] Could not book appointment: {e}")
         return
-
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time)
-                   VALUES (%s,%s,%s,%s)""", (pid, did, date_sql, time_sql))
-    conn.commit()
-    print(f"✅ Appointment booked (ID: {cur.lastrowid})")
-    cur.close()
-    conn.close()
+    if status == "booked":
+        print(f"✅ Appointment booked (ID: {aid})")
+    else:
+        print(BOOKING_MESSAGES[status])
 
 
 def view_appointments(search_term=None, doctor_id=None):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-
-        query = """SELECT a.id, a.patient_id, a.doctor_id, a.appointment_date, a.appointment_time, a.status
-                   FROM appointments a
-                   WHERE a.status != 'Cancelled'"""
-        params = []
-
-        # Filter by doctor if doctor_id provided
-        if doctor_id:
-            query += " AND doctor_id=%s"
-            params.append(doctor_id)
-
-        # Filter by search_term if provided
-        if search_term:
-            like = f"%{search_term}%"
-            query += """ AND (
-                        CAST(a.id AS CHAR) LIKE %s OR
-                        CAST(a.patient_id AS CHAR) LIKE %s OR
-                        CAST(a.appointment_date AS CHAR) LIKE %s OR
-                        CAST(a.appointment_time AS CHAR) LIKE %s
-                       )"""
-            params.extend([like, like, like, like])
-
-        query += " ORDER BY a.appointment_date, a.appointment_time"
-
-        cur.execute(query, tuple(params))
-        rows = cur.fetchall()
-
-        if not rows:
-            print("No appointments found.")
-            return
-
-        print("\n--- Appointments ---")
-        for r in rows:
-            date_str = r['appointment_date'].strftime("%d-%m-%Y") if r['appointment_date'] else ""
-            if r['appointment_time']:
-                if hasattr(r['appointment_time'], 'seconds'):
-                    total_seconds = r['appointment_time'].seconds
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    time_str = f"{hours:02d}:{minutes:02d}"
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+
+            query = """SELECT a.id, a.patient_id, a.doctor_id, a.appointment_date, a.appointment_time, a.status
+                       FROM appointments a
+                       WHERE a.status != 'Cancelled'"""
+            params = []
+
+            # Filter by doctor if doctor_id provided
+            if doctor_id:
+                query += " AND doctor_id=%s"
+                params.append(doctor_id)
+
+            # Filter by search_term if provided
+            if search_term:
+                like = f"%{search_term}%"
+                query += """ AND (
+                            CAST(a.id AS CHAR) LIKE %s OR
+                            CAST(a.patient_id AS CHAR) LIKE %s OR
+                            CAST(a.appointment_date AS CHAR) LIKE %s OR
+                            CAST(a.appointment_time AS CHAR) LIKE %s
+                           )"""
+                params.extend([like, like, like, like])
+
+            query += " ORDER BY a.appointment_date, a.appointment_time"
+
+            cur.execute(query, tuple(params))
+            rows = cur.fetchall()
+
+            if not rows:
+                print("No appointments found.")
+                return
+
+            print("\n--- Appointments ---")
+            for r in rows:
+                date_str = r['appointment_date'].strftime("%d-%m-%Y") if r['appointment_date'] else ""
+                if r['appointment_time']:
+                    if hasattr(r['appointment_time'], 'seconds'):
+                        total_seconds = r['appointment_time'].seconds
+                        hours = total_seconds // 3600
+                        minutes = (total_seconds % 3600) // 60
+                        time_str = f"{hours:02d}:{minutes:02d}"
+                    else:
+                        time_str = r['appointment_time'].strftime("%H:%M")
                 else:
-                    time_str = r['appointment_time'].strftime("%H:%M")
-            else:
-                time_str = ""
-            print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Doctor ID: {r['doctor_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
-        cur.close()
+                    time_str = ""
+                print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Doctor ID: {r['doctor_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
+            cur.close()
     except Exception as e:
         print(f"[DB Error] Could not read appointments: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 def search_appointments():
@@ -688,38 +789,33 @@ def cancel_appointment(is_admin=False):
     if not is_admin and not verify_patient_otp(pid):
         return
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE appointments SET status='Cancelled' WHERE id=%s", (aid,))
-    if cur.rowcount:
-        conn.commit()
-        print("✅ Appointment cancelled.")
-    else:
-        print("❌ Appointment not found.")
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE appointments SET status='Cancelled' WHERE id=%s", (aid,))
+        if cur.rowcount:
+            conn.commit()
+            print("✅ Appointment cancelled.")
+        else:
+            print("❌ Appointment not found.")
+        cur.close()
             
 def view_cancelled_appointments():
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("""SELECT * FROM appointments WHERE status='Cancelled' ORDER BY appointment_date, appointment_time""")
-        rows = cur.fetchall()
-        if not rows:
-            print("No cancelled appointments found.")
-            return
-        print("\n--- Cancelled Appointments ---")
-        for r in rows:
-            date_str = r['appointment_date'] if r['appointment_date'] else ""
-            time_str = str(r['appointment_time'])
-            print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Doctor ID: {r['doctor_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
-        cur.close()
+        with db_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute("""SELECT * FROM appointments WHERE status='Cancelled' ORDER BY appointment_date, appointment_time""")
+            rows = cur.fetchall()
+            if not rows:
+                print("No cancelled appointments found.")
+                return
+            print("\n--- Cancelled Appointments ---")
+            for r in rows:
+                date_str = r['appointment_date'] if r['appointment_date'] else ""
+                time_str = str(r['appointment_time'])
+                print(f"ID: {r['id']} | Patient ID: {r['patient_id']} | Doctor ID: {r['doctor_id']} | Date: {date_str} | Time: {time_str} | Status: {r['status']}")
+            cur.close()
     except Exception as e:
         print(f"[DB Error] Could not read cancelled appointments: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 # ---------------- Role-Based Menus ----------------
@@ -795,7 +891,8 @@ def admin_menu():
         print("10. View Appointments")
         print("11. Cancel Appointment")
         print("12. View Cancelled Appointments")
-        print("13. Exit to Main Menu")
+        print("13. Connection Pool Stats")
+        print("14. Exit to Main Menu")
 
         choice = input("Enter your choice: ").strip()
         if choice == "1":
@@ -823,6 +920,8 @@ def admin_menu():
         elif choice == "12":
             view_cancelled_appointments()
         elif choice == "13":
+            show_pool_stats()
+        elif choice == "14":
             print("Returning to main menu...")
             break
         else:
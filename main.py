@@ -1,21 +1,44 @@
 import uvicorn
-from fastapi import FastAPI, Request, Form, Depends, HTTPException
-from fastapi.responses import RedirectResponse ,  HTMLResponse
+from fastapi import FastAPI, Request, Form, Depends, HTTPException, File, UploadFile, Body
+from fastapi.responses import RedirectResponse ,  HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-import crud, models
-from db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, crud_async, models, availability, daily_stats, patient_search, metrics, export, bulk_import, otp_guard
+from db import get_db, get_async_db, get_read_db, get_async_read_db, pool_stats, replicas
 from models import Appointment , Doctor , Patient
-from db import SessionLocal, engine
+from db import SessionLocal, engine, async_engine
 from fastapi.staticfiles import StaticFiles
+import io
+import os
 import random
+from datetime import datetime, timedelta
 from starlette.middleware.sessions import SessionMiddleware
 # ---------------- Setup ----------------
+# Signs the session cookie, which carries patients' OTP verification; never use a default
+SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "")
+if not SESSION_SECRET_KEY:
+    raise RuntimeError("SESSION_SECRET_KEY is not set; generate one with: python -c \"import secrets; print(secrets.token_urlsafe(32))\"")
 models.Base.metadata.create_all(bind=engine)
+models.ensure_columns(engine)
+models.ensure_indexes(engine)
+with SessionLocal() as _db:
+    availability.index.load(_db)
+    daily_stats.ensure_built(_db)
+patient_search.setup(engine)
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
-app.add_middleware(SessionMiddleware, secret_key="your-secret-key")
+# Lets patient forms leave the OTP optional once this session has verified someone
+templates.env.globals["otp_verified"] = otp_guard.has_verified
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET_KEY)
+# Outermost middleware, so its timings cover the whole request
+metrics.registry.instrument_engine(engine)
+metrics.registry.instrument_engine(async_engine.sync_engine)
+for _replica in replicas.replicas:
+    metrics.registry.instrument_engine(_replica.engine)
+    metrics.registry.instrument_engine(_replica.async_engine.sync_engine)
+app.add_middleware(metrics.MetricsMiddleware, registry=metrics.registry)
 
 # ---------------- Role Dashboard ----------------
 @app.get("/")
@@ -79,12 +102,15 @@ def patient_action(action: str = Form(...)):
     raise HTTPException(status_code=400, detail="Invalid action")
 # ---------- VIEW & SEARCH DOCTORS ----------
 @app.get("/patient/view_doctors")
-def view_doctors(request: Request, db: Session = Depends(get_db)):
-    doctors = crud.get_doctors(db)
-    return templates.TemplateResponse("view_doctors.html", {"request": request, "doctors": doctors})
+def view_doctors(request: Request, after: str = None, page_size: int = None, db: Session = Depends(get_read_db)):
+    doctors, next_cursor = crud.get_doctors_page(db, after=after, page_size=page_size)
+    return templates.TemplateResponse(
+    "view_doctors.html",
+    {"request": request, "doctors": doctors, "next_cursor": next_cursor}
+    )
 @app.get("/patient/search_doctors")
 @app.get("/patient/search_doctors/")
-def handle_search_doctors(request: Request, term: str = "", db: Session = Depends(get_db)):
+def handle_search_doctors(request: Request, term: str = "", db: Session = Depends(get_read_db)):
     doctors = crud.search_doctor(db, term) if term else []
     return templates.TemplateResponse(
     "search_doctors.html",
@@ -93,105 +119,153 @@ def handle_search_doctors(request: Request, term: str = "", db: Session = Depend
 # ---------- BOOK APPOINTMENT (OTP REQUIRED for Patient only) ----------
 @app.get("/patient/book_appointment")
 def patient_book_appointment_page(request: Request, db: Session = Depends(get_db)):
-    patients = crud.get_patients(db)
     doctors = crud.get_doctors(db)
     return templates.TemplateResponse(
     "book_appointment.html",
     {
     "request": request,
-    "patients": crud.get_patients(db),
-    "doctors": crud.get_doctors(db),
+    "doctors": doctors,
     "source": "patient"
     }
     )
 @app.post("/patient/book_appointment")
-def book_appointment_post(
+async def book_appointment_post(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     patient_id: int = Form(...),
     doctor_id: int = Form(...),
     appointment_date: str = Form(...),
     appointment_time: str = Form(...),
-    otp: str = Form(...)
+    otp: str = Form(None)
     ):
     # Convert to correct variable names
     date = appointment_date
     time = appointment_time
     otp_code = otp
-    # 1️⃣ Verify Patient
-    patient = crud.get_patient(db, patient_id)
-    if not patient:
-        return templates.TemplateResponse(
-            "book_appointment.html",
-            {
-                "request": request,
-                "patients": crud.get_patients(db),
-                "doctors": crud.get_doctors(db),
-                "source": "patient",
-                "message": "❌ Invalid patient ID!"
-            }
+    # 1️⃣ Verify Patient + OTP (skipped if this session verified them recently)
+    if not otp_guard.is_verified(request.session, patient_id):
+        # Rate limit before any DB query
+        wait = otp_guard.check_attempt(patient_id, otp_guard.client_ip(request))
+        if wait:
+            return templates.TemplateResponse(
+                "book_appointment.html",
+                {
+                    "request": request,
+                    "source": "patient",
+                    "message": f"❌ Too many OTP attempts. Try again in {wait} seconds."
+                },
+                status_code=429
+            )
+        patient = await crud_async.get_patient(db, patient_id)
+        if not patient:
+            return templates.TemplateResponse(
+                "book_appointment.html",
+                {
+                    "request": request,
+                    "source": "patient",
+                    "message": "❌ Invalid patient ID!"
+                }
+            )
+        # 2️⃣ Verify OTP
+        if not otp_guard.otp_matches(patient.otp_code, otp_code):
+            return templates.TemplateResponse(
+                "book_appointment.html",
+                {
+                    "request": request,
+                    "source": "patient",
+                    "message": "❌ Incorrect OTP. Try again."
+                }
+            )
+        otp_guard.remember_verified(request.session, patient_id)
+    # 3️⃣ Create Appointment
+    try:
+        appointment = await crud_async.create_appointment(
+            db,
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            date=date,
+            time=time
         )
-    # 2️⃣ Verify OTP
-    if patient.otp_code != otp_code:
+    except crud.SlotTakenError:
         return templates.TemplateResponse(
             "book_appointment.html",
             {
                 "request": request,
-                "patients": crud.get_patients(db),
-                "doctors": crud.get_doctors(db),
                 "source": "patient",
-                "message": "❌ Incorrect OTP. Try again."
-            }
+                "message": "❌ Slot taken: the doctor is already booked at that time."
+            },
+            status_code=409
         )
-    # 3️⃣ Create Appointment
-    appointment = crud.create_appointment(
-        db,
-        patient_id=patient_id,
-        doctor_id=doctor_id,
-        date=date,
-        time=time
-    )
     # 4️⃣ Success message
     return templates.TemplateResponse(
         "book_appointment.html",
         {
             "request": request,
-            "patients": crud.get_patients(db),
-            "doctors": crud.get_doctors(db),
             "source": "patient",
             "success": f"Appointment booked! ID: {appointment.id}"
         }
     )
+# ---------- DOCTOR AVAILABILITY (served from memory, refreshed from the DB on a TTL) ----------
+@app.get("/api/doctors/{doctor_id}/free_slots")
+def doctor_free_slots(doctor_id: int, date: str, db: Session = Depends(get_db)):
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date must be YYYY-MM-DD")
+    # The session is only used when this day's bitmap is older than AVAILABILITY_TTL
+    slots = availability.index.free_slots(doctor_id, day, db)
+    return {
+        "doctor_id": doctor_id,
+        "date": day.isoformat(),
+        "slot_minutes": availability.index.slot_minutes,
+        "free_slots": [t.strftime("%H:%M") for t in slots]
+    }
 # ---------- VIEW & CANCEL APPOINTMENTS ----------
 @app.get("/patient/view_appointments")
-def view_patient_appointments(request: Request, db: Session = Depends(get_db)):
-    appointments = crud.get_appointments(db)
-    return templates.TemplateResponse("view_appointments.html", {"request": request, "appointments": appointments})
+def view_patient_appointments(request: Request, after: str = None, page_size: int = None, db: Session = Depends(get_read_db)):
+    appointments, next_cursor = crud.get_appointments_page(db, after=after, page_size=page_size)
+    return templates.TemplateResponse(
+    "view_appointments.html",
+    {"request": request, "appointments": appointments, "next_cursor": next_cursor}
+    )
 @app.get("/patient/view_appointments_auth")
 def view_appointments_auth_page(request: Request):
     return templates.TemplateResponse("view_appointments_auth.html", {"request": request})
 @app.post("/patient/view_appointments_auth")
-def view_appointments_auth(
+async def view_appointments_auth(
     request: Request,
     patient_id: int = Form(...),
-    otp: str = Form(...),
-    db: Session = Depends(get_db)
+    otp: str = Form(None),
+    db: AsyncSession = Depends(get_async_db)
     ):
-    # Verify patient exists
-    patient = crud.get_patient(db, patient_id)
+    # Verified in this session recently (e.g. just booked)? No OTP check needed
+    verified = otp_guard.is_verified(request.session, patient_id)
+    if not verified:
+        # Rate limit before any DB query
+        wait = otp_guard.check_attempt(patient_id, otp_guard.client_ip(request))
+        if wait:
+            return templates.TemplateResponse(
+            "view_appointments_auth.html",
+            {"request": request, "message": f"❌ Too many OTP attempts. Try again in {wait} seconds."},
+            status_code=429
+            )
+    # Verify patient exists (the session only holds IDs, so the name comes from here)
+    patient = await crud_async.get_patient(db, patient_id)
     if not patient:
         return templates.TemplateResponse(
         "view_appointments_auth.html",
         {"request": request, "message": "❌ Invalid patient ID!"}
         )
-    # Verify OTP
-    if patient.otp_code != otp:
-        return templates.TemplateResponse(
-        "view_appointments_auth.html",
-        {"request": request, "message": "❌ Incorrect OTP. Try again."}
-        )
+    if not verified:
+        # Verify OTP
+        if not otp_guard.otp_matches(patient.otp_code, otp):
+            return templates.TemplateResponse(
+            "view_appointments_auth.html",
+            {"request": request, "message": "❌ Incorrect OTP. Try again."}
+            )
+        otp_guard.remember_verified(request.session, patient_id)
     # Get appointments for this patient
-    appointments = db.query(models.Appointment).filter(models.Appointment.patient_id == patient_id).all()
+    appointments = await crud_async.get_appointments_for_patient(db, patient_id)
     return templates.TemplateResponse(
     "view_appointments.html",
     {"request": request, "appointments": appointments, "patient_name": patient.name}
@@ -212,57 +286,42 @@ def patient_cancel_page(request: Request):
 async def cancel_appointment(
     request: Request,
     appointment_id: int = Form(...),
-    otp: str = Form(None),      # ⬅ OTP OPTIONAL
-    db: Session = Depends(get_db)
+    patient_id: int = Form(...),
+    otp: str = Form(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Detect call source: patient or admin
-    form_source = request.query_params.get("source", "patient")
-    # OTP required ONLY for patient
-    if form_source == "patient":
-        if otp is None:
-            return templates.TemplateResponse(
-                "cancel_appointment.html",
-                {
-                    "request": request,
-                    "form_action": "/patient/cancel_appointment?source=patient",
-                    "back_link": "/patient",
-                    "message": "OTP is required for patient cancellation!"
-                }
-            )
-        # Validate OTP
-        patient = db.query(models.Patient).filter(models.Patient.otp_code == otp).first()
-        if not patient:
+    # Admin cancellations go through /admin/cancel_appointment; here the
+    # patient must prove they own the appointment.
+    page = {
+        "request": request,
+        "form_action": "/patient/cancel_appointment",
+        "back_link": "/patient",
+        "source": "patient"
+    }
+    verified = otp_guard.is_verified(request.session, patient_id)
+    if not verified:
+        # Rate limit before any DB query
+        wait = otp_guard.check_attempt(patient_id, otp_guard.client_ip(request))
+        if wait:
             return templates.TemplateResponse(
                 "cancel_appointment.html",
-                {
-                    "request": request,
-                    "form_action": "/patient/cancel_appointment?source=patient",
-                    "back_link": "/patient",
-                    "message": "Invalid OTP!"
-                }
+                {**page, "message": f"Too many OTP attempts. Try again in {wait} seconds."},
+                status_code=429
             )
-    # Proceed with appointment cancellation
-    appt = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
-    if not appt:
+    # One PK lookup: the appointment, only if it is this patient's, with their OTP
+    # (ownership is checked even when the OTP check is skipped)
+    found = await crud_async.get_appointment_for_patient(db, appointment_id, patient_id)
+    if not found or not (verified or otp_guard.otp_matches(found.otp_code, otp)):
         return templates.TemplateResponse(
             "cancel_appointment.html",
-            {
-                "request": request,
-                "form_action": f"/patient/cancel_appointment?source={form_source}",
-                "back_link": "/patient" if form_source=="patient" else "/admin",
-                "message": "Appointment not found!"
-            }
+            {**page, "message": "Invalid patient ID, appointment ID or OTP!"}
         )
-    appt.status = "Cancelled"
-    db.commit()
+    if not verified:
+        otp_guard.remember_verified(request.session, patient_id)
+    await crud_async.cancel_appointment(db, found.Appointment)
     return templates.TemplateResponse(
         "cancel_appointment.html",
-        {
-            "request": request,
-            "success": "Appointment cancelled successfully!",
-            "form_action": f"/patient/cancel_appointment?source={form_source}",
-            "back_link": "/patient" if form_source=="patient" else "/admin"
-        }
+        {**page, "success": "Appointment cancelled successfully!"}
     )
 # ---------------- Doctor Dashboard ----------------
 @app.get("/doctor/dashboard")
@@ -270,7 +329,12 @@ def doctor_dashboard(request: Request, db: Session = Depends(get_db)):
     doctor_id = request.session.get("doctor_id")
     if not doctor_id:
         return RedirectResponse("/doctor/login", status_code=303)
-    doctor = db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+    # Cached since login: no DB query unless the profile was evicted or edited
+    doctor = crud.get_doctor_profile(db, doctor_id)
+    if not doctor:
+        # Deleted while logged in
+        request.session.clear()
+        return RedirectResponse("/doctor/login", status_code=303)
     return templates.TemplateResponse(
     "doctor_dashboard.html",
     {"request": request, "doctor": doctor}
@@ -288,22 +352,36 @@ def doctor_dashboard_action(
         return RedirectResponse("/doctor/search_patients", status_code=303)
     elif action == "view_appointments":
         return RedirectResponse("/doctor/view_appointments", status_code=303)
+    elif action == "schedule":
+        return RedirectResponse("/doctor/schedule", status_code=303)
     elif action == "logout":
         request.session.clear()
         return RedirectResponse("/doctor/login", status_code=303)
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
 @app.get("/doctor/view_patients")
-def view_patients(request: Request, searchTerm: str = "", db: Session = Depends(get_db)):
+def view_patients(
+    request: Request,
+    searchTerm: str = "",
+    after: str = None,
+    page_size: int = None,
+    db: Session = Depends(get_read_db)
+    ):
 # Call the updated get_patients with optional search term
     searchTerm = searchTerm.strip()
-    patients = crud.get_patients(db, searchTerm)
+    patients, next_cursor = crud.get_patients_page(db, searchTerm, after=after, page_size=page_size)
     return templates.TemplateResponse(
     "search_patient.html",  # Render search + results in one page
-    {"request": request, "patients": patients, "show_otp": False, "searchTerm": searchTerm}
+    {
+    "request": request,
+    "patients": patients,
+    "next_cursor": next_cursor,
+    "show_otp": False,
+    "searchTerm": searchTerm
+    }
     )
 @app.get("/doctor/search_patients")
-def search_patients(request: Request, searchTerm: str = "", db: Session = Depends(get_db)):
+def search_patients(request: Request, searchTerm: str = "", db: Session = Depends(get_read_db)):
 # Fetch patients based on ID, Name, or Contact
     patients = crud.get_patients(db, searchTerm) if searchTerm else None
     return templates.TemplateResponse(
@@ -316,14 +394,62 @@ def search_patients(request: Request, searchTerm: str = "", db: Session = Depend
     }
     )
 @app.get("/doctor/view_appointments")
-def doctor_view_appointments(request: Request, db: Session = Depends(get_db)):
+async def doctor_view_appointments(
+    request: Request,
+    after: str = None,
+    page_size: int = None,
+    db: AsyncSession = Depends(get_async_read_db)
+    ):
     doctor_id = request.session.get("doctor_id")
     if not doctor_id:
         return RedirectResponse("/doctor/login", status_code=303)
-    appointments = crud.get_appointments_for_doctor(db, doctor_id)
+    appointments, next_cursor = await crud_async.get_appointments_page(
+        db, doctor_id=doctor_id, after=after, page_size=page_size
+    )
     return templates.TemplateResponse(
     "view_appointments.html",
-    {"request": request, "appointments": appointments}
+    {"request": request, "appointments": appointments, "next_cursor": next_cursor}
+    )
+@app.get("/doctor/schedule")
+async def doctor_schedule(
+    request: Request,
+    date: str = None,
+    view: str = "day",
+    db: AsyncSession = Depends(get_async_read_db)
+    ):
+    doctor_id = request.session.get("doctor_id")
+    if not doctor_id:
+        return RedirectResponse("/doctor/login", status_code=303)
+    doctor = await crud_async.get_doctor_profile(db, doctor_id)  # cached since login
+    if not doctor:
+        request.session.clear()
+        return RedirectResponse("/doctor/login", status_code=303)
+    if view not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="view must be day or week")
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date() if date else datetime.now().date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date must be YYYY-MM-DD")
+    first, last = crud.schedule_range(day, view)
+    # One query: appointments joined to patient name/contact
+    rows = await crud_async.get_doctor_schedule(db, doctor_id, first, last)
+    days = {first + timedelta(days=n): [] for n in range((last - first).days + 1)}
+    for row in rows:
+        days[row.appointment_date].append(row)
+    step = timedelta(days=7 if view == "week" else 1)
+    return templates.TemplateResponse(
+    "doctor_schedule.html",
+    {
+    "request": request,
+    "doctor": doctor,
+    "view": view,
+    "first": first,
+    "last": last,
+    "days": days,
+    "total": len(rows),
+    "previous_date": (day - step).isoformat(),
+    "next_date": (day + step).isoformat()
+    }
     )
 @app.get("/doctor/logout")
 def doctor_logout(request: Request):
@@ -331,8 +457,37 @@ def doctor_logout(request: Request):
     return RedirectResponse("/doctor/login", status_code=303)
 # ---------------- Admin Dashboard ----------------
 @app.get("/admin")
-def admin_dashboard(request: Request):
-    return templates.TemplateResponse("admin_dashboard.html", {"request": request})
+def admin_dashboard(request: Request, db: Session = Depends(get_read_db)):
+    # Read from the daily summary table, not COUNT(*) over appointments
+    stats = daily_stats.summary(db)
+    return templates.TemplateResponse("admin_dashboard.html", {"request": request, "stats": stats})
+@app.get("/api/stats/daily")
+def appointment_stats(
+    date_from: str = None,
+    date_to: str = None,
+    doctor_id: int = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Appointment counts per doctor, day and status (default: the last 7 days),
+    plus the dashboard summary for date_to.
+    """
+    try:
+        last = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else datetime.now().date()
+        first = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else last - timedelta(days=6)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if first > last:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    if (last - first).days >= 366:
+        raise HTTPException(status_code=400, detail="At most 366 days per request")
+    return {
+        "date_from": first.isoformat(),
+        "date_to": last.isoformat(),
+        "doctor_id": doctor_id,
+        "days": daily_stats.daily_counts(db, first, last, doctor_id),
+        "summary": daily_stats.summary(db, last)
+    }
 @app.get("/admin/login")
 def admin_login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
@@ -387,18 +542,18 @@ def search_doctor_page(request: Request):
     return templates.TemplateResponse("search_doctors.html", {"request": request})
 # For POST
 @app.post("/admin/search_doctors")
-def search_doctor_form(request: Request, term: str = Form(...), db: Session = Depends(get_db)):
+def search_doctor_form(request: Request, term: str = Form(...), db: Session = Depends(get_read_db)):
     doctors = crud.search_doctor(db, term)
     return templates.TemplateResponse(
     "search_doctors.html",
     {"request": request, "doctors": doctors, "searched": term}
     )
 @app.get("/admin/view_doctors")
-def view_doctors_page(request: Request, db: Session = Depends(get_db)):
-    doctors = crud.get_doctors(db)  # fetch all doctors
+def view_doctors_page(request: Request, after: str = None, page_size: int = None, db: Session = Depends(get_read_db)):
+    doctors, next_cursor = crud.get_doctors_page(db, after=after, page_size=page_size)
     return templates.TemplateResponse(
     "view_doctors.html",
-    {"request": request, "doctors": doctors}
+    {"request": request, "doctors": doctors, "next_cursor": next_cursor}
     )
 # ----------------------------  
 # PATIENT MANAGEMENT - ADMIN  
@@ -421,24 +576,35 @@ def add_patient_form(
     crud.create_patient(db, name, age, gender, dob, contact, symptoms)
     return RedirectResponse("/admin/view_patients", status_code=303)  # redirect to view all patients
 @app.get("/admin/view_patients")
-def view_patients(request: Request, db: Session = Depends(get_db)):
+def view_patients(request: Request, after: str = None, page_size: int = None, db: Session = Depends(get_read_db)):
     """
-    View all patients. No search functionality here anymore.
+    View all patients, one page at a time. No search functionality here anymore.
     """
-    patients = crud.get_patients(db)  # fetch all patients
+    patients, next_cursor = crud.get_patients_page(db, after=after, page_size=page_size)
     return templates.TemplateResponse(
     "view_patients.html",
     {
     "request": request,
     "patients": patients,
+    "next_cursor": next_cursor,
     "show_otp": True
     }
     )
+@app.post("/admin/import_patients")
+def import_patients(file: UploadFile = File(...)):
+    """
+    Bulk-register patients from a CSV upload (data/patients.txt layout).
+    Returns the import report: inserted/failed counts, rows/s and per-row errors.
+    """
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    report = bulk_import.import_patients(engine, lines)
+    patient_search.reload(engine)
+    return report
 @app.get("/admin/search_patients")
 def search_patients_page(request: Request):
     return templates.TemplateResponse("search_patient.html", {"request": request, "show_otp": True})
 @app.post("/admin/search_patients")
-def search_patients_form(request: Request, term: str = Form(...), db: Session = Depends(get_db)):
+def search_patients_form(request: Request, term: str = Form(...), db: Session = Depends(get_read_db)):
     patients = crud.search_patient(db, term)
     return templates.TemplateResponse(
     "search_patient.html",
@@ -450,52 +616,175 @@ def search_patients_form(request: Request, term: str = Form(...), db: Session =
 # ---------------- Admin Book Appointment ----------------
 @app.get("/admin/book_appointment")
 def admin_book_appointment_page(request: Request, db: Session = Depends(get_db)):
-    patients = crud.get_patients(db)
     doctors = crud.get_doctors(db)
     return templates.TemplateResponse(
     "book_appointment.html",
-    {"request": request, "patients": patients, "doctors": doctors, "source": "admin"}
+    {"request": request, "doctors": doctors, "source": "admin"}
     )
 @app.post("/admin/book_appointment")
-def admin_book_appointment(
+async def admin_book_appointment(
     request: Request,
     patient_id: int = Form(...),
     doctor_id: int = Form(...),
     appointment_date: str = Form(...),
     appointment_time: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
     ):
-    appointment = crud.create_appointment(db, patient_id, doctor_id, appointment_date, appointment_time)
-    message = f"Appointment booked successfully (Admin Access)! ID: {appointment.id}"
-    patients = crud.get_patients(db)
-    doctors = crud.get_doctors(db)
+    status_code = 200
+    try:
+        appointment = await crud_async.create_appointment(db, patient_id, doctor_id, appointment_date, appointment_time)
+        message = f"Appointment booked successfully (Admin Access)! ID: {appointment.id}"
+    except crud.SlotTakenError:
+        message = "❌ Slot taken: the doctor is already booked at that time."
+        status_code = 409
     return templates.TemplateResponse(
     "book_appointment.html",
-    {"request": request, "message": message, "patients": patients, "doctors": doctors, "source": "admin"}
+    {"request": request, "message": message, "source": "admin"},
+    status_code=status_code
     )
+# ---------- BATCH BOOKING (JSON, for front-desk session planning) ----------
+@app.post("/api/appointments/batch")
+def book_appointments_batch(appointments: list = Body(..., embed=True), db: Session = Depends(get_db)):
+    """
+    Body: {"appointments": [{"patient_id": 1, "doctor_id": 2, "date": "YYYY-MM-DD", "time": "HH:MM"}, ...]}
+    (items may also be [patient_id, doctor_id, date, time] lists).
+    Returns a result per item, in order.
+    """
+    if len(appointments) > crud.BATCH_BOOKING_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {crud.BATCH_BOOKING_MAX} appointments per batch")
+    items = [
+        (a.get("patient_id"), a.get("doctor_id"), a.get("date"), a.get("time")) if isinstance(a, dict) else a
+        for a in appointments
+    ]
+    try:
+        results = crud.create_appointments_batch(db, items)
+    except crud.SlotTakenError:
+        raise HTTPException(status_code=409, detail="Slots were booked concurrently; retry the batch")
+    booked = sum(1 for r in results if r["status"] == "booked")
+    return {"booked": booked, "failed": len(results) - booked, "results": results}
+# ---------- RECURRING SERIES (JSON) ----------
+def _series_json(series, occurrences=None):
+    data = {
+        "series_id": series.id,
+        "patient_id": series.patient_id,
+        "doctor_id": series.doctor_id,
+        "start_date": series.start_date.isoformat(),
+        "end_date": series.end_date.isoformat(),
+        "time": series.appointment_time.strftime("%H:%M"),
+        "weekdays": series.weekday_list,
+        "interval_weeks": series.interval_weeks,
+        "status": series.status
+    }
+    if occurrences is not None:
+        data["occurrences"] = [
+            {"appointment_id": a.id, "date": a.appointment_date.isoformat(), "status": a.status}
+            for a in occurrences
+        ]
+    return data
+@app.post("/api/appointment_series")
+def create_appointment_series(
+    patient_id: int = Body(...),
+    doctor_id: int = Body(...),
+    start_date: str = Body(...),
+    end_date: str = Body(...),
+    time: str = Body(...),
+    weekdays: list[int] = Body(None),
+    interval_weeks: int = Body(1),
+    skip_conflicts: bool = Body(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Body: {"patient_id": 1, "doctor_id": 2, "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD",
+    "time": "HH:MM", "weekdays": [0, 3], "interval_weeks": 1, "skip_conflicts": false}
+    weekdays: 0 = Monday; defaults to the weekday of start_date.
+    """
+    try:
+        series, booked, skipped = crud.create_appointment_series(
+            db, patient_id, doctor_id, start_date, end_date, time,
+            weekdays=weekdays, interval_weeks=interval_weeks, skip_conflicts=skip_conflicts
+        )
+    except crud.SeriesConflictError as e:
+        raise HTTPException(status_code=409, detail={
+            "message": str(e), "conflicts": [d.isoformat() for d in e.dates]
+        })
+    except crud.SlotTakenError:
+        raise HTTPException(status_code=409, detail="Slots were booked concurrently; retry")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        **_series_json(series),
+        "booked": [d.isoformat() for d in booked],
+        "skipped": [d.isoformat() for d in skipped]
+    }
+@app.get("/api/appointment_series/{series_id}")
+def get_appointment_series(series_id: int, db: Session = Depends(get_db)):
+    series = crud.get_appointment_series(db, series_id)
+    if not series:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return _series_json(series, crud.get_series_occurrences(db, series_id))
+@app.post("/api/appointment_series/{series_id}/cancel")
+def cancel_appointment_series(series_id: int, db: Session = Depends(get_db)):
+    """Cancel all occurrences from today on; past ones stay as history."""
+    result = crud.cancel_appointment_series(db, series_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Series not found")
+    series, cancelled = result
+    return {**_series_json(series), "cancelled": cancelled}
 # ----------------------------
 # ADMIN: VIEW APPOINTMENTS
 # ----------------------------
 @app.get("/admin/view_appointments")
-def admin_view_appointments(request: Request, db: Session = Depends(get_db)):
-    appointments = db.query(Appointment).all()
+async def admin_view_appointments(
+    request: Request,
+    after: str = None,
+    page_size: int = None,
+    db: AsyncSession = Depends(get_async_read_db)
+    ):
+    appointments, next_cursor = await crud_async.get_appointments_page(
+        db, include_cancelled=True, after=after, page_size=page_size
+    )
     return templates.TemplateResponse(
     "view_appointments.html",
     {
     "request": request,
     "appointments": appointments,
+    "next_cursor": next_cursor,
     "source": "admin"
     }
     )
+# ----------------------------
+# ADMIN: EXPORT APPOINTMENTS (streamed CSV / NDJSON)
+# ----------------------------
+@app.get("/admin/export_appointments")
+def export_appointments(
+    format: str = "csv",
+    date_from: str = None,
+    date_to: str = None,
+    doctor_id: int = None,
+    status: str = None
+    ):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    try:
+        date_from = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else None
+        date_to = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    chunks = export.stream_appointments(
+        format, date_from=date_from, date_to=date_to, doctor_id=doctor_id, status=status
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="appointments.{format}"'}
+    )
 # ---------------- Admin Cancel Appointment ----------------
 @app.get("/admin/cancel_appointment")
-def admin_cancel_appointment_page(request: Request, db: Session = Depends(get_db)):
-    appointments = crud.get_appointments(db)
+def admin_cancel_appointment_page(request: Request):
     return templates.TemplateResponse(
     "cancel_appointment.html",
     {
     "request": request,
-    "appointments": appointments,
     "form_action": "/admin/cancel_appointment?source=admin",  # ⬅ important
     "back_link": "/admin",
     "source": "admin"  # ⬅ tells HTML not to show OTP
@@ -509,17 +798,14 @@ def admin_cancel_appointment(
     ):
     appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if appointment:
-        appointment.status = "Cancelled"
-        db.commit()
+        crud.cancel_appointment(db, appointment)
         message = f"Appointment ID {appointment_id} cancelled successfully!"
     else:
         message = f"No appointment found with ID {appointment_id}."
-    appointments = crud.get_appointments(db)
     return templates.TemplateResponse(
     "cancel_appointment.html",
     {
     "request": request,
-    "appointments": appointments,
     "form_action": "/admin/cancel_appointment?source=admin",  # ⬅ keep consistent
     "back_link": "/admin",
     "message": message,
@@ -527,17 +813,32 @@ def admin_cancel_appointment(
     }
     )
 @app.get("/admin/view_cancelled")
-def view_cancelled_appointments(request: Request, db: Session = Depends(get_db)):
+def view_cancelled_appointments(request: Request, after: str = None, page_size: int = None, db: Session = Depends(get_read_db)):
 # Fetch only cancelled appointments
-    cancelled_appointments = db.query(Appointment).filter(Appointment.status == "Cancelled").all()
+    cancelled_appointments, next_cursor = crud.get_appointments_page(
+        db, include_cancelled=True, status="Cancelled", after=after, page_size=page_size
+    )
 # Render your 'view_cancelled_appointments.html' template
     return templates.TemplateResponse(
     "view_cancelled_appointments.html",
     {
     "request": request,
-    "appointments": cancelled_appointments
+    "appointments": cancelled_appointments,
+    "next_cursor": next_cursor
     }
     )
+# ----------------------------
+# METRICS (Prometheus text format)
+# ----------------------------
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+# ----------------------------
+# ADMIN: DB POOL STATISTICS
+# ----------------------------
+@app.get("/admin/pool_stats")
+def admin_pool_stats():
+    return pool_stats()
 # GET route – show form & fetch doctor by ID
 @app.get("/admin/edit_doctor")
 def edit_doctor_page(request: Request, doctor_id: int = None, db: Session = Depends(get_db)):
@@ -567,6 +868,8 @@ def update_doctor(
         if specialization.strip():
             doctor.specialization = specialization.strip()
         db.commit()
+        crud.invalidate_doctor_directory()
+        crud.invalidate_doctor_profile(doctor_id)
         message = f"✅ Doctor ID {doctor_id} updated successfully."
     else:
         message = f"❌ Doctor ID {doctor_id} not found."
@@ -616,6 +919,7 @@ def update_patient(
             patient.symptoms = symptoms.strip()
         
         db.commit()
+        patient_search.index_patient(patient)
         message = f"✅ Patient ID {patient_id} updated successfully."
     else:
         message = f"❌ Patient ID {patient_id} not found."
@@ -632,16 +936,17 @@ def doctor_login_page(request: Request):
 
 
 @app.post("/doctor/login")
-def doctor_login(
+async def doctor_login(
     request: Request,
      username: str = Form(...), 
      password: str = Form(...), 
-     db: Session = Depends(get_db)
+     db: AsyncSession = Depends(get_async_db)
 ):
-    doctor = crud.authenticate_doctor(db, username, password)
+    doctor = await crud_async.authenticate_doctor(db, username, password)
     if doctor:
         request.session["doctor_id"] = doctor.id
         request.session["doctor_name"] = doctor.name
+        crud.cache_doctor_profile(doctor)
         return RedirectResponse("/doctor/dashboard", status_code=303)
     
     return templates.TemplateResponse(
@@ -0,0 +1,213 @@
+# metrics.py
+"""
+Per-route request metrics, served at /metrics in Prometheus text format.
+
+MetricsMiddleware records, for every request, the matched route template
+(e.g. /admin/edit_doctor, not the raw URL), status code, latency, and the
+time spent in / number of SQL statements sent to the database. DB time is
+collected from SQLAlchemy cursor events into a per-request holder kept in a
+ContextVar, which follows the request into Starlette's thread pool.
+
+Everything is plain counters under one lock; no per-request allocation
+beyond a two-item list, so it is cheap enough to leave on.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# Latency histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# [db_seconds, db_queries] for the request being handled
+_db_usage = ContextVar("db_usage", default=None)
+
+
+class RouteStats:
+    __slots__ = ("count", "total", "bucket_counts", "statuses", "db_seconds", "db_queries")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.statuses = {}
+        self.db_seconds = 0.0
+        self.db_queries = 0
+
+    def quantile(self, q):
+        """Estimate a latency quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(BUCKETS, self.bucket_counts):
+            if seen + n >= rank:
+                return lower + (bound - lower) * ((rank - seen) / n if n else 0.0)
+            seen += n
+            lower = bound
+        return BUCKETS[-1]
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, method, route, status, seconds, db_seconds=0.0, db_queries=0):
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        key = (method, route)
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.count += 1
+            stats.total += seconds
+            stats.bucket_counts[bucket] += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.db_seconds += db_seconds
+            stats.db_queries += db_queries
+
+    def snapshot(self):
+        """{(method, route): stats dict} - handy for benchmarks and debugging."""
+        with self._lock:
+            return {
+                key: {
+                    "count": s.count,
+                    "avg_ms": s.total * 1000 / s.count if s.count else 0.0,
+                    **{f"p{int(q * 100)}_ms": s.quantile(q) * 1000 for q in QUANTILES},
+                    "statuses": dict(s.statuses),
+                    "db_ms": s.db_seconds * 1000,
+                    "db_queries": s.db_queries,
+                }
+                for key, s in self._routes.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = sorted(self._routes.items())
+            lines = [
+                "# HELP http_requests_total Requests by route, method and status code.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route), s in items:
+                for status, n in sorted(s.statuses.items()):
+                    lines.append(f'http_requests_total{{{_labels(method, route)},status="{status}"}} {n}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Request latency by route.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), s in items:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, n in zip(BUCKETS, s.bucket_counts):
+                    cumulative += n
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {s.total:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {s.count}")
+
+            lines += [
+                "# HELP http_request_duration_quantile_seconds Latency quantiles estimated from the histogram.",
+                "# TYPE http_request_duration_quantile_seconds gauge",
+            ]
+            for (method, route), s in items:
+                labels = _labels(method, route)
+                for q in QUANTILES:
+                    lines.append(
+                        f'http_request_duration_quantile_seconds{{{labels},quantile="{q}"}} {s.quantile(q):.6f}'
+                    )
+
+            lines += [
+                "# HELP http_request_db_seconds_total Time spent executing SQL, by route.",
+                "# TYPE http_request_db_seconds_total counter",
+            ]
+            for (method, route), s in items:
+                lines.append(f"http_request_db_seconds_total{{{_labels(method, route)}}} {s.db_seconds:.6f}")
+
+            lines += [
+                "# HELP http_request_db_queries_total SQL statements executed, by route.",
+                "# TYPE http_request_db_queries_total counter",
+            ]
+            for (method, route), s in items:
+                lines.append(f"http_request_db_queries_total{{{_labels(method, route)}}} {s.db_queries}")
+
+        return "\n".join(lines) + "\n"
+
+    # ---------------- DB timing ----------------
+
+    def instrument_engine(self, engine):
+        """
+        Attach cursor timing to a (sync) Engine. For an AsyncEngine pass
+        async_engine.sync_engine.
+        """
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _labels(method, route):
+    route = route.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'method="{method}",route="{route}"'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _db_usage.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    usage = _db_usage.get()
+    starts = conn.info.get("query_start")
+    if usage is None or not starts:
+        return
+    usage[0] += time.perf_counter() - starts.pop()
+    usage[1] += 1
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware overhead)."""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        usage = [0.0, 0]
+        token = _db_usage.set(usage)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _db_usage.reset(token)
+            # The router stores the matched route in the scope; use its
+            # template so /admin/edit_doctor?doctor_id=5 and =6 share a series.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.registry.observe(scope["method"], route, status, elapsed, usage[0], usage[1])
+
+
+registry = Metrics()
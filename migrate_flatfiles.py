@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+migrate_flatfiles.py
+Move the flat-file data used by hospital.py (data/doctors.txt,
+data/patients.txt, data/appointments.txt) into the SQL schema in models.py.
+
+- Files are streamed line by line and inserted in batches (executemany),
+  one transaction per batch.
+- Original IDs are kept; on PostgreSQL the ID sequences are moved past the
+  highest migrated ID afterwards so new rows don't collide.
+- dd-mm-yyyy dates become DATE values; patients get a fresh 4-digit OTP and
+  doctors get the usual username/password (<id> / doctor_<id>).
+- After every committed batch the byte offset reached in the file is saved
+  to a checkpoint file. An interrupted run resumes from there; rows that
+  were already inserted are skipped (INSERT ... ON CONFLICT DO NOTHING), so
+  replaying a batch is harmless.
+- Tombstone rows ("X,<id>") in appointments.txt, written by hospital.py
+  when an appointment is cancelled, migrate as status "Cancelled".
+- Rows that can't be migrated (bad dates, unknown patient/doctor, duplicate
+  contact or slot) are counted and reported, not fatal.
+
+Usage:
+    python migrate_flatfiles.py [--data-dir data] [--batch-size 10000]
+                                [--checkpoint migration_checkpoint.json] [--restart]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.orm import Session
+
+import daily_stats
+from bulk_import import generate_otps
+from flat_store import TOMBSTONE
+from models import Base, Patient, Doctor, Appointment
+
+BATCH_SIZE = 10000
+CHECKPOINT_FILE = "migration_checkpoint.json"
+
+
+# ---------------- Row conversion ----------------
+
+def _date(value):
+    return datetime.strptime(value.strip(), "%d-%m-%Y").date()
+
+
+def _time(value):
+    return datetime.strptime(value.strip(), "%H:%M").time()
+
+
+def doctor_row(row):
+    did, name, spec = row[:3]
+    did = int(did)
+    return {"id": did, "name": name.strip(), "specialization": spec.strip(),
+            "username": str(did), "password": f"doctor_{did}"}
+
+
+def patient_row(row):
+    pid, name, age, gender, dob, contact, symptoms = row[:7]
+    return {"id": int(pid), "name": name.strip(), "age": int(age) if age.strip() else None,
+            "gender": gender.strip(), "dob": _date(dob) if dob.strip() else None,
+            "contact": contact.strip() or None, "symptoms": symptoms.strip()}
+
+
+def appointment_row(row):
+    aid, pid, did, day, slot = row[:5]
+    return {"id": int(aid), "patient_id": int(pid), "doctor_id": int(did),
+            "appointment_date": _date(day), "appointment_time": _time(slot), "status": "Booked"}
+
+
+# (file name, model, minimum columns, converter) in foreign-key order
+TABLES = [
+    ("doctors.txt", Doctor, 3, doctor_row),
+    ("patients.txt", Patient, 7, patient_row),
+    ("appointments.txt", Appointment, 5, appointment_row),
+]
+
+
+# ---------------- Checkpoint ----------------
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Write to a temp file and rename, so a crash never leaves half a checkpoint."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ---------------- Inserts ----------------
+
+def _insert_ignore(conn, model, rows):
+    """Insert rows, skipping any that hit a unique/primary key. Returns rows inserted."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        conn.execute(insert(model), rows)
+        return len(rows)
+    stmt = dialect_insert(model).on_conflict_do_nothing().returning(model.id)
+    return len(conn.scalars(stmt, rows).all())
+
+
+def _reset_sequence(conn, table):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+
+
+def _existing_ids(conn, model):
+    return set(conn.scalars(select(model.id)))
+
+
+# ---------------- Migration ----------------
+
+def migrate_file(engine, path, model, min_cols, convert, checkpoint, checkpoint_path,
+                 batch_size=BATCH_SIZE, report=print):
+    """
+    Stream one flat file into its table, resuming at the byte offset saved
+    in checkpoint[file name]. Saves the checkpoint after every batch.
+    """
+    state = checkpoint.setdefault(path.name, {})
+    offset = state.get("offset", 0)
+    stats = state.setdefault("stats", {"read": 0, "inserted": 0, "skipped": 0, "invalid": 0})
+    started = time.perf_counter()
+    read_this_run = 0
+
+    # Appointments must point at migrated patients/doctors (FK)
+    patient_ids = doctor_ids = None
+    if model is Appointment:
+        with engine.connect() as conn:
+            patient_ids = _existing_ids(conn, Patient)
+            doctor_ids = _existing_ids(conn, Doctor)
+
+    # Tombstones for appointments already committed in an earlier batch
+    cancelled = set()
+
+    def flush(batch, end_offset):
+        if batch or cancelled:
+            if model is Patient:
+                for row, otp in zip(batch, generate_otps(len(batch))):
+                    row["otp_code"] = otp
+            with engine.begin() as conn:
+                # Cancel first: a later row in this batch may rebook the freed slot
+                if cancelled:
+                    conn.execute(
+                        update(Appointment).where(Appointment.id.in_(cancelled)).values(status="Cancelled")
+                    )
+                inserted = _insert_ignore(conn, model, batch) if batch else 0
+            stats["inserted"] += inserted
+            stats["skipped"] += len(batch) - inserted
+            cancelled.clear()
+        state["offset"] = end_offset
+        save_checkpoint(checkpoint_path, checkpoint)
+        if not batch:
+            return
+        elapsed = time.perf_counter() - started
+        rate = read_this_run / elapsed if elapsed else 0.0
+        report(f"  {path.name}: {stats['read']} rows read, {stats['inserted']} inserted, "
+               f"{stats['skipped']} skipped, {stats['invalid']} invalid ({rate:,.0f} rows/s)")
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        batch = []
+        batch_ids = {}
+        position = offset
+        for raw in f:
+            position += len(raw)
+            try:
+                line = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                line = None  # counted as invalid below, like a malformed field
+            if line == "":
+                continue
+            stats["read"] += 1
+            read_this_run += 1
+            if line is None:
+                stats["invalid"] += 1
+                continue
+            row = next(csv.reader([line]))
+            if model is Appointment and row[0] == TOMBSTONE:
+                if len(row) >= 2 and row[1].strip().isdigit():
+                    aid = int(row[1])
+                    if aid in batch_ids:
+                        batch_ids[aid]["status"] = "Cancelled"
+                    else:
+                        cancelled.add(aid)
+                continue
+            try:
+                if len(row) < min_cols:
+                    raise ValueError("too few columns")
+                record = convert(row)
+                if patient_ids is not None and (
+                    record["patient_id"] not in patient_ids or record["doctor_id"] not in doctor_ids
+                ):
+                    raise ValueError("unknown patient or doctor")
+            except ValueError:
+                stats["invalid"] += 1
+                continue
+            batch.append(record)
+            batch_ids[record["id"]] = record
+            if len(batch) >= batch_size:
+                flush(batch, position)
+                batch = []
+                batch_ids = {}
+        flush(batch, position)
+
+    with engine.begin() as conn:
+        _reset_sequence(conn, model.__tablename__)
+    state["done"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    return stats
+
+
+def migrate(engine, data_dir="data", checkpoint_path=CHECKPOINT_FILE,
+            batch_size=BATCH_SIZE, restart=False, report=print):
+    """
+    Migrate all three files in FK order. Returns the per-file stats.
+    """
+    Base.metadata.create_all(bind=engine)
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    started = time.perf_counter()
+    for file_name, model, min_cols, convert in TABLES:
+        path = Path(data_dir) / file_name
+        state = checkpoint.get(file_name, {})
+        if state.get("done"):
+            report(f"{file_name}: already migrated, skipping.")
+            continue
+        if not path.exists():
+            report(f"{file_name}: not found, skipping.")
+            continue
+        report(f"{file_name}: migrating" + (f" from byte {state['offset']}" if state.get("offset") else ""))
+        migrate_file(engine, path, model, min_cols, convert, checkpoint, checkpoint_path, batch_size, report)
+
+    # Rows were inserted directly, so recount the dashboard summary
+    with Session(engine) as db:
+        daily_stats.rebuild(db)
+    report(f"Done in {time.perf_counter() - started:.1f}s.")
+    return {name: checkpoint.get(name, {}).get("stats") for name, *_ in TABLES}
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate hospital.py flat files into the SQL database.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args(argv)
+
+    from db import engine
+    migrate(engine, args.data_dir, args.checkpoint, args.batch_size, args.restart)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
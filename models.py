@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Date, Time, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Time, ForeignKey, Index, inspect, text
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -18,6 +18,7 @@ class Patient(Base):
 
 
     appointments = relationship("Appointment", back_populates="patient", cascade="all, delete-orphan")
+    series = relationship("AppointmentSeries", back_populates="patient", cascade="all, delete-orphan")
 
 
 class Doctor(Base):
@@ -30,6 +31,7 @@ class Doctor(Base):
     password = Column(String(100))
 
     appointments = relationship("Appointment", back_populates="doctor", cascade="all, delete-orphan")
+    series = relationship("AppointmentSeries", back_populates="doctor", cascade="all, delete-orphan")
 
 
 class Appointment(Base):
@@ -41,6 +43,112 @@ class Appointment(Base):
     appointment_date = Column(Date)
     appointment_time = Column(Time)
     status = Column(String(20), default="Booked")
+    series_id = Column(Integer, ForeignKey("appointment_series.id"), nullable=True)
 
     patient = relationship("Patient", back_populates="appointments")
     doctor = relationship("Doctor", back_populates="appointments")
+    series = relationship("AppointmentSeries", back_populates="appointments")
+
+    __table_args__ = (
+        # Doctor schedule lookups and conflict checks
+        Index("ix_appointments_doctor_slot", "doctor_id", "appointment_date", "appointment_time"),
+        # Patient history lookups
+        Index("ix_appointments_patient_date", "patient_id", "appointment_date"),
+        # Occurrences of a recurring series, for cancelling the future ones
+        Index("ix_appointments_series_date", "series_id", "appointment_date"),
+        # Cancelled list, in the order the admin screen pages through it
+        Index(
+            "ix_appointments_cancelled",
+            "appointment_date", "appointment_time", "id",
+            postgresql_where=text("status = 'Cancelled'"),
+            sqlite_where=text("status = 'Cancelled'")
+        ),
+        # No double booking: one live appointment per doctor/date/time.
+        # Cancelled rows fall out of the index, so the slot can be rebooked.
+        Index(
+            "uq_appointments_active_slot",
+            "doctor_id", "appointment_date", "appointment_time",
+            unique=True,
+            postgresql_where=text("status != 'Cancelled'"),
+            sqlite_where=text("status != 'Cancelled'")
+        ),
+    )
+
+
+class AppointmentSeries(Base):
+    """
+    A recurring booking: the same doctor and time on the given weekdays
+    (0 = Monday, stored as "0,3") every `interval_weeks` weeks from
+    start_date to end_date. Its occurrences are ordinary Appointment rows
+    with series_id set.
+    """
+    __tablename__ = "appointment_series"
+
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    appointment_time = Column(Time, nullable=False)
+    weekdays = Column(String(20), nullable=False)
+    interval_weeks = Column(Integer, nullable=False, default=1)
+    status = Column(String(20), default="Active")
+
+    patient = relationship("Patient", back_populates="series")
+    doctor = relationship("Doctor", back_populates="series")
+    appointments = relationship("Appointment", back_populates="series")
+
+    @property
+    def weekday_list(self):
+        return [int(d) for d in self.weekdays.split(",") if d]
+
+
+class DailyAppointmentStats(Base):
+    """
+    Appointment counts per doctor, appointment date and status, kept up to
+    date by crud on every booking/status change (see daily_stats.py).
+    """
+    __tablename__ = "appointment_daily_stats"
+
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), primary_key=True)
+    stat_date = Column(Date, primary_key=True)
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Dashboard / API range reads across all doctors
+        Index("ix_appointment_daily_stats_date", "stat_date"),
+    )
+
+def ensure_columns(engine):
+    """
+    create_all() does not alter existing tables either.
+    Add any missing nullable column (no constraints) to an existing database.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            except Exception as e:
+                print(f"[DB Column Error] Could not add {table.name}.{column.name}: {e}")
+
+
+def ensure_indexes(engine):
+    """
+    create_all() only builds indexes together with new tables.
+    Add any index that is missing on an existing database.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"[DB Index Error] Could not create {index.name}: {e}")
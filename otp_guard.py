@@ -0,0 +1,142 @@
+# otp_guard.py
+"""
+Brute-force protection for the patient OTP checks.
+
+Every OTP attempt (book, view appointments, cancel) first takes a token
+from two buckets, one per patient ID and one per client IP, before
+anything touches the database. A bucket holds up to `per_minute` tokens
+and refills continuously at that rate, so normal use never notices it,
+while guessing the 4-digit OTP space is throttled whether a bot hammers
+one patient or sprays many patients from one address.
+
+A successful verification is remembered in the session cookie (signed
+with SESSION_SECRET_KEY) for OTP_SESSION_TTL seconds, for at most the
+OTP_SESSION_MAX_PATIENTS most recently verified patients. The cookie is
+signed, not encrypted, so it holds only patient IDs and expiry times;
+names and other details are always read from the database. A patient
+who books and then views their appointments is not asked again, and no
+tokens are spent.
+
+Buckets live in process memory: each uvicorn worker limits on its own,
+so the effective limit is per worker.
+"""
+import hmac
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+OTP_ATTEMPTS_PER_PATIENT = float(os.getenv("OTP_ATTEMPTS_PER_PATIENT", "5"))  # per minute
+OTP_ATTEMPTS_PER_IP = float(os.getenv("OTP_ATTEMPTS_PER_IP", "30"))  # per minute
+OTP_SESSION_TTL = int(os.getenv("OTP_SESSION_TTL", "300"))
+OTP_SESSION_MAX_PATIENTS = int(os.getenv("OTP_SESSION_MAX_PATIENTS", "3"))
+OTP_LIMITER_MAX_KEYS = int(os.getenv("OTP_LIMITER_MAX_KEYS", "100000"))
+
+SESSION_KEY = "otp_verified"
+
+
+class TokenBucketLimiter:
+    """
+    Thread-safe token buckets keyed by any hashable. Idle buckets are
+    evicted least-recently-used beyond maxsize (an evicted bucket is full).
+    """
+
+    def __init__(self, per_minute, burst=None, maxsize=OTP_LIMITER_MAX_KEYS):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _refilled(self, key, now):
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def retry_after(self, key):
+        """Seconds until `key` has a token (0 if it has one now). Takes nothing."""
+        with self._lock:
+            tokens = self._refilled(key, time.monotonic())
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key):
+        """Spend one token for `key`; False if the bucket is empty."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refilled(key, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed
+
+    def stats(self):
+        return {"keys": len(self._buckets), "per_minute": self.rate * 60,
+                "burst": self.capacity, "rejected": self.rejected}
+
+
+patient_limiter = TokenBucketLimiter(OTP_ATTEMPTS_PER_PATIENT)
+ip_limiter = TokenBucketLimiter(OTP_ATTEMPTS_PER_IP)
+
+
+def otp_matches(stored_otp, entered_otp):
+    """Constant-time OTP comparison; a patient without an OTP never matches."""
+    if not stored_otp or entered_otp is None:
+        return False
+    return hmac.compare_digest(str(stored_otp), str(entered_otp))
+
+
+def client_ip(request):
+    return request.client.host if request.client else "unknown"
+
+
+def check_attempt(patient_id, ip):
+    """
+    Charge one OTP attempt to the patient and the IP. Returns None if it
+    may go ahead, else the whole seconds to wait.
+    """
+    # Check both before taking, so a full IP bucket isn't drained by
+    # attempts the patient bucket rejects anyway (and vice versa)
+    wait = max(patient_limiter.retry_after(patient_id), ip_limiter.retry_after(ip))
+    if wait == 0 and patient_limiter.take(patient_id) and ip_limiter.take(ip):
+        return None
+    return max(1, math.ceil(wait))
+
+
+# ---------------- Session cache ----------------
+
+def _expiry(entry):
+    # Cookies written before names were dropped hold [expires_at, name]
+    return entry[0] if isinstance(entry, list) else entry
+
+
+def is_verified(session, patient_id):
+    """True if this session verified patient_id's OTP within OTP_SESSION_TTL."""
+    entry = session.get(SESSION_KEY, {}).get(str(patient_id))
+    return entry is not None and _expiry(entry) > time.time()
+
+
+def has_verified(session):
+    """True if this session has any unexpired verification (the OTP field may be left empty)."""
+    now = time.time()
+    return any(_expiry(entry) > now for entry in session.get(SESSION_KEY, {}).values())
+
+
+def remember_verified(session, patient_id):
+    """
+    Record a successful OTP check as patient ID -> expiry time. Expired
+    entries are dropped, and only the OTP_SESSION_MAX_PATIENTS most recent
+    ones are kept so the cookie stays small.
+    """
+    now = time.time()
+    verified = {pid: _expiry(entry) for pid, entry in session.get(SESSION_KEY, {}).items()
+                if _expiry(entry) > now and pid != str(patient_id)}
+    verified[str(patient_id)] = now + OTP_SESSION_TTL
+    # Insertion order is verification order (dicts and the JSON cookie keep it)
+    session[SESSION_KEY] = dict(list(verified.items())[-OTP_SESSION_MAX_PATIENTS:])
@@ -0,0 +1,226 @@
+# patient_search.py
+"""
+Fuzzy patient search by name/contact, ranked by trigram similarity.
+
+- PostgreSQL: pg_trgm GIN indexes on patients.name / patients.contact,
+  queried with the word-similarity operator so the index finds candidates.
+- Anything else (SQLite for local runs/tests), or PostgreSQL without the
+  extension: an in-process trigram index loaded at startup and kept in sync
+  by crud. Other workers, bulk_import.py and migrate_flatfiles.py add
+  patients behind its back, so like the caches in cache.py it has a TTL:
+  a search on an index older than SEARCH_INDEX_TTL seconds reloads it.
+
+Both return at most TOP_K patients, best match first. An exact patient ID
+match (numeric term) always comes first.
+
+Trigrams can't rank very short or all-digit terms (a 2-3 digit contact
+fragment shares too few trigrams with the number), so ranked() sends those
+to crud's plain substring filter instead, which finds every match as
+ILIKE always did.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from models import Patient
+
+TOP_K = int(os.getenv("SEARCH_TOP_K", "20"))
+# Share of the search term's trigrams that must appear in name or contact
+MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.5"))
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "60"))
+# Terms shorter than this (or all digits) are matched as substrings, not ranked
+MIN_RANKED_LENGTH = 3
+
+
+def ranked(term: str):
+    """True if `term` is searched by similarity, False for the substring filter."""
+    term = (term or "").strip()
+    return len(term) >= MIN_RANKED_LENGTH and not term.isdigit()
+
+
+def trigrams(value: str, query: bool = False):
+    """
+    pg_trgm style trigrams: lower-cased words padded with two leading
+    spaces and one trailing space. For the search term the trailing pad is
+    skipped so a prefix ("sha") still matches the whole word ("sharma").
+    """
+    grams = set()
+    for word in re.findall(r"\w+", (value or "").lower()):
+        padded = f"  {word}" if query else f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramSearch:
+    """pg_trgm backend. The database does the ranking."""
+
+    name = "pg_trgm"
+
+    def search(self, db: Session, term: str, limit: int):
+        score = func.greatest(
+            func.word_similarity(term, Patient.name),
+            func.word_similarity(term, Patient.contact)
+        )
+        # col %> term  <=>  word_similarity(term, col) >= threshold (GIN-indexed)
+        match = Patient.name.op("%>")(term) | Patient.contact.op("%>")(term)
+        exact_id = Patient.id == int(term) if term.isdigit() else None
+        if exact_id is not None:
+            match = match | exact_id
+
+        query = db.query(Patient).filter(match)
+        if exact_id is not None:
+            query = query.order_by(exact_id.desc(), score.desc(), Patient.id)
+        else:
+            query = query.order_by(score.desc(), Patient.id)
+        return query.limit(limit).all()
+
+    def add(self, patient: Patient):
+        pass  # GIN indexes are maintained by PostgreSQL
+
+    def remove(self, patient_id: int):
+        pass
+
+
+class NgramIndex:
+    """In-process trigram index: trigram -> set of patient IDs."""
+
+    name = "ngram"
+
+    def __init__(self, ttl=SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self.loaded_at = None
+        self._postings = {}
+        self._fields = {}  # patient_id -> (name trigrams, contact trigrams)
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        # Build a fresh index without the lock, so searches keep running meanwhile
+        fresh = NgramIndex(self.ttl)
+        for patient_id, name, contact in db.query(Patient.id, Patient.name, Patient.contact):
+            fresh._add(patient_id, name, contact)
+        with self._lock:
+            self._postings = fresh._postings
+            self._fields = fresh._fields
+            self.loaded_at = time.monotonic()
+
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def add(self, patient: Patient):
+        with self._lock:
+            self._remove(patient.id)
+            self._add(patient.id, patient.name, patient.contact)
+
+    def remove(self, patient_id: int):
+        with self._lock:
+            self._remove(patient_id)
+
+    def _add(self, patient_id, name, contact):
+        fields = (trigrams(name), trigrams(contact))
+        self._fields[patient_id] = fields
+        for gram in fields[0] | fields[1]:
+            self._postings.setdefault(gram, set()).add(patient_id)
+
+    def _remove(self, patient_id):
+        fields = self._fields.pop(patient_id, None)
+        if not fields:
+            return
+        for gram in fields[0] | fields[1]:
+            ids = self._postings.get(gram)
+            if ids:
+                ids.discard(patient_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def rank(self, term: str, limit: int):
+        """Patient IDs best match first, without touching the DB."""
+        wanted = trigrams(term, query=True)
+        if not wanted:
+            return []
+        with self._lock:
+            hits = Counter()
+            for gram in wanted:
+                hits.update(self._postings.get(gram, ()))
+            needed = MIN_SIMILARITY * len(wanted)
+            scored = []
+            for patient_id, count in hits.items():
+                if count < needed:
+                    continue  # can't reach the threshold in either field
+                name_grams, contact_grams = self._fields[patient_id]
+                best = max(len(wanted & name_grams), len(wanted & contact_grams))
+                if best >= needed:
+                    scored.append((-best, patient_id))
+        scored.sort()
+        return [patient_id for _, patient_id in scored[:limit]]
+
+    def search(self, db: Session, term: str, limit: int):
+        if self.stale():
+            self.load(db)
+        ids = self.rank(term, limit)
+        if term.isdigit():
+            exact = int(term)
+            ids = [exact] + [i for i in ids if i != exact][:limit - 1]
+        if not ids:
+            return []
+        # One primary-key lookup for the whole page, then restore the ranking
+        found = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(ids))}
+        return [found[i] for i in ids if i in found]
+
+
+backend = None
+
+
+def setup(engine):
+    """
+    Pick the backend for this database and prepare it.
+    Called once at application startup.
+    """
+    global backend
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_name_trgm "
+                    "ON patients USING gin (name gin_trgm_ops)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_contact_trgm "
+                    "ON patients USING gin (contact gin_trgm_ops)"
+                ))
+            backend = TrigramSearch()
+            return backend
+        except Exception as e:
+            print(f"[Search] pg_trgm unavailable, using in-process index: {e}")
+
+    index = NgramIndex()
+    with Session(engine) as db:
+        index.load(db)
+    backend = index
+    return backend
+
+
+def reload(engine):
+    """Rebuild the in-process index after bulk changes (no-op for pg_trgm)."""
+    if isinstance(backend, NgramIndex):
+        with Session(engine) as db:
+            backend.load(db)
+
+
+def search_patients(db: Session, term: str, limit: int = None):
+    return backend.search(db, term.strip(), limit or TOP_K)
+
+
+def index_patient(patient: Patient):
+    if backend is not None:
+        backend.add(patient)
+
+
+def unindex_patient(patient_id: int):
+    if backend is not None:
+        backend.remove(patient_id)
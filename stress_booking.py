@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+stress_booking.py
+Concurrent double-booking check for hospital_mysql.book_appointment_tx.
+
+Creates a throwaway doctor and patient, then for each round starts N
+threads that all try to book the same slot at the same instant (a barrier
+releases them together). Exactly one booking per slot must succeed, and
+the database must hold exactly one active appointment for it. The test
+rows are deleted at the end.
+
+--unsafe runs the old check-then-insert sequence (has_conflict, then
+INSERT on another connection) instead, to show that the check catches
+double bookings.
+
+Usage (uses the same .env / DB_* settings as hospital_mysql.py):
+    python stress_booking.py [--threads 16] [--rounds 20] [--unsafe]
+Exits with status 1 if any slot was double-booked or any attempt errored.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent booking stress test (MySQL).")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--unsafe", action="store_true", help="use the old check-then-insert path")
+    args = parser.parse_args(argv)
+
+    # One pooled connection per thread (mysql-connector caps a pool at 32)
+    os.environ.setdefault("MYSQL_POOL_SIZE", str(min(args.threads, 32)))
+    import hospital_mysql as hm
+
+    with hm.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO doctors (name, specialization) VALUES ('Stress Test', 'test')")
+        did = cur.lastrowid
+        cur.execute("INSERT INTO patients (name, contact, otp_code) VALUES ('Stress Test', %s, '0000')",
+                    (f"9{int(time.time() * 1000) % 10**9:09d}",))
+        pid = cur.lastrowid
+        conn.commit()
+        cur.close()
+
+    def unsafe_book(date_sql, time_sql):
+        if hm.has_conflict(did, date_sql, time_sql):
+            return "conflict", None
+        with hm.db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time)
+                           VALUES (%s,%s,%s,%s)""", (pid, did, date_sql, time_sql))
+            conn.commit()
+            cur.close()
+        return "booked", None
+
+    book = unsafe_book if args.unsafe else (lambda d, t: hm.book_appointment_tx(pid, did, d, t, otp="0000"))
+
+    double_booked = 0
+    errors = 0
+    started = time.perf_counter()
+    try:
+        for r in range(args.rounds):
+            date_sql = (date.today() + timedelta(days=365 + r)).isoformat()
+            time_sql = "10:00:00"
+            barrier = threading.Barrier(args.threads)
+            results = []
+            lock = threading.Lock()
+
+            def worker():
+                barrier.wait()
+                try:
+                    status, _ = book(date_sql, time_sql)
+                except Exception as e:
+                    status = f"error: {e}"
+                with lock:
+                    results.append(status)
+
+            threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            with hm.db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""SELECT COUNT(*) FROM appointments
+                               WHERE doctor_id=%s AND appointment_date=%s AND appointment_time=%s
+                               AND status!='Cancelled'""", (did, date_sql, time_sql))
+                in_db = cur.fetchone()[0]
+                cur.close()
+
+            booked = results.count("booked")
+            failed = [s for s in results if s.startswith("error")]
+            errors += len(failed)
+            if booked > 1 or in_db > 1:
+                double_booked += 1
+                verdict = "DOUBLE BOOKED"
+            else:
+                verdict = "OK" if booked == 1 and in_db == 1 else "NOT BOOKED"
+            print(f"round {r + 1:>3}: {booked} booked, {results.count('conflict')} conflicts, "
+                  f"{len(failed)} errors, {in_db} in database - {verdict}")
+            for s in failed[:3]:
+                print(f"    {s}")
+    finally:
+        with hm.db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM doctors WHERE id=%s", (did,))       # cascades to appointments
+            cur.execute("DELETE FROM patients WHERE id=%s", (pid,))
+            conn.commit()
+            cur.close()
+
+    elapsed = time.perf_counter() - started
+    attempts = args.rounds * args.threads
+    print(f"\n{attempts} booking attempts in {elapsed:.2f}s ({attempts / elapsed:.0f}/s), "
+          f"{double_booked} of {args.rounds} slots double-booked, {errors} errors.")
+    print(hm.pool_stats())
+    return 1 if double_booked or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
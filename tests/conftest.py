@@ -0,0 +1,79 @@
+# tests/conftest.py
+"""
+Shared fixtures. db.py builds its engines and main.py sets up the schema at
+import time, so the environment points at a throwaway SQLite database
+before either is imported.
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="hospital-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/hospital.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ.setdefault("SESSION_SECRET_KEY", "test-session-secret")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import availability  # noqa: E402
+import crud  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import otp_guard  # noqa: E402
+import patient_search  # noqa: E402
+from db import SessionLocal, engine  # noqa: E402
+
+
+def _reset_state():
+    with engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    with SessionLocal() as db:
+        availability.index.load(db)
+    patient_search.reload(engine)
+    crud.doctor_directory.clear()
+    crud.doctor_profiles.clear()
+    for limiter in (otp_guard.patient_limiter, otp_guard.ip_limiter):
+        limiter._buckets.clear()
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Every test starts with empty tables, indexes, caches and OTP buckets."""
+    _reset_state()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def day():
+    """A date comfortably in the future, so nothing counts as past."""
+    return date.today() + timedelta(days=30)
+
+
+@pytest.fixture
+def make_patient(db):
+    def make(name="Asha Rao", contact=None):
+        return crud.create_patient(db, name, 34, "F", "1990-05-01", contact, "Fever")
+    return make
+
+
+@pytest.fixture
+def make_doctor(db):
+    def make(name="Dr. Iyer", specialization="Cardiology"):
+        return crud.create_doctor(db, name, specialization)
+    return make
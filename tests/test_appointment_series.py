@@ -0,0 +1,72 @@
+# tests/test_appointment_series.py
+"""Recurring series: bulk booking, conflicts and cancellation."""
+from datetime import timedelta
+
+import availability
+import crud
+import daily_stats
+
+
+def _weekly(client, patient, doctor, start, weeks=3, **extra):
+    return client.post("/api/appointment_series", json={
+        "patient_id": patient.id,
+        "doctor_id": doctor.id,
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(weeks=weeks - 1)).isoformat(),
+        "time": "10:00",
+        **extra,
+    })
+
+
+def test_series_books_every_occurrence(client, make_patient, make_doctor, day):
+    response = _weekly(client, make_patient(), make_doctor(), day, weeks=4)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["booked"] == [(day + timedelta(weeks=w)).isoformat() for w in range(4)]
+    assert body["weekdays"] == [day.weekday()]
+
+
+def test_series_conflict_returns_409_unless_skipped(client, db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    clash = day + timedelta(weeks=1)
+    crud.create_appointment(db, patient.id, doctor.id, clash.isoformat(), "10:00")
+
+    response = _weekly(client, patient, doctor, day)
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"] == [clash.isoformat()]
+
+    response = _weekly(client, patient, doctor, day, skip_conflicts=True)
+    assert response.status_code == 200
+    assert response.json()["skipped"] == [clash.isoformat()]
+    assert len(response.json()["booked"]) == 2
+
+
+def test_series_cancel_releases_every_occurrence(client, db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    series_id = _weekly(client, patient, doctor, day).json()["series_id"]
+    dates = [day + timedelta(weeks=w) for w in range(3)]
+    slot = crud.get_series_occurrences(db, series_id)[0].appointment_time
+    assert not any(availability.index.is_free(doctor.id, d, slot) for d in dates)
+
+    response = client.post(f"/api/appointment_series/{series_id}/cancel")
+
+    assert response.status_code == 200
+    assert response.json()["cancelled"] == 3
+    assert response.json()["status"] == "Cancelled"
+    occurrences = client.get(f"/api/appointment_series/{series_id}").json()["occurrences"]
+    assert {o["status"] for o in occurrences} == {"Cancelled"}
+    assert all(availability.index.is_free(doctor.id, d, slot) for d in dates)
+    assert all(c["counts"] == {"Cancelled": 1} for c in daily_stats.daily_counts(db, dates[0], dates[-1]))
+    # Every freed slot can be booked again
+    for d in dates:
+        crud.create_appointment(db, patient.id, doctor.id, d.isoformat(), "10:00")
+
+
+def test_cancel_unknown_series_is_404(client):
+    assert client.post("/api/appointment_series/999999/cancel").status_code == 404
+
+
+def test_bad_rule_is_400(client, make_patient, make_doctor, day):
+    response = _weekly(client, make_patient(), make_doctor(), day, weekdays=[7])
+    assert response.status_code == 400
@@ -0,0 +1,66 @@
+# tests/test_availability.py
+"""The in-process availability index and the free_slots route."""
+from datetime import time
+
+import availability
+import crud
+from availability import AvailabilityIndex
+
+
+def test_shared_slot_stays_booked_until_last_release(day):
+    index = AvailabilityIndex(slot_minutes=15)
+    index.book(1, day, time(10, 5))
+    index.book(1, day, time(10, 10))  # same 10:00 slot
+
+    index.release(1, day, time(10, 5))
+    assert not index.is_free(1, day, time(10, 0))
+
+    index.release(1, day, time(10, 10))
+    assert index.is_free(1, day, time(10, 0))
+
+
+def test_mark_taken_does_not_add_a_count(day):
+    index = AvailabilityIndex(slot_minutes=15)
+    index.book(1, day, time(9, 0))
+    index.mark_taken(1, day, time(9, 0))
+
+    index.release(1, day, time(9, 0))
+    assert index.is_free(1, day, time(9, 0))
+
+
+def test_refresh_is_discarded_when_a_booking_lands_meanwhile(db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    index = AvailabilityIndex(ttl=0)
+    live = index._live
+
+    def racing_live(session):
+        # Another request in this worker books while the refresh query runs
+        index.book(doctor.id, day, time(11, 0))
+        return live(session)
+    index._live = racing_live
+
+    assert index.refresh(db, doctor.id, day) is False
+    assert not index.is_free(doctor.id, day, time(11, 0))
+
+    index._live = live
+    crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "11:00")
+    assert index.refresh(db, doctor.id, day) is True
+    assert not index.is_free(doctor.id, day, time(11, 0))
+
+
+def test_free_slots_route_sees_bookings_from_other_workers(client, db, make_patient, make_doctor, day,
+                                                          monkeypatch):
+    patient, doctor = make_patient(), make_doctor()
+    url = f"/api/doctors/{doctor.id}/free_slots?date={day.isoformat()}"
+    assert "10:00" in client.get(url).json()["free_slots"]
+
+    # Booked behind this worker's back: only the DB knows
+    crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "10:00")
+    availability.index.release(doctor.id, day, time(10, 0))
+    monkeypatch.setattr(availability.index, "ttl", 0)
+
+    assert "10:00" not in client.get(url).json()["free_slots"]
+
+
+def test_free_slots_route_rejects_bad_dates(client):
+    assert client.get("/api/doctors/1/free_slots?date=31-12-2030").status_code == 400
@@ -0,0 +1,51 @@
+# tests/test_batch_booking.py
+"""POST /api/appointments/batch: one result per item, classified."""
+import availability
+import crud
+from models import Appointment
+
+
+def test_batch_results_are_classified(client, db, make_patient, make_doctor, day):
+    patient, other, doctor = make_patient("Asha Rao"), make_patient("Vikram Shah"), make_doctor()
+    crud.create_appointment(db, other.id, doctor.id, day.isoformat(), "09:00")
+    d = day.isoformat()
+
+    response = client.post("/api/appointments/batch", json={"appointments": [
+        {"patient_id": patient.id, "doctor_id": doctor.id, "date": d, "time": "10:00"},
+        {"patient_id": patient.id, "doctor_id": doctor.id, "date": d, "time": "09:00"},  # taken
+        {"patient_id": other.id, "doctor_id": doctor.id, "date": d, "time": "10:00"},  # same as item 0
+        {"patient_id": 999999, "doctor_id": doctor.id, "date": d, "time": "11:00"},
+        {"patient_id": patient.id, "doctor_id": 999999, "date": d, "time": "11:00"},
+        {"patient_id": patient.id, "doctor_id": doctor.id, "date": "31-12-2030", "time": "11:00"},
+        [patient.id, doctor.id, d, "10:30"],
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == [
+        "booked", "conflict", "duplicate", "invalid", "invalid", "invalid", "booked"
+    ]
+    assert (body["booked"], body["failed"]) == (2, 5)
+
+    booked = {r["appointment_id"] for r in body["results"] if r["status"] == "booked"}
+    rows = db.query(Appointment).filter(Appointment.id.in_(booked)).all()
+    assert sorted(a.appointment_time.strftime("%H:%M") for a in rows) == ["10:00", "10:30"]
+    assert all(a.patient_id == patient.id for a in rows)
+    assert not availability.index.is_free(doctor.id, day, rows[0].appointment_time)
+
+
+def test_batch_can_reuse_a_cancelled_slot(db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    cancelled = crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "09:00")
+    crud.cancel_appointment(db, cancelled)
+
+    [result] = crud.create_appointments_batch(db, [(patient.id, doctor.id, day.isoformat(), "09:00")])
+
+    assert result["status"] == "booked"
+    assert result["appointment_id"] != cancelled.id
+
+
+def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(crud, "BATCH_BOOKING_MAX", 2)
+    response = client.post("/api/appointments/batch", json={"appointments": [[1, 1, "2030-01-01", "09:00"]] * 3})
+    assert response.status_code == 400
@@ -0,0 +1,72 @@
+# tests/test_booking.py
+"""Single bookings: the unique slot index turns double-booking into a 409."""
+import pytest
+
+import availability
+import daily_stats
+import crud
+from models import Appointment
+
+
+def _book(client, patient, doctor, day, time="10:00", otp=None):
+    return client.post("/patient/book_appointment", data={
+        "patient_id": patient.id,
+        "doctor_id": doctor.id,
+        "appointment_date": day.isoformat(),
+        "appointment_time": time,
+        "otp": patient.otp_code if otp is None else otp,
+    })
+
+
+def test_booking_succeeds(client, db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+
+    response = _book(client, patient, doctor, day)
+
+    assert response.status_code == 200
+    assert "Appointment booked!" in response.text
+    assert db.query(Appointment).filter_by(doctor_id=doctor.id, status="Booked").count() == 1
+
+
+def test_duplicate_booking_returns_409(client, db, make_patient, make_doctor, day):
+    first, second, doctor = make_patient("Asha Rao"), make_patient("Vikram Shah"), make_doctor()
+
+    assert _book(client, first, doctor, day).status_code == 200
+    response = _book(client, second, doctor, day)
+
+    assert response.status_code == 409
+    assert "Slot taken" in response.text
+    assert db.query(Appointment).filter_by(doctor_id=doctor.id).count() == 1
+
+
+def test_create_appointment_raises_slot_taken(db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "11:30")
+
+    with pytest.raises(crud.SlotTakenError):
+        crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "11:30")
+    # The failed attempt rolled back cleanly; the session is still usable
+    assert crud.get_appointments_for_doctor(db, doctor.id)[0].status == "Booked"
+
+
+def test_cancelled_slot_can_be_rebooked(db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    appointment = crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "09:15")
+    slot = appointment.appointment_time
+
+    crud.cancel_appointment(db, appointment)
+    assert availability.index.is_free(doctor.id, day, slot)
+
+    again = crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "09:15")
+    assert again.id != appointment.id
+    assert not availability.index.is_free(doctor.id, day, slot)
+
+
+def test_rejected_booking_leaves_daily_stats_alone(db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "14:00")
+    with pytest.raises(crud.SlotTakenError):
+        crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "14:00")
+
+    [counts] = daily_stats.daily_counts(db, day, day, doctor.id)
+    assert counts["counts"] == {"Booked": 1}
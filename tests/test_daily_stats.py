@@ -0,0 +1,60 @@
+# tests/test_daily_stats.py
+"""daily_stats: the pre-aggregated counts stay equal to a full recount."""
+from collections import Counter
+
+from sqlalchemy import select
+
+import crud
+import daily_stats
+from db import SessionLocal
+from models import DailyAppointmentStats
+
+
+def _table(db):
+    return {
+        (row.doctor_id, row.stat_date, row.status): row.count
+        for row in db.scalars(select(DailyAppointmentStats)) if row.count
+    }
+
+
+def test_counts_follow_bookings_and_cancellations(client, db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "09:00")
+    cancelled = crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "09:15")
+    crud.cancel_appointment(db, cancelled)
+    crud.create_appointments_batch(db, [(patient.id, doctor.id, day.isoformat(), "09:30")])
+    # The async booking route applies its deltas through run_sync
+    client.post("/patient/book_appointment", data={
+        "patient_id": patient.id, "doctor_id": doctor.id, "appointment_date": day.isoformat(),
+        "appointment_time": "09:45", "otp": patient.otp_code,
+    })
+
+    incremental = _table(db)
+    assert incremental == {(doctor.id, day, "Booked"): 3, (doctor.id, day, "Cancelled"): 1}
+    daily_stats.rebuild(db)
+    assert _table(db) == incremental
+
+
+def test_fallback_insert_that_loses_the_race_becomes_an_update(db, make_doctor, day, monkeypatch):
+    doctor = make_doctor()
+    key = (doctor.id, day, "Booked")
+    monkeypatch.setattr(daily_stats, "_upsert", lambda dialect_name: None)
+    execute = db.execute
+    raced = []
+
+    def racing_execute(statement, *args, **kwargs):
+        if not raced and getattr(statement, "_for_update_arg", None) is not None:
+            raced.append(True)
+            # Another transaction creates the row between our SELECT and INSERT
+            with SessionLocal() as other:
+                daily_stats.apply(other, Counter({key: 2}))
+                other.commit()
+            return execute(statement.where(False), *args, **kwargs)
+        return execute(statement, *args, **kwargs)
+    monkeypatch.setattr(db, "execute", racing_execute)
+
+    daily_stats.apply(db, Counter({key: 1}))
+    db.commit()
+
+    assert raced
+    assert _table(db) == {key: 3}
@@ -0,0 +1,102 @@
+# tests/test_flat_store.py
+"""flat_store.FlatStore, the data layer behind hospital.py."""
+import pytest
+
+from flat_store import ContactExistsError, FlatStore, SlotTakenError
+
+
+def _store(data_dir):
+    return FlatStore(data_dir / "patients.txt", data_dir / "doctors.txt", data_dir / "appointments.txt")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for name in ("patients.txt", "doctors.txt", "appointments.txt"):
+        (tmp_path / name).touch()
+    return tmp_path
+
+
+def test_rows_are_indexed_and_persisted(data_dir):
+    store = _store(data_dir)
+    pid = store.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+    did = store.add_doctor("Dr. Iyer", "Cardiology")
+    aid = store.add_appointment(pid, did, "10-06-2030", "10:00")
+
+    reopened = _store(data_dir)
+    assert reopened.get_patient(pid)[1] == "Asha Rao"
+    assert reopened.contact_exists("9876500001")
+    assert reopened.has_conflict(did, "10-06-2030", "10:00")
+    assert reopened.next_id("appointments") == aid + 1
+
+
+def test_duplicate_contact_and_slot_are_rejected(data_dir):
+    store = _store(data_dir)
+    pid = store.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+    did = store.add_doctor("Dr. Iyer", "Cardiology")
+    store.add_appointment(pid, did, "10-06-2030", "10:00")
+
+    with pytest.raises(ContactExistsError):
+        store.add_patient("Someone Else", 40, "M", "01-01-1985", "9876500001", "Cough")
+    with pytest.raises(SlotTakenError):
+        store.add_appointment(pid, did, "10-06-2030", "10:00")
+
+
+def test_two_processes_never_hand_out_the_same_id(data_dir):
+    first, second = _store(data_dir), _store(data_dir)
+    did = first.add_doctor("Dr. Iyer", "Cardiology")
+    pid = first.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+
+    a = first.add_appointment(pid, did, "10-06-2030", "10:00")
+    b = second.add_appointment(pid, did, "10-06-2030", "10:15")  # second's copy was stale
+    assert b == a + 1
+    # ...and it saw the first store's booking of the same slot
+    with pytest.raises(SlotTakenError):
+        second.add_appointment(pid, did, "10-06-2030", "10:00")
+    assert first.has_conflict(did, "10-06-2030", "10:15")
+
+
+def test_compaction_keeps_live_rows_and_ids(data_dir):
+    store = _store(data_dir)
+    pid = store.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+    did = store.add_doctor("Dr. Iyer", "Cardiology")
+    ids = [store.add_appointment(pid, did, "10-06-2030", t) for t in ("09:00", "09:15", "09:30", "09:45")]
+    store.cancel_appointment(ids[1])
+    store.cancel_appointment(ids[3])  # the highest ID
+
+    assert store.compact_appointments() == 4  # two records + two tombstones
+
+    reopened = _store(data_dir)
+    reopened.load()
+    assert sorted(reopened.appointments) == [ids[0], ids[2]]
+    assert reopened.appointments[ids[2]] == [str(ids[2]), str(pid), str(did), "10-06-2030", "09:30"]
+    assert "X," not in (data_dir / "appointments.txt").read_text()
+    # The compacted-away ID is not handed out again
+    assert reopened.add_appointment(pid, did, "10-06-2030", "09:45") == ids[3] + 1
+
+
+def test_cancelled_slot_is_free_before_compaction(data_dir):
+    store = _store(data_dir)
+    pid = store.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+    did = store.add_doctor("Dr. Iyer", "Cardiology")
+    aid = store.add_appointment(pid, did, "10-06-2030", "09:00")
+
+    assert store.cancel_appointment(aid)
+    assert not store.cancel_appointment(aid)
+    reopened = _store(data_dir)
+    assert not reopened.has_conflict(did, "10-06-2030", "09:00")
+    assert reopened.next_id("appointments") == aid + 1
+
+
+def test_torn_last_line_is_dropped(data_dir):
+    store = _store(data_dir)
+    pid = store.add_patient("Asha Rao", 34, "F", "01-05-1990", "9876500001", "Fever")
+    did = store.add_doctor("Dr. Iyer", "Cardiology")
+    aid = store.add_appointment(pid, did, "10-06-2030", "09:00")
+    with open(data_dir / "appointments.txt", "a") as f:
+        f.write(f"{aid + 1},{pid},")  # crash mid-append
+
+    reopened = _store(data_dir)
+    reopened.load()
+    assert list(reopened.appointments) == [aid]
+    assert reopened.add_appointment(pid, did, "10-06-2030", "09:15") == aid + 1
+    assert (data_dir / "appointments.txt").read_text().endswith("09:15\n")
@@ -0,0 +1,79 @@
+# tests/test_hospital_mysql_pool.py
+"""hospital_mysql's bounded connection checkout (no MySQL server needed)."""
+import threading
+import time
+
+import pytest
+
+hospital_mysql = pytest.importorskip("hospital_mysql")
+
+
+class FakeConnection:
+    def __init__(self, connection_id):
+        self.connection_id = connection_id
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """Stands in for MySQLConnectionPool, which needs a server to connect to."""
+
+    def __init__(self):
+        self.handed_out = 0
+        self.fail = False
+
+    def get_connection(self):
+        if self.fail:
+            raise hospital_mysql.Error("connection refused")
+        self.handed_out += 1
+        return FakeConnection(self.handed_out)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(hospital_mysql, "_pool", fake)
+    monkeypatch.setattr(hospital_mysql, "_pool_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(hospital_mysql, "DB_POOL_TIMEOUT", 0.05)
+    return fake
+
+
+def test_checkout_times_out_when_every_connection_is_in_use(pool):
+    held = [hospital_mysql.get_db_connection() for _ in range(2)]
+
+    with pytest.raises(hospital_mysql.PoolTimeoutError):
+        hospital_mysql.get_db_connection()
+    assert pool.handed_out == 2  # the pool itself was never asked
+
+    hospital_mysql.release_db_connection(held[0])
+    hospital_mysql.release_db_connection(hospital_mysql.get_db_connection())
+
+
+def test_waiter_gets_the_released_connection(pool, monkeypatch):
+    monkeypatch.setattr(hospital_mysql, "DB_POOL_TIMEOUT", 5)
+    held = [hospital_mysql.get_db_connection() for _ in range(2)]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(hospital_mysql.get_db_connection()))
+    waiter.start()
+    time.sleep(0.1)  # let it block on the semaphore
+
+    hospital_mysql.release_db_connection(held[0])
+    waiter.join(timeout=5)
+
+    assert len(got) == 1
+    assert hospital_mysql.pool_stats()["waits"] >= 1
+
+
+def test_failed_checkout_gives_its_permit_back(pool):
+    pool.fail = True
+    for _ in range(3):  # more attempts than permits
+        with pytest.raises(hospital_mysql.Error):
+            hospital_mysql.get_db_connection()
+
+    pool.fail = False
+    with hospital_mysql.db_connection(), hospital_mysql.db_connection():
+        pass
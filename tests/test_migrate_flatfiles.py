@@ -0,0 +1,48 @@
+# tests/test_migrate_flatfiles.py
+"""migrate_flatfiles.migrate into a fresh SQLite database."""
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import migrate_flatfiles
+from models import Appointment, Patient
+
+
+def test_migration_keeps_ids_applies_tombstones_and_counts_bad_rows(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "doctors.txt").write_text("1,Dr. Iyer,Cardiology\n")
+    (data / "patients.txt").write_bytes(
+        b"1,Asha Rao,34,F,01-05-1990,9876500001,Fever\n"
+        b"2,Bad \xff Bytes,40,M,01-01-1985,9876500002,Cough\n"
+        b"3,Vikram Shah,52,M,not-a-date,9876500003,Cough\n"
+    )
+    (data / "appointments.txt").write_text(
+        "7,1,1,10-06-2030,10:00\n"
+        "8,1,1,10-06-2030,10:15\n"
+        "X,7\n"
+        "9,2,1,10-06-2030,10:30\n"  # patient 2 was never migrated
+    )
+    engine = create_engine(f"sqlite:///{tmp_path / 'hospital.db'}")
+
+    stats = migrate_flatfiles.migrate(engine, data, tmp_path / "checkpoint.json", report=lambda *_: None)
+
+    assert stats["patients.txt"] == {"read": 3, "inserted": 1, "skipped": 0, "invalid": 2}
+    assert stats["appointments.txt"]["invalid"] == 1
+    with Session(engine) as db:
+        assert db.scalars(select(Patient.id)).all() == [1]
+        assert dict(db.execute(select(Appointment.id, Appointment.status)).all()) == {7: "Cancelled", 8: "Booked"}
+
+
+def test_rerun_resumes_from_the_checkpoint(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "doctors.txt").write_text("1,Dr. Iyer,Cardiology\n")
+    (data / "patients.txt").write_text("1,Asha Rao,34,F,01-05-1990,9876500001,Fever\n")
+    (data / "appointments.txt").write_text("")
+    engine = create_engine(f"sqlite:///{tmp_path / 'hospital.db'}")
+    checkpoint = tmp_path / "checkpoint.json"
+    migrate_flatfiles.migrate(engine, data, checkpoint, report=lambda *_: None)
+
+    lines = []
+    migrate_flatfiles.migrate(engine, data, checkpoint, report=lines.append)
+    assert "patients.txt: already migrated, skipping." in lines
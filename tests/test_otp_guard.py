@@ -0,0 +1,113 @@
+# tests/test_otp_guard.py
+"""OTP attempt limiting and the verified-patient session cache."""
+import base64
+import json
+import time
+
+import pytest
+
+import otp_guard
+from otp_guard import TokenBucketLimiter
+
+
+def test_bucket_trips_after_its_burst_and_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(otp_guard.time, "monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(per_minute=3)
+
+    assert [limiter.take("p1") for _ in range(4)] == [True, True, True, False]
+    assert limiter.retry_after("p1") == pytest.approx(20)
+    assert limiter.take("p2")  # other keys have their own bucket
+    assert limiter.stats()["rejected"] == 1
+
+    now[0] += 20
+    assert limiter.take("p1")
+    assert not limiter.take("p1")
+
+
+def test_idle_buckets_are_evicted_beyond_maxsize():
+    limiter = TokenBucketLimiter(per_minute=1, maxsize=2)
+    for key in ("a", "b", "c"):
+        limiter.take(key)
+    assert limiter.stats()["keys"] == 2
+    assert limiter.take("a")  # evicted, so full again
+
+
+def test_check_attempt_charges_patient_and_ip(monkeypatch):
+    monkeypatch.setattr(otp_guard, "patient_limiter", TokenBucketLimiter(per_minute=2))
+    monkeypatch.setattr(otp_guard, "ip_limiter", TokenBucketLimiter(per_minute=3))
+
+    assert otp_guard.check_attempt(1, "10.0.0.1") is None
+    assert otp_guard.check_attempt(1, "10.0.0.1") is None
+    assert otp_guard.check_attempt(1, "10.0.0.1") >= 1  # patient bucket empty
+    assert otp_guard.check_attempt(2, "10.0.0.1") is None
+    assert otp_guard.check_attempt(3, "10.0.0.1") >= 1  # IP bucket empty
+    # A rejected attempt doesn't spend the other bucket's tokens
+    assert otp_guard.ip_limiter.stats()["rejected"] == 0
+
+
+def test_otp_matches():
+    assert otp_guard.otp_matches("0420", "0420")
+    assert not otp_guard.otp_matches("0420", "420")
+    assert not otp_guard.otp_matches("0420", None)
+    assert not otp_guard.otp_matches(None, "")
+
+
+def test_session_remembers_only_recent_patient_ids(monkeypatch):
+    monkeypatch.setattr(otp_guard, "OTP_SESSION_MAX_PATIENTS", 2)
+    session = {}
+    for pid in (1, 2, 3):
+        otp_guard.remember_verified(session, pid)
+
+    assert list(session[otp_guard.SESSION_KEY]) == ["2", "3"]
+    assert all(isinstance(expiry, float) for expiry in session[otp_guard.SESSION_KEY].values())
+    assert not otp_guard.is_verified(session, 1)
+    assert otp_guard.is_verified(session, 3)
+    assert otp_guard.has_verified(session)
+
+
+def test_expired_and_old_format_entries(monkeypatch):
+    session = {otp_guard.SESSION_KEY: {"1": [time.time() + 60, "Asha Rao"], "2": time.time() - 1}}
+    assert otp_guard.is_verified(session, 1)
+    assert not otp_guard.is_verified(session, 2)
+
+    otp_guard.remember_verified(session, 3)
+    assert set(session[otp_guard.SESSION_KEY]) == {"1", "3"}
+    assert not isinstance(session[otp_guard.SESSION_KEY]["1"], list)  # the name is dropped
+
+
+def _book(client, patient, doctor, day, otp, time="10:00"):
+    return client.post("/patient/book_appointment", data={
+        "patient_id": patient.id, "doctor_id": doctor.id, "appointment_date": day.isoformat(),
+        "appointment_time": time, "otp": otp,
+    })
+
+
+def test_repeated_wrong_otps_get_429(client, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    wrong = "0000" if patient.otp_code != "0000" else "1111"
+    attempts = int(otp_guard.OTP_ATTEMPTS_PER_PATIENT)
+
+    for _ in range(attempts):
+        assert "Incorrect OTP" in _book(client, patient, doctor, day, wrong).text
+    response = _book(client, patient, doctor, day, patient.otp_code)
+
+    assert response.status_code == 429
+    assert "Too many OTP attempts" in response.text
+
+
+def test_verified_session_skips_the_otp_and_keeps_names_out_of_the_cookie(client, make_patient,
+                                                                         make_doctor, day):
+    patient, doctor = make_patient("Asha Rao"), make_doctor()
+    assert "Appointment booked!" in _book(client, patient, doctor, day, patient.otp_code).text
+
+    # No OTP this time: the session verified the patient when they booked
+    response = client.post("/patient/view_appointments_auth", data={"patient_id": patient.id})
+    assert "Incorrect OTP" not in response.text
+    assert "Booked" in response.text
+
+    # Starlette's cookie is base64(JSON).timestamp.signature: signed, readable by anyone
+    payload = json.loads(base64.b64decode(client.cookies.get("session").split(".")[0] + "=="))
+    assert list(payload) == [otp_guard.SESSION_KEY]
+    assert list(payload[otp_guard.SESSION_KEY]) == [str(patient.id)]
+    assert "Asha" not in json.dumps(payload)
@@ -0,0 +1,47 @@
+# tests/test_patient_cancel.py
+"""POST /patient/cancel_appointment: only the owner, with their OTP, can cancel."""
+import crud
+from models import Appointment
+
+
+def _cancel(client, appointment, patient_id, otp):
+    return client.post("/patient/cancel_appointment", data={
+        "appointment_id": appointment.id, "patient_id": patient_id, "otp": otp,
+    })
+
+
+def _status(db, appointment):
+    db.expire_all()
+    return db.get(Appointment, appointment.id).status
+
+
+def test_owner_with_otp_cancels(client, db, make_patient, make_doctor, day):
+    patient, doctor = make_patient(), make_doctor()
+    appointment = crud.create_appointment(db, patient.id, doctor.id, day.isoformat(), "10:00")
+
+    response = _cancel(client, appointment, patient.id, patient.otp_code)
+
+    assert "Appointment cancelled successfully!" in response.text
+    assert _status(db, appointment) == "Cancelled"
+
+
+def test_wrong_otp_or_other_patient_cannot_cancel(client, db, make_patient, make_doctor, day):
+    owner, other, doctor = make_patient("Asha Rao"), make_patient("Vikram Shah"), make_doctor()
+    appointment = crud.create_appointment(db, owner.id, doctor.id, day.isoformat(), "10:00")
+    wrong = "0000" if owner.otp_code != "0000" else "1111"
+
+    assert "Invalid patient ID" in _cancel(client, appointment, owner.id, wrong).text
+    # Another patient's own valid OTP doesn't reach someone else's appointment
+    assert "Invalid patient ID" in _cancel(client, appointment, other.id, other.otp_code).text
+    assert _status(db, appointment) == "Booked"
+
+
+def test_verified_session_still_checks_ownership(client, db, make_patient, make_doctor, day):
+    owner, other, doctor = make_patient("Asha Rao"), make_patient("Vikram Shah"), make_doctor()
+    theirs = crud.create_appointment(db, owner.id, doctor.id, day.isoformat(), "10:00")
+    mine = crud.create_appointment(db, other.id, doctor.id, day.isoformat(), "10:15")
+    assert "cancelled successfully" in _cancel(client, mine, other.id, other.otp_code).text
+
+    # `other` is now verified in this session and may skip the OTP, but only for their own rows
+    assert "Invalid patient ID" in _cancel(client, theirs, other.id, None).text
+    assert _status(db, theirs) == "Booked"
@@ -0,0 +1,35 @@
+# tests/test_patient_search.py
+"""Ranked patient search, its substring fallback and the index TTL."""
+from sqlalchemy import insert
+
+import crud
+import patient_search
+from models import Patient
+
+
+def test_ranked_search_tolerates_a_typo(db, make_patient):
+    sharma = make_patient("Rohit Sharma", contact="9876500001")
+    make_patient("Anita Desai", contact="9876500002")
+
+    assert [p.id for p in crud.get_patients(db, "sharmaa")] == [sharma.id]
+
+
+def test_short_and_numeric_terms_match_as_substrings(db, make_patient):
+    first = make_patient("Rohit Sharma", contact="9876512345")
+    second = make_patient("Anita Desai", contact="9123451111")
+    li = make_patient("Li Wei", contact="9000000000")
+
+    assert not patient_search.ranked("345")
+    assert [p.id for p in crud.get_patients(db, "345")] == [first.id, second.id]
+    assert not patient_search.ranked("Li")
+    assert [p.id for p in crud.get_patients(db, "Li")] == [li.id]
+
+
+def test_stale_index_picks_up_patients_added_elsewhere(db, monkeypatch):
+    # e.g. bulk_import.py or another worker, which this worker's index never saw
+    db.execute(insert(Patient).values(name="Meera Krishnan", contact="9000011111", otp_code="1234"))
+    db.commit()
+    assert crud.get_patients(db, "Krishnan") == []
+
+    monkeypatch.setattr(patient_search.backend, "ttl", 0)
+    assert [p.name for p in crud.get_patients(db, "Krishnan")] == ["Meera Krishnan"]
@@ -0,0 +1,81 @@
+# tests/test_replicas.py
+"""db.ReplicaSet: spreading reads, failing over and falling back to the primary."""
+import asyncio
+import shutil
+
+import pytest
+from sqlalchemy import text
+
+import db as db_module
+from db import ReplicaSet
+
+
+def _replica_url(path):
+    # mode=ro: a missing file is a connect error, not a new empty database
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+@pytest.fixture
+def replica_file(tmp_path, make_doctor):
+    make_doctor("Dr. Replica")
+    path = tmp_path / "replica.db"
+    shutil.copy(db_module.engine.url.database, path)
+    return path
+
+
+def _read(replicas):
+    with replicas.session() as session:
+        return session.execute(text("SELECT name FROM doctors")).scalar_one()
+
+
+def test_round_robin_spreads_reads(tmp_path, replica_file):
+    other = tmp_path / "replica2.db"
+    shutil.copy(replica_file, other)
+    replicas = ReplicaSet([_replica_url(replica_file), _replica_url(other)])
+
+    for _ in range(4):
+        assert _read(replicas) == "Dr. Replica"
+
+    stats = replicas.stats()
+    assert [r["picks"] for r in stats["replicas"]] == [2, 2]
+    assert stats["primary_reads"] == 0
+
+
+def test_dead_replica_is_skipped_until_retry(tmp_path, replica_file):
+    replicas = ReplicaSet([_replica_url(tmp_path / "missing.db"), _replica_url(replica_file)], retry_after=60)
+
+    for _ in range(3):
+        assert _read(replicas) == "Dr. Replica"
+
+    dead, live = replicas.stats()["replicas"]
+    assert (dead["healthy"], dead["failures"], dead["picks"]) == (False, 1, 0)
+    assert live["picks"] == 3
+    assert dead["last_error"]
+
+
+def test_no_healthy_replica_reads_from_the_primary(tmp_path, make_doctor):
+    make_doctor("Dr. Primary")
+    replicas = ReplicaSet([_replica_url(tmp_path / "missing.db")])
+
+    assert _read(replicas) == "Dr. Primary"
+    assert _read(replicas) == "Dr. Primary"
+    stats = replicas.stats()
+    assert stats["primary_reads"] == 2
+    assert stats["replicas"][0]["failures"] == 1  # not retried within retry_after
+
+
+def test_async_session_fails_over_too(tmp_path, replica_file):
+    replicas = ReplicaSet([_replica_url(tmp_path / "missing.db"), _replica_url(replica_file)])
+
+    async def read():
+        session = await replicas.async_session()
+        async with session:
+            return (await session.execute(text("SELECT name FROM doctors"))).scalar_one()
+
+    assert asyncio.run(read()) == "Dr. Replica"
+    assert [r["picks"] for r in replicas.stats()["replicas"]] == [0, 1]
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ReplicaSet([], strategy="random")